@@ -27,13 +27,89 @@ class Settings(BaseSettings):
     
     # Open-Meteo for ECMWF comparison data
     OPEN_METEO_URL: str = "https://api.open-meteo.com/v1/forecast"
-    
+    OPEN_METEO_AIR_QUALITY_URL: str = "https://air-quality-api.open-meteo.com/v1/air-quality"
+
+    # Open-Meteo response cache (shared by locations in the same model cell)
+    OPEN_METEO_CELL_DEG: float = 0.1  # Snap requests to this grid (~11 km)
+    OPEN_METEO_UPDATE_HOURS: int = 6  # ECMWF IFS runs four times daily; hourly snapshot rebuilds reuse the slot
+    OPEN_METEO_AIR_QUALITY_UPDATE_HOURS: int = 12  # CAMS refreshes twice daily
+    OPEN_METEO_CACHE_SIZE: int = 8192  # Both kinds for every catalog cell, or rebuilds refetch evicted cells
+    OPEN_METEO_CACHE_TTL: int = 12 * 3600  # seconds, upper bound per entry (not below the update slots)
+    OPEN_METEO_NEGATIVE_TTL: int = 120  # seconds to remember a failed fetch
+    OPEN_METEO_CACHE_PERSIST_INTERVAL: int = 300  # seconds between disk flushes
+    OPEN_METEO_BATCH_SIZE: int = 100  # Locations per multi-location request when prefetching
+
     # Data storage
     DATA_DIR: str = os.path.join(os.path.dirname(__file__), "..", "data")
     CACHE_DIR: str = os.path.join(os.path.dirname(__file__), "..", "cache")
     
+    # Encoded forecast response cache
+    FORECAST_CACHE_SIZE: int = 4096
+    FORECAST_CACHE_TTL: int = 3600  # seconds; keys also roll over each hour
+    CELL_CACHE_SIZE: int = 4096  # Per model-cell weather columns shared by nearby points
+    FORECAST_CACHE_COMPRESS: bool = True  # Store gzip/brotli variants next to the raw bytes
+    STALE_FORECAST_CACHE_SIZE: int = 8192  # Last good response per location, served when builds are shed
+    STALE_FORECAST_CACHE_TTL: int = 24 * 3600
+    FORECAST_BATCH_MAX_LOCATIONS: int = 50  # Locations per POST /api/forecast/batch
+    LOCATION_RESPONSE_CACHE_SIZE: int = 2048
+    LOCATION_RESPONSE_CACHE_TTL: int = 24 * 3600
+    LOCATION_TILE_CACHE_SIZE: int = 4096  # Encoded GeoJSON map tiles, per catalog version and run
+    LOCATION_TILE_CACHE_TTL: int = 12 * 3600
+
+    # Precompression (done once when a response is cached)
+    COMPRESS_MIN_BYTES: int = 1024
+    GZIP_LEVEL: int = 9
+    BROTLI_QUALITY: int = 9
+
+    # Nationwide snapshot precompute (static per-location files, one directory per run)
+    SNAPSHOT_DIR: str = os.path.join(os.path.dirname(__file__), "..", "snapshots")
+    RUN_DATA_KEEP: int = 2  # Decoded runs held in memory (current plus one still being served)
+    RUN_DATA_MAX_AGE_HOURS: int = 24  # Fall back to older runs on disk until the latest arrives
+    ASTRO_EXECUTOR: str = "process"  # "process" scales ephem with cores; "thread" avoids extra processes
+    ASTRO_WORKERS: int = 0  # 0 = one per core
+    CPU_WORKERS: int = 0  # Merging, encoding, GRIB decoding; 0 = one per core
+    IO_WORKERS: int = 4  # File reads and writes
+    ADMISSION_KEYED_CONCURRENCY: int = 8  # Cold builds for catalog locations at once
+    ADMISSION_KEYED_QUEUE: int = 64  # Waiting behind them before requests are shed
+    ADMISSION_COORDS_CONCURRENCY: int = 2  # Cold builds for arbitrary coordinates at once
+    ADMISSION_COORDS_QUEUE: int = 8
+    ADMISSION_QUEUE_TIMEOUT: float = 10  # seconds a request may wait for a build slot
+    HOTSET_WIDTH: int = 4096  # Count-min sketch counters per row
+    HOTSET_DEPTH: int = 4
+    HOTSET_TOP_K: int = 2000  # Hottest locations and cells tracked by name
+    HOTSET_HALF_LIFE_HOURS: float = 72  # Access counts halve over this period
+    HOTSET_PERSIST_INTERVAL: int = 300  # seconds between disk flushes
+    HOTSET_WARM_CELLS: int = 200  # Hottest coordinate cells warmed after each snapshot build
+    HOTSET_ACCESS_LOG: str = ""  # Web server log of snapshot files it served (see README); empty to disable
+    HOTSET_ACCESS_LOG_SECONDS: int = 60  # seconds between reads of that log
+    SNAPSHOT_ENABLED: bool = True
+    SNAPSHOT_MAX_RUN_LAG_HOURS: int = 12  # Serve the clock's latest run if snapshots fall this far behind
+    SNAPSHOT_KEEP_RUNS: int = 2  # Current run plus the previous one for in-flight readers
+    SNAPSHOT_CHUNK_SIZE: int = 200  # Locations encoded and written per worker-thread step
+    SNAPSHOT_MIN_WRITTEN_SHARE: float = 0.5  # Keep the previous snapshot if a build writes fewer locations
+
     # Database
     DATABASE_URL: str = "sqlite:///./cleardarksky.db"
+    SQLITE_TUNED: bool = True  # Apply the connection profile below (see database.py)
+    SQLITE_WAL: bool = True  # Readers don't block on the writer
+    SQLITE_SYNCHRONOUS: str = "NORMAL"  # Safe with WAL; FULL fsyncs every commit
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024  # bytes of the file read through mmap
+    SQLITE_CACHE_SIZE_KB: int = 64 * 1024  # Page cache per connection
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_READ_POOL_SIZE: int = 8  # Concurrent read connections for the API
+    SQLITE_POOL_TIMEOUT: float = 30  # seconds to wait for a free connection
+    SQLITE_STATEMENT_CACHE: int = 256  # Prepared statements kept per connection
+    LOCATION_INDEX_CELL_DEG: float = 1.0  # Grid cell size of the /nearby spatial index
+    CATALOG_CHECK_SECONDS: int = 30  # How often to look for location writes by other processes
+    SEARCH_FUZZY_THRESHOLD: float = 0.3  # Trigram similarity for typo-tolerant search matches
+    LOCATION_TILE_MAX_ZOOM: int = 18
+    LOCATION_TILE_CLUSTER_MAX_ZOOM: int = 7  # Map tiles cluster nearby locations up to this zoom
+    LOCATION_TILE_CLUSTER_GRID: int = 8  # Cluster cells per tile side
+    MAP_TILE_DIR: str = os.path.join(os.path.dirname(__file__), "..", "cache", "tiles")
+    MAP_TILE_MAX_ZOOM: int = 8  # Past this a pixel is far finer than the 10 km model grid
+    MAP_TILE_CACHE_MAX_BYTES: int = 512 * 1024 * 1024  # Rendered PNGs kept on disk
+    MAP_TILE_INDEX_CACHE_SIZE: int = 256  # Tile resampling indexes in memory per grid (256 KB each)
+    MAP_TILE_PNG_LEVEL: int = 6  # zlib level; tiles are written once and served many times
     
     # Update intervals (in minutes)
     DATA_UPDATE_INTERVAL: int = 60  # Check for new data every hour
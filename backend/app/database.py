@@ -1,20 +1,103 @@
 """
 Database setup and models
+
+The API routers use the async engines (aiosqlite) so queries never block the
+event loop: a bounded pool of read-only connections, and a single writer
+connection, since SQLite allows one writer at a time anyway. The sync
+engine remains for CLI scripts, table creation and code that already runs
+in worker threads.
+
+With SQLITE_TUNED, every SQLite connection gets the profile below. WAL lets
+readers proceed while a writer (e.g. seeding) commits, instead of queuing
+on the file lock.
 """
 
-from sqlalchemy import create_engine, Column, String, Float, Integer, DateTime, Text, JSON
+from sqlalchemy import create_engine, event, Column, String, Float, Integer, DateTime, Text, JSON
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from datetime import datetime
+from typing import Tuple
 import json
 
 from .config import settings
 
+
+def async_database_url(url: str) -> str:
+    """Same database through an asyncio driver (sqlite:// -> sqlite+aiosqlite://)"""
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url[len("sqlite://"):]
+    return url
+
+
+def is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+
+def apply_sqlite_profile(engine: Engine, read_only: bool = False):
+    """Set the per-connection pragmas of the tuned profile on every new connection"""
+    synchronous = settings.SQLITE_SYNCHRONOUS.upper()
+    if synchronous not in ("OFF", "NORMAL", "FULL", "EXTRA"):
+        raise ValueError(f"Invalid SQLITE_SYNCHRONOUS: {settings.SQLITE_SYNCHRONOUS}")
+    
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA busy_timeout = {int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+        cursor.execute(f"PRAGMA synchronous = {synchronous}")
+        cursor.execute(f"PRAGMA mmap_size = {int(settings.SQLITE_MMAP_SIZE)}")
+        # Negative values are KiB rather than pages
+        cursor.execute(f"PRAGMA cache_size = -{int(settings.SQLITE_CACHE_SIZE_KB)}")
+        cursor.execute("PRAGMA temp_store = MEMORY")
+        if read_only:
+            cursor.execute("PRAGMA query_only = 1")
+        cursor.close()
+
+
+def create_async_engines(url: str, tuned: bool = True) -> Tuple[AsyncEngine, AsyncEngine]:
+    """
+    (read engine, write engine) for a database URL
+    
+    Tuned SQLite gets a pool of SQLITE_READ_POOL_SIZE read-only connections
+    and a one-connection writer pool, each keeping SQLITE_STATEMENT_CACHE
+    prepared statements. Otherwise both are one engine with the driver's
+    default pooling.
+    """
+    url = async_database_url(url)
+    if not (tuned and is_sqlite(url)):
+        engine = create_async_engine(url)
+        return engine, engine
+    
+    connect_args = {"cached_statements": settings.SQLITE_STATEMENT_CACHE}
+    read_engine = create_async_engine(
+        url, connect_args=connect_args, poolclass=AsyncAdaptedQueuePool,
+        pool_size=settings.SQLITE_READ_POOL_SIZE, max_overflow=0,
+        pool_timeout=settings.SQLITE_POOL_TIMEOUT
+    )
+    write_engine = create_async_engine(
+        url, connect_args=connect_args, poolclass=AsyncAdaptedQueuePool,
+        pool_size=1, max_overflow=0, pool_timeout=settings.SQLITE_POOL_TIMEOUT
+    )
+    apply_sqlite_profile(read_engine.sync_engine, read_only=True)
+    apply_sqlite_profile(write_engine.sync_engine)
+    return read_engine, write_engine
+
+
 engine = create_engine(
     settings.DATABASE_URL, 
     connect_args={"check_same_thread": False}  # SQLite specific
 )
+if settings.SQLITE_TUNED and is_sqlite(settings.DATABASE_URL):
+    apply_sqlite_profile(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+async_engine, async_write_engine = create_async_engines(settings.DATABASE_URL, settings.SQLITE_TUNED)
+# Objects stay usable after commit, so handlers need no extra round trips
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+AsyncWriteSession = async_sessionmaker(async_write_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 
@@ -65,8 +148,13 @@ class DataUpdateLog(Base):
 
 
 def init_db():
-    """Initialize database tables"""
-    Base.metadata.create_all(bind=engine)
+    """Initialize database tables and apply pending migrations"""
+    from .migrations import upgrade
+    upgrade(engine)
+    if settings.SQLITE_TUNED and settings.SQLITE_WAL and is_sqlite(settings.DATABASE_URL):
+        # Persistent in the database file, so set once rather than per connection
+        with engine.connect() as conn:
+            conn.exec_driver_sql("PRAGMA journal_mode = WAL")
 
 
 def get_db():
@@ -78,5 +166,23 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    """Dependency for getting an async (read-only) DB session"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def get_async_write_db():
+    """Dependency for getting the async session of the single writer"""
+    async with AsyncWriteSession() as db:
+        yield db
+
+
+async def dispose_engines():
+    await async_engine.dispose()
+    if async_write_engine is not async_engine:
+        await async_write_engine.dispose()
+
+
 # Initialize on import
 init_db()
\ No newline at end of file
@@ -11,7 +11,16 @@ import asyncio
 
 from .config import settings
 from .routers import forecast, locations, embed
-from .services.scheduler import start_scheduler
+from .services.scheduler import (
+    start_scheduler, persist_state, watch_catalog, refresh_snapshots, ingest_access_log
+)
+from .services.cmc_fetcher import openmeteo_fetcher
+from .services.run_data import run_data
+from .services.hotset import hot_set
+from .services.executors import executor_stats, shutdown_executors
+from .services.admission import admission
+from .services.catalog import location_catalog
+from .database import dispose_engines
 
 app = FastAPI(
     title="Clear Dark Sky API",
@@ -37,8 +46,27 @@ app.include_router(embed.router, prefix="/api/embed", tags=["embed"])
 @app.on_event("startup")
 async def startup_event():
     """Initialize data fetching on startup"""
+    # Serve whatever run is already on disk before the first download
+    await run_data.refresh()
+    await location_catalog.refresh()
+    
     # Start background scheduler for data updates
     asyncio.create_task(start_scheduler())
+    asyncio.create_task(persist_state())
+    asyncio.create_task(watch_catalog())
+    if settings.SNAPSHOT_ENABLED:
+        asyncio.create_task(refresh_snapshots())
+    if settings.HOTSET_ACCESS_LOG:
+        asyncio.create_task(ingest_access_log())
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Persist caches so they survive restarts"""
+    openmeteo_fetcher.cache.save()
+    hot_set.save()
+    shutdown_executors()
+    await dispose_engines()
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -57,4 +85,4 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    return {"status": "healthy", "executors": executor_stats(), "admission": admission.stats()}
@@ -0,0 +1,174 @@
+"""
+Schema Migrations
+Numbered, forward-only schema changes recorded in schema_migrations
+
+init_db() applies pending migrations at startup. Every migration must be
+safe to re-run (IF NOT EXISTS), since several workers may start at once.
+
+Usage:
+    python -m app.migrations status    # applied and pending migrations
+    python -m app.migrations upgrade   # apply pending migrations
+    python -m app.migrations check     # EXPLAIN QUERY PLAN every router query
+"""
+
+import logging
+import re
+import sys
+from datetime import datetime
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+logger = logging.getLogger(__name__)
+
+
+class Migration:
+    def __init__(self, version: int, name: str, upgrade: Callable[[Connection], None]):
+        self.version = version
+        self.name = name
+        self.upgrade = upgrade
+
+
+def sql(*statements: str) -> Callable[[Connection], None]:
+    def upgrade(conn: Connection):
+        for statement in statements:
+            conn.execute(text(statement))
+    return upgrade
+
+
+def create_tables(conn: Connection):
+    """Tables as declared in database.py (no-op for existing databases)"""
+    from .database import Base
+    Base.metadata.create_all(bind=conn)
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "baseline schema", create_tables),
+    # Partial indexes cover only active rows, which is all the API reads.
+    # (country, region) also serves country-only filters and GROUP BY.
+    Migration(2, "composite and partial location indexes", sql(
+        "CREATE INDEX IF NOT EXISTS ix_locations_active_country_region "
+        "ON locations (country, region) WHERE is_active = 1",
+        "CREATE INDEX IF NOT EXISTS ix_locations_active_category "
+        "ON locations (category) WHERE is_active = 1",
+    )),
+    # Bumped by any writer (API, seed and manage scripts) in the same
+    # transaction, so the in-memory catalog can tell when to reload
+    Migration(3, "location revision counter", sql(
+        "CREATE TABLE IF NOT EXISTS location_revision ("
+        "id INTEGER PRIMARY KEY CHECK (id = 1), revision INTEGER NOT NULL)",
+        "INSERT OR IGNORE INTO location_revision (id, revision) VALUES (1, 0)",
+        *(
+            f"CREATE TRIGGER IF NOT EXISTS locations_revision_{event.lower()} "
+            f"AFTER {event} ON locations BEGIN "
+            "UPDATE location_revision SET revision = revision + 1 WHERE id = 1; END"
+            for event in ("INSERT", "UPDATE", "DELETE")
+        ),
+    )),
+]
+
+
+def _ensure_table(conn: Connection):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "version INTEGER PRIMARY KEY, name TEXT NOT NULL, applied_at TIMESTAMP NOT NULL)"
+    ))
+
+
+def _default_engine() -> Engine:
+    # Imported late: importing database runs init_db(), which imports this module
+    from .database import engine
+    return engine
+
+
+def applied_versions(engine: Optional[Engine] = None) -> List[int]:
+    engine = engine or _default_engine()
+    with engine.begin() as conn:
+        _ensure_table(conn)
+        return [row[0] for row in conn.execute(text("SELECT version FROM schema_migrations ORDER BY version"))]
+
+
+def upgrade(engine: Optional[Engine] = None) -> List[int]:
+    """Apply pending migrations in order, each in its own transaction"""
+    engine = engine or _default_engine()
+    done = set(applied_versions(engine))
+    applied = []
+    for migration in MIGRATIONS:
+        if migration.version in done:
+            continue
+        with engine.begin() as conn:
+            migration.upgrade(conn)
+            # OR IGNORE: another worker may have applied it concurrently
+            conn.execute(
+                text("INSERT OR IGNORE INTO schema_migrations (version, name, applied_at) "
+                     "VALUES (:version, :name, :applied_at)"),
+                {"version": migration.version, "name": migration.name, "applied_at": datetime.utcnow()}
+            )
+        logger.info(f"Applied migration {migration.version}: {migration.name}")
+        applied.append(migration.version)
+    return applied
+
+
+# "SCAN locations", "SCAN TABLE locations" or "SCAN locations USING INDEX ...":
+# every row is visited, whether in table or index order
+FULL_SCAN = re.compile(r"^SCAN (TABLE )?(\w+)\b")
+
+
+def query_plan(conn: Connection, statement) -> List[str]:
+    """EXPLAIN QUERY PLAN detail lines of a statement with literal arguments"""
+    compiled = statement.compile(bind=conn, compile_kwargs={"literal_binds": True})
+    return [row[3] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}")]
+
+
+def check_query_plans(engine: Optional[Engine] = None) -> List[Tuple[str, str, Optional[str]]]:
+    """
+    EXPLAIN QUERY PLAN every query in queries.PLAN_CHECKS
+
+    Returns (query name, plan, allowed reason) for each full table scan;
+    allowed reason is None for scans that are not expected, which are
+    failures.
+    """
+    from .queries import PLAN_CHECKS
+
+    engine = engine or _default_engine()
+    scans = []
+    with engine.connect() as conn:
+        for name, statement, allowed in PLAN_CHECKS:
+            plan = query_plan(conn, statement)
+            for detail in plan:
+                if FULL_SCAN.match(detail):
+                    scans.append((name, "; ".join(plan), allowed))
+    return scans
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    command = sys.argv[1] if len(sys.argv) > 1 else "status"
+
+    if command == "upgrade":
+        applied = upgrade()
+        print(f"Applied {len(applied)} migration(s)" if applied else "Schema is up to date")
+    elif command == "status":
+        done = set(applied_versions())
+        for migration in MIGRATIONS:
+            state = "applied" if migration.version in done else "pending"
+            print(f"{migration.version:>4}  {state:<8} {migration.name}")
+    elif command == "check":
+        upgrade()
+        failures = 0
+        for name, plan, allowed in check_query_plans():
+            if allowed:
+                print(f"  ok    {name}: full scan allowed ({allowed})")
+            else:
+                failures += 1
+                print(f"  FAIL  {name}: {plan}")
+        print(f"{failures} unindexed quer{'y' if failures == 1 else 'ies'}")
+        sys.exit(1 if failures else 0)
+    else:
+        print(__doc__)
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
@@ -57,6 +57,20 @@ class LocationSummary(BaseModel):
     longitude: float
 
 
+class BatchForecastItem(BaseModel):
+    """One location of a batch forecast: a catalog key, or coordinates"""
+    key: Optional[str] = None
+    lat: Optional[float] = Field(None, ge=-90, le=90)
+    lon: Optional[float] = Field(None, ge=-180, le=180)
+    name: Optional[str] = None
+    tz: str = "America/New_York"
+
+
+class BatchForecastRequest(BaseModel):
+    """Locations to forecast together, answered in the same order"""
+    locations: List[BatchForecastItem] = Field(..., min_length=1)
+
+
 # Forecast value enums matching CMC categories
 class CloudCover(str, Enum):
     CLEAR = "clear"           # 0-10%
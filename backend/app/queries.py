@@ -0,0 +1,71 @@
+"""
+Location Queries
+Every SELECT the API runs against the locations table
+
+Reads are served from the in-memory catalog (services/catalog.py), so
+these are the catalog loads and the write paths' lookups. Statements are
+built here rather than inline, so the query plan check in migrations.py
+covers exactly what the API executes. A new query belongs in PLAN_CHECKS
+too; it fails the check if it scans the table.
+"""
+
+from typing import List, Optional, Tuple, Union
+
+from sqlalchemy import Select, TextClause, func, select, text
+
+from .database import LocationDB
+
+
+def active_locations() -> Select:
+    return select(LocationDB).where(LocationDB.is_active == 1)
+
+
+def location_by_key(key: str, active_only: bool = True) -> Select:
+    query = select(LocationDB).where(LocationDB.key == key)
+    if active_only:
+        query = query.where(LocationDB.is_active == 1)
+    return query
+
+
+def location_by_id(location_id) -> Select:
+    """Any state: embeds of deactivated locations keep working"""
+    return select(LocationDB).where(LocationDB.id == location_id)
+
+
+def country_counts() -> Select:
+    return select(LocationDB.country, func.count()).where(
+        LocationDB.is_active == 1
+    ).group_by(LocationDB.country)
+
+
+def region_counts() -> Select:
+    """(country, region, count) for every country at once"""
+    return select(LocationDB.country, LocationDB.region, func.count()).where(
+        LocationDB.is_active == 1,
+        LocationDB.region.isnot(None)
+    ).group_by(LocationDB.country, LocationDB.region)
+
+
+def category_counts() -> Select:
+    return select(LocationDB.category, func.count()).where(
+        LocationDB.is_active == 1,
+        LocationDB.category.isnot(None)
+    ).group_by(LocationDB.category)
+
+
+def location_revision() -> TextClause:
+    """Counter bumped by triggers on every change to locations (migration 3)"""
+    return text("SELECT revision FROM location_revision WHERE id = 1")
+
+
+# (name, statement with sample arguments, why a table scan is acceptable or None)
+PLAN_CHECKS: List[Tuple[str, Union[Select, TextClause], Optional[str]]] = [
+    ("location by key", location_by_key("key"), None),
+    ("location by key, any state", location_by_key("key", active_only=False), None),
+    ("location by id", location_by_id(1), None),
+    ("all active", active_locations(), "loads every active row into the catalog"),
+    ("country counts", country_counts(), "one pass over the active (country, region) index"),
+    ("region counts", region_counts(), "one pass over the active (country, region) index"),
+    ("category counts", category_counts(), None),
+    ("location revision", location_revision(), None),
+]
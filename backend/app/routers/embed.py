@@ -3,15 +3,18 @@ Embed API Router
 Generates embeddable chart widgets and images
 """
 
-from fastapi import APIRouter, HTTPException, Depends, Query, Response
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
 from fastapi.responses import HTMLResponse
-from sqlalchemy.orm import Session
-from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional, Union
 import json
 
-from ..database import get_db, LocationDB
+from ..database import get_async_db, LocationDB
+from .. import queries
+from ..services.catalog import location_catalog, CatalogLocation
 from ..models import EmbedConfig, EmbedResponse
 from ..config import settings
+from ..services.response_cache import encoded_json, encoded_html, location_response_cache
 
 router = APIRouter()
 
@@ -23,13 +26,26 @@ def get_base_url() -> str:
     return "https://cleardarksky.example.com"
 
 
+async def find_location(location_id: str, db: AsyncSession) -> Union[CatalogLocation, LocationDB, None]:
+    """
+    Location by id from the catalog, falling back to the database: the
+    catalog holds active locations only, and embeds already published for
+    a deactivated location should keep working
+    """
+    location = location_catalog.current.get_by_id(location_id)
+    if location is None:
+        location = (await db.scalars(queries.location_by_id(location_id))).first()
+    return location
+
+
 @router.get("/code/{location_id}", response_model=EmbedResponse)
 async def get_embed_code(
+    request: Request,
     location_id: str,
     width: int = Query(600, ge=200, le=1200),
     height: int = Query(300, ge=150, le=600),
     theme: str = Query("light", regex="^(light|dark)$"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Generate embed code for a location's sky chart
@@ -37,8 +53,13 @@ async def get_embed_code(
     Returns HTML snippet that can be embedded on other websites.
     Also returns direct image URL for simple embedding.
     """
+    cache_key = f"embed-code:{location_id}:{width}:{height}:{theme}"
+    encoded = location_response_cache.get(cache_key)
+    if encoded is not None:
+        return encoded.to_response(request)
+    
     # Verify location exists
-    location = db.query(LocationDB).filter(LocationDB.id == location_id).first()
+    location = await find_location(location_id, db)
     if not location:
         raise HTTPException(status_code=404, detail=f"Location '{location_id}' not found")
     
@@ -67,27 +88,36 @@ async def get_embed_code(
   title="Sky Chart for {location.name}">
 </iframe>'''
     
-    return EmbedResponse(
+    embed = EmbedResponse(
         html=html,
         image_url=image_url,
         page_url=page_url
     )
+    encoded = encoded_json(embed.model_dump())
+    location_response_cache.set(cache_key, encoded)
+    return encoded.to_response(request)
 
 
 @router.get("/iframe/{location_id}", response_class=HTMLResponse)
 async def get_embed_iframe(
+    request: Request,
     location_id: str,
     theme: str = Query("light", regex="^(light|dark)$"),
     compact: bool = Query(False),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Return embeddable HTML page for iframe embedding
     
     This is a minimal page designed to be embedded in an iframe.
     """
+    cache_key = f"embed-iframe:{location_id}:{theme}:{compact}"
+    encoded = location_response_cache.get(cache_key)
+    if encoded is not None:
+        return encoded.to_response(request)
+    
     # Verify location exists
-    location = db.query(LocationDB).filter(LocationDB.id == location_id).first()
+    location = await find_location(location_id, db)
     if not location:
         raise HTTPException(status_code=404, detail=f"Location '{location_id}' not found")
     
@@ -178,7 +208,9 @@ async def get_embed_iframe(
 </body>
 </html>'''
     
-    return HTMLResponse(content=html)
+    encoded = encoded_html(html)
+    location_response_cache.set(cache_key, encoded)
+    return encoded.to_response(request)
 
 
 @router.get("/image/{location_id}.png")
@@ -186,7 +218,7 @@ async def get_embed_image(
     location_id: str,
     width: int = Query(600, ge=200, le=1200),
     height: int = Query(300, ge=150, le=600),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Generate PNG image of the sky chart
@@ -196,7 +228,7 @@ async def get_embed_image(
     matplotlib, Pillow, or similar to render the chart.
     """
     # Verify location exists
-    location = db.query(LocationDB).filter(LocationDB.id == location_id).first()
+    location = await find_location(location_id, db)
     if not location:
         raise HTTPException(status_code=404, detail=f"Location '{location_id}' not found")
     
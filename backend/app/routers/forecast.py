@@ -2,18 +2,37 @@
 Forecast API Router
 """
 
-from fastapi import APIRouter, HTTPException, Depends, Query
-from sqlalchemy.orm import Session
-from typing import Optional
-from datetime import datetime
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse, JSONResponse
+from typing import Optional, Dict, List, Tuple
+from datetime import datetime, timezone
 import pytz
 
-from ..database import get_db, LocationDB
-from ..models import LocationSummary, ForecastResponse
+from ..services.catalog import location_catalog, CatalogLocation
+from ..models import LocationSummary, ForecastResponse, BatchForecastRequest
 from ..services.forecast_builder import forecast_builder
+from ..services.classification import COLOR_SCALES, COLOR_SCALES_VERSION
+from ..services.precompute import snapshot_store
+from ..services.raster_tiles import raster_tiles, RASTER_VARIABLES
+from ..services.run_data import run_data
+from ..services.hotset import record_request, location_key, cell_key
+from ..services.executors import cpu_executor, io_executor
+from ..services.admission import admission, Overloaded
+from ..services.response_cache import (
+    EncodedResponse, encode_json, forecast_cache, stale_forecast_cache,
+    make_etag, cache_headers, is_not_modified, not_modified_response
+)
+from ..config import settings
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
 
 router = APIRouter()
 
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack")
+
 
 def get_timezone_offset(tz_name: str) -> int:
     """Get timezone offset in hours from UTC"""
@@ -28,8 +47,8 @@ def get_timezone_offset(tz_name: str) -> int:
     return -5  # Default to EST
 
 
-def db_to_summary(db_loc: LocationDB) -> LocationSummary:
-    """Convert database model to summary"""
+def db_to_summary(db_loc: CatalogLocation) -> LocationSummary:
+    """Convert catalog record to summary"""
     return LocationSummary(
         key=db_loc.key,
         name=db_loc.name,
@@ -43,7 +62,7 @@ def db_to_summary(db_loc: LocationDB) -> LocationSummary:
 
 class ForecastLocation:
     """Adapter for forecast builder"""
-    def __init__(self, db_loc: LocationDB):
+    def __init__(self, db_loc: CatalogLocation):
         self.id = db_loc.key
         self.name = db_loc.name
         self.latitude = db_loc.latitude
@@ -53,10 +72,356 @@ class ForecastLocation:
         self.created_at = db_loc.created_at
 
 
-@router.get("/{key}", response_model=ForecastResponse)
+class CoordsLocation:
+    """Adapter for forecast builder: arbitrary coordinates outside the catalog"""
+    def __init__(self, lat: float, lon: float, name: Optional[str], tz: str):
+        self.id = f"custom-{lat:.4f}-{lon:.4f}"
+        self.name = name or f"Custom Location ({lat:.2f}, {lon:.2f})"
+        self.latitude = lat
+        self.longitude = lon
+        self.elevation = None
+        self.tz_offset = get_timezone_offset(tz)
+        self.created_at = datetime.utcnow()
+        # Name and timezone change the response, so they are part of the key
+        self.cache_id = f"{self.id}|{tz}|{name or ''}"
+    
+    def summary(self) -> LocationSummary:
+        return LocationSummary(
+            key=self.id,
+            name=self.name,
+            country="Custom",
+            region=None,
+            category=None,
+            latitude=self.latitude,
+            longitude=self.longitude
+        )
+
+
+def wants_msgpack(request: Request) -> bool:
+    accept = request.headers.get("accept", "")
+    return any(t in accept for t in MSGPACK_TYPES)
+
+
+def forecast_variant(format: str, request: Request) -> str:
+    """Cache variant for the requested format and encoding"""
+    if format != "columnar":
+        return "json"
+    if wants_msgpack(request):
+        if msgpack is None:
+            raise HTTPException(status_code=406, detail="MessagePack encoding is not available")
+        return "columnar-msgpack"
+    return "columnar"
+
+
+def encode_forecast(variant: str, columns, run_datetime: datetime,
+                    summary: LocationSummary) -> EncodedResponse:
+    """Validate and encode a forecast once, at build time"""
+    compress = settings.FORECAST_CACHE_COMPRESS
+    
+    if variant == "json":
+        forecast = forecast_builder.to_response(columns, run_datetime)
+        forecast.location = summary
+        return EncodedResponse(encode_json(forecast.model_dump()), compress=compress)
+    
+    payload = forecast_builder.to_columnar(columns, run_datetime)
+    payload["location"] = summary.model_dump()
+    if variant == "columnar-msgpack":
+        return EncodedResponse(
+            msgpack.packb(payload, use_single_float=True),
+            media_type="application/msgpack",
+            compress=compress
+        )
+    return EncodedResponse(encode_json(payload), compress=compress)
+
+
+def encode_batch(variant: str, columns_list: List, run_datetime: datetime,
+                 summaries: List[Optional[LocationSummary]],
+                 errors: List[Optional[str]]) -> EncodedResponse:
+    """Encode a batch forecast once, at build time"""
+    payload = forecast_builder.to_columnar_batch(columns_list, run_datetime)
+    payload["locations"] = [summary.model_dump() if summary else None for summary in summaries]
+    payload["errors"] = errors
+    if variant == "columnar-msgpack":
+        return EncodedResponse(
+            msgpack.packb(payload, use_single_float=True),
+            media_type="application/msgpack",
+            compress=True
+        )
+    return EncodedResponse(encode_json(payload), compress=True)
+
+
+async def serve_forecast(request: Request, location, summary: LocationSummary,
+                         variant: str, cache_id: Optional[str] = None,
+                         snapshot_key: Optional[str] = None) -> Response:
+    """
+    Serve a forecast with validators for the current data version
+    
+    The ETag is derived from the inputs alone, so a matching If-None-Match
+    gets a 304 without building or even touching the cache. On a cache
+    miss, locations with a snapshot_key are read from the precomputed
+    snapshot before falling back to a build.
+    
+    Across a model run rollover each location keeps its previous run until
+    the snapshot build has warmed it, so the boundary causes no cold builds.
+    The run data is pinned once here, so an ingest finishing mid-request
+    cannot mix two runs into one response.
+    
+    Cold builds go through admission control; when the budget for catalog
+    or coordinate requests is exhausted, the last response built for the
+    same location is served stale, or 503 with Retry-After.
+    """
+    record_request(snapshot_key, location.latitude, location.longitude)
+    data = snapshot_store.run_for(snapshot_key)
+    version = forecast_builder.data_version(data)
+    cache_id = cache_id or location.id
+    
+    # A snapshot file starts at the hour it was built, so it is only served
+    # while the start hour and upstream slot still match; its validators
+    # then come from what its build recorded, not from the clock
+    snapshot_version = None
+    if snapshot_key and variant == "json":
+        snapshot_version = snapshot_store.snapshot_version(snapshot_key, data)
+        if snapshot_version == version:
+            version = snapshot_version
+        else:
+            snapshot_version = None
+    
+    etag = make_etag(variant, cache_id, data.version, *[dt.strftime("%Y%m%d%H") for dt in version[1:]])
+    now = datetime.now(timezone.utc)
+    headers = cache_headers(
+        etag,
+        last_modified=max(version),
+        max_age=(forecast_builder.next_data_change(version) - now).total_seconds()
+    )
+    if is_not_modified(request, etag, max(version)):
+        return not_modified_response(headers)
+    
+    encoded = forecast_cache.get(etag)
+    if encoded is None:
+        if snapshot_version is not None:
+            encoded = await io_executor.run(snapshot_store.load, snapshot_key, data)
+        if encoded is None:
+            async def build() -> EncodedResponse:
+                columns, run_datetime = await forecast_builder.build_columns(location, data)
+                return await cpu_executor.run(encode_forecast, variant, columns, run_datetime, summary)
+            
+            try:
+                encoded = await admission.build("keyed" if snapshot_key else "coords", etag, build)
+            except Overloaded as e:
+                return await serve_stale(request, variant, cache_id, snapshot_key, e)
+        hot_key = location_key(snapshot_key) if snapshot_key else cell_key(location.latitude, location.longitude)
+        forecast_cache.set(etag, encoded, hot_key=hot_key)
+        stale_forecast_cache.set(f"{variant}|{cache_id}", (etag, encoded), hot_key=hot_key)
+    return encoded.to_response(request, headers)
+
+
+async def serve_stale(request: Request, variant: str, cache_id: str,
+                      snapshot_key: Optional[str], overloaded: Overloaded) -> Response:
+    """
+    Last good response for a location while its builds are being shed
+    
+    Falls back to the published snapshot for catalog locations, and to
+    503 with Retry-After when there is nothing to serve.
+    """
+    stale = stale_forecast_cache.get(f"{variant}|{cache_id}")
+    if stale is None and snapshot_key and variant == "json":
+        manifest = snapshot_store.current_manifest()
+        encoded = await io_executor.run(snapshot_store.load_stale, snapshot_key)
+        if manifest is not None and encoded is not None:
+            stale = (make_etag(variant, cache_id, "snapshot", manifest["ingest_id"]), encoded)
+    if stale is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Forecast service is busy, please retry shortly",
+            headers={"Retry-After": str(overloaded.retry_after)}
+        )
+    
+    admission.served_stale += 1
+    etag, encoded = stale
+    headers = cache_headers(etag, max_age=min(overloaded.retry_after, 60))
+    headers["Warning"] = '110 - "Response is Stale"'
+    if is_not_modified(request, etag):
+        return not_modified_response(headers)
+    return encoded.to_response(request, headers)
+
+
+@router.get("/color-scales")
+async def get_color_scales(request: Request):
+    """
+    Color scales used by the columnar format
+    
+    The table only changes with COLOR_SCALES_VERSION, so clients may cache
+    it for as long as the version in forecast responses matches.
+    """
+    etag = f'"{COLOR_SCALES_VERSION}"'
+    headers = cache_headers(etag, max_age=86400)
+    if is_not_modified(request, etag):
+        return not_modified_response(headers)
+    return JSONResponse(
+        content={"version": COLOR_SCALES_VERSION, "scales": COLOR_SCALES},
+        headers=headers
+    )
+
+
+@router.get("/tiles")
+async def get_tile_index(request: Request):
+    """
+    Raster map tiles of the current run: its version, the forecast hours
+    with data per variable, and the tile URL template
+    """
+    data = run_data.current()
+    etag = make_etag("tiles", data.version)
+    headers = cache_headers(etag, max_age=300)
+    if is_not_modified(request, etag):
+        return not_modified_response(headers)
+    
+    hours = await cpu_executor.run(raster_tiles.hours, data)
+    return JSONResponse(
+        content={
+            "version": data.version,
+            "run_time": data.run_datetime.isoformat(),
+            "max_zoom": settings.MAP_TILE_MAX_ZOOM,
+            "url": f"/api/forecast/tiles/{data.version}/{{variable}}/{{hour}}/{{z}}/{{x}}/{{y}}.png",
+            "color_scales_version": COLOR_SCALES_VERSION,
+            "variables": {
+                name: {"scale": RASTER_VARIABLES[name][0], "hours": variable_hours}
+                for name, variable_hours in hours.items()
+            },
+        },
+        headers=headers
+    )
+
+
+@router.get("/tiles/{version}/{variable}/{hour}/{z}/{x}/{y}.png")
+async def get_map_tile(version: str, variable: str, hour: int, z: int, x: int, y: int,
+                       request: Request):
+    """
+    PNG map tile (XYZ scheme) of one variable at one forecast hour, colored
+    with COLOR_SCALES; transparent outside the model grid
+    
+    A tile never changes for a given run version, so it may be cached
+    indefinitely. Tiles are rendered on first request and then served
+    from disk.
+    """
+    data = run_data.get(version)
+    field = data.fields.get(variable) if data is not None and variable in RASTER_VARIABLES else None
+    if (field is None or not 1 <= hour <= field.cube.shape[0]
+            or not 0 <= z <= settings.MAP_TILE_MAX_ZOOM or not (0 <= x < 1 << z and 0 <= y < 1 << z)):
+        raise HTTPException(status_code=404, detail="No such map tile")
+    
+    etag = make_etag("map-tile", version, variable, hour, z, x, y)
+    headers = cache_headers(etag, last_modified=data.run_datetime, max_age=7 * 86400)
+    headers["Cache-Control"] += ", immutable"
+    if is_not_modified(request, etag):
+        return not_modified_response(headers)
+    
+    path = await raster_tiles.get(data, variable, hour, z, x, y)
+    return FileResponse(path, media_type="image/png", headers=headers)
+
+
+@router.post("/batch")
+async def get_forecast_batch(body: BatchForecastRequest, request: Request):
+    """
+    Forecasts for several locations (catalog keys or coordinates) in one
+    columnar response, in request order
+    
+    Locations in the same model cells share one build of those cells, and
+    darkness is computed for every point in one pass. Unknown keys get a
+    null location and an entry in "errors" instead of failing the batch;
+    locations whose weather is unavailable upstream get the darkness-only
+    fallback of a single forecast, also noted in "errors". Such partial
+    batches are never cached.
+    (MessagePack when requested via Accept: application/msgpack.)
+    """
+    items = body.locations
+    if len(items) > settings.FORECAST_BATCH_MAX_LOCATIONS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"At most {settings.FORECAST_BATCH_MAX_LOCATIONS} locations per batch"
+        )
+    variant = forecast_variant("columnar", request)
+    
+    # Distinct locations by cache id: (location, summary, catalog key)
+    catalog = location_catalog.current
+    unique: Dict[str, tuple] = {}
+    slots: List[Optional[str]] = []
+    errors: List[Optional[str]] = []
+    for i, item in enumerate(items):
+        if item.key is not None:
+            db_location = catalog.get(item.key)
+            if db_location is None:
+                slots.append(None)
+                errors.append(f"Location '{item.key}' not found")
+                continue
+            cache_id = item.key
+            if cache_id not in unique:
+                unique[cache_id] = (ForecastLocation(db_location), db_to_summary(db_location), item.key)
+        elif item.lat is not None and item.lon is not None:
+            location = CoordsLocation(item.lat, item.lon, item.name, item.tz)
+            cache_id = location.cache_id
+            if cache_id not in unique:
+                unique[cache_id] = (location, location.summary(), None)
+        else:
+            raise HTTPException(status_code=422, detail=f"locations[{i}] needs a key, or lat and lon")
+        slots.append(cache_id)
+        errors.append(None)
+    
+    # One run for the whole batch, so locations are comparable
+    data = snapshot_store.active_run()
+    version = forecast_builder.data_version(data)
+    etag = make_etag(variant, "batch", *slots, data.version, *[dt.strftime("%Y%m%d%H") for dt in version[1:]])
+    now = datetime.now(timezone.utc)
+    headers = cache_headers(
+        etag,
+        last_modified=max(version),
+        max_age=(forecast_builder.next_data_change(version) - now).total_seconds()
+    )
+    for location, _, key in unique.values():
+        record_request(key, location.latitude, location.longitude)
+    if is_not_modified(request, etag, max(version)):
+        return not_modified_response(headers)
+    
+    encoded = forecast_cache.get(etag)
+    if encoded is None:
+        async def build() -> Tuple[EncodedResponse, bool]:
+            locations = [location for location, _, _ in unique.values()]
+            built, run_datetime = await forecast_builder.build_columns_many(locations, data, fallback=True)
+            by_id = dict(zip(unique, built))
+            slot_columns = [by_id[cache_id] if cache_id else None for cache_id in slots]
+            slot_errors = [
+                error if columns is None or columns.complete else "Weather data unavailable; darkness only"
+                for error, columns in zip(errors, slot_columns)
+            ]
+            encoded = await cpu_executor.run(
+                encode_batch, variant, slot_columns, run_datetime,
+                [unique[cache_id][1] if cache_id else None for cache_id in slots], slot_errors
+            )
+            return encoded, all(columns.complete for columns in built)
+        
+        kind = "keyed" if all(key for _, _, key in unique.values()) else "coords"
+        try:
+            encoded, complete = await admission.build(kind, etag, build)
+        except Overloaded as e:
+            raise HTTPException(
+                status_code=503,
+                detail="Forecast service is busy, please retry shortly",
+                headers={"Retry-After": str(e.retry_after)}
+            )
+        if not complete:
+            # Neither cached here nor by clients: the ETag stands for the full data
+            return encoded.to_response(request, {"Vary": "Accept, Accept-Encoding", "Cache-Control": "no-store"})
+        forecast_cache.set(etag, encoded)
+    return encoded.to_response(request, headers)
+
+
+# Handlers return pre-encoded bytes, so the model only documents the JSON format
+@router.get("/{key}", response_class=Response, responses={
+    200: {"model": ForecastResponse, "description": "Forecast; columnar arrays with format=columnar"}
+})
 async def get_forecast(
     key: str,
-    db: Session = Depends(get_db)
+    request: Request,
+    format: str = Query("json", regex="^(json|columnar)$")
 ):
     """
     Get forecast for a specific location by key
@@ -67,11 +432,11 @@ async def get_forecast(
     - Seeing
     - Darkness/moon phases
     - Wind, humidity, temperature
+    
+    With format=columnar, returns one array per field instead
+    (MessagePack when requested via Accept: application/msgpack).
     """
-    db_location = db.query(LocationDB).filter(
-        LocationDB.key == key,
-        LocationDB.is_active == 1
-    ).first()
+    db_location = location_catalog.current.get(key)
     
     if not db_location:
         raise HTTPException(status_code=404, detail=f"Location '{key}' not found")
@@ -79,49 +444,29 @@ async def get_forecast(
     # Create adapter for forecast builder
     location = ForecastLocation(db_location)
     
-    # Build forecast
-    forecast = await forecast_builder.build_forecast(location)
-    
-    # Update location in response to use summary format
-    forecast.location = db_to_summary(db_location)
+    variant = forecast_variant(format, request)
     
-    return forecast
+    # Served from pre-encoded bytes; validation happened when it was built
+    return await serve_forecast(
+        request, location, db_to_summary(db_location), variant, snapshot_key=key
+    )
 
 
 @router.get("/coords/")
 async def get_forecast_by_coords(
+    request: Request,
     lat: float = Query(..., ge=-90, le=90, description="Latitude"),
     lon: float = Query(..., ge=-180, le=180, description="Longitude"),
     name: Optional[str] = Query(None, description="Location name"),
-    tz: str = Query("America/New_York", description="Timezone")
+    tz: str = Query("America/New_York", description="Timezone"),
+    format: str = Query("json", regex="^(json|columnar)$")
 ):
     """
     Get forecast for arbitrary coordinates
     
     Use this for locations not in the database.
     """
-    class TempLocation:
-        def __init__(self):
-            self.id = f"custom-{lat:.4f}-{lon:.4f}"
-            self.name = name or f"Custom Location ({lat:.2f}, {lon:.2f})"
-            self.latitude = lat
-            self.longitude = lon
-            self.elevation = None
-            self.tz_offset = get_timezone_offset(tz)
-            self.created_at = datetime.utcnow()
-    
-    location = TempLocation()
-    forecast = await forecast_builder.build_forecast(location)
-    
-    # Create summary
-    forecast.location = LocationSummary(
-        key=location.id,
-        name=location.name,
-        country="Custom",
-        region=None,
-        category=None,
-        latitude=lat,
-        longitude=lon
-    )
+    location = CoordsLocation(lat, lon, name, tz)
+    variant = forecast_variant(format, request)
     
-    return forecast
+    return await serve_forecast(request, location, location.summary(), variant, location.cache_id)
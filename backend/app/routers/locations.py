@@ -2,20 +2,32 @@
 Locations API Router
 """
 
-from fastapi import APIRouter, HTTPException, Depends, Query
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Iterator, List, Optional, Union
 from datetime import datetime
-import math
+import base64
+import binascii
+import json
 
-from ..database import get_db, LocationDB
+from ..database import get_async_write_db, LocationDB
+from .. import queries
 from ..models import Location, LocationCreate, LocationSummary
+from ..services.catalog import location_catalog, Catalog, CatalogLocation, ListingKey
+from ..config import settings
+from ..services.facets import Facet
+from ..services.location_tiles import location_tiles, TILE_MAX_AGE
+from ..services.response_cache import (
+    encode_json, encoded_json, location_response_cache, make_etag,
+    cache_headers, is_not_modified, not_modified_response
+)
 
 router = APIRouter()
 
 
-def db_to_location(db_loc: LocationDB) -> Location:
-    """Convert database model to Pydantic model"""
+def db_to_location(db_loc: Union[LocationDB, CatalogLocation]) -> Location:
+    """Convert database model (or catalog record) to Pydantic model"""
     return Location(
         id=db_loc.id,
         key=db_loc.key,
@@ -33,7 +45,7 @@ def db_to_location(db_loc: LocationDB) -> Location:
     )
 
 
-def db_to_summary(db_loc: LocationDB) -> LocationSummary:
+def db_to_summary(db_loc: Union[LocationDB, CatalogLocation]) -> LocationSummary:
     """Convert database model to lightweight summary"""
     return LocationSummary(
         key=db_loc.key,
@@ -46,98 +58,115 @@ def db_to_summary(db_loc: LocationDB) -> LocationSummary:
     )
 
 
+# Fields of LocationSummary, in export column order
+EXPORT_FIELDS = ("key", "name", "country", "region", "category", "latitude", "longitude")
+EXPORT_CHUNK_SIZE = 500
+
+
+def encode_cursor(key: ListingKey) -> str:
+    return base64.urlsafe_b64encode(json.dumps(key, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> ListingKey:
+    """Listing key of the last location on the previous page"""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        country, region, name, location_id = key
+        if isinstance(location_id, int) and all(isinstance(v, str) for v in (country, region, name)):
+            return (country, region, name, location_id)
+    except (binascii.Error, ValueError, TypeError):
+        pass
+    raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
 @router.get("/", response_model=List[LocationSummary])
 async def list_locations(
+    request: Request,
     country: Optional[str] = None,
     region: Optional[str] = None,
     category: Optional[str] = None,
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    skip: int = Query(0, ge=0, description="Offset paging; prefer cursor"),
+    limit: int = Query(100, ge=1)
 ):
-    """List all locations with optional filters"""
-    query = db.query(LocationDB).filter(LocationDB.is_active == 1)
+    """
+    List locations ordered by country, region, name, with optional filters
     
-    if country:
-        query = query.filter(LocationDB.country == country)
-    if region:
-        query = query.filter(LocationDB.region == region)
-    if category:
-        query = query.filter(LocationDB.category == category)
+    Pages are keyset-paginated: when more follow, the response carries
+    X-Next-Cursor and a Link rel="next" header for the next page.
+    """
+    catalog = location_catalog.current
+    cache_key = f"list:{catalog.version}:{country}:{region}:{category}:{cursor}:{skip}:{limit}"
+    cached = location_response_cache.get(cache_key)
+    if cached is None:
+        after = decode_cursor(cursor) if cursor else None
+        locations, more = catalog.page(country, region, category, after=after, skip=skip, limit=limit)
+        next_cursor = encode_cursor(locations[-1].listing_key) if more else None
+        cached = (encoded_json([db_to_summary(loc).model_dump() for loc in locations]), next_cursor)
+        location_response_cache.set(cache_key, cached)
     
-    locations = query.offset(skip).limit(limit).all()
-    return [db_to_summary(loc) for loc in locations]
+    encoded, next_cursor = cached
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    if next_cursor:
+        next_url = request.url.remove_query_params("skip").include_query_params(cursor=next_cursor)
+        headers["X-Next-Cursor"] = next_cursor
+        headers["Link"] = f'<{next_url}>; rel="next"'
+    return encoded.to_response(request, headers)
+
+
+def export_ndjson(catalog: Catalog) -> Iterator[bytes]:
+    """One JSON object per line, in chunks of lines"""
+    listing = catalog.listing
+    for start in range(0, len(listing), EXPORT_CHUNK_SIZE):
+        yield b"".join(
+            encode_json({field: getattr(loc, field) for field in EXPORT_FIELDS}) + b"\n"
+            for loc in listing[start:start + EXPORT_CHUNK_SIZE]
+        )
+
+
+def export_columnar(catalog: Catalog) -> Iterator[bytes]:
+    """{"count": n, "fields": [...], "columns": {field: [values...]}}, a column at a time"""
+    listing = catalog.listing
+    yield b'{"count":' + encode_json(len(listing)) + b',"fields":' + encode_json(EXPORT_FIELDS) + b',"columns":{'
+    for i, field in enumerate(EXPORT_FIELDS):
+        yield (b"," if i else b"") + encode_json(field) + b":" + encode_json([getattr(loc, field) for loc in listing])
+    yield b"}}"
+
+
+def serve_facet(request: Request, facet: Facet):
+    """Pre-encoded facet counts, or 304 when the client's copy is current"""
+    etag, encoded = facet
+    headers = cache_headers(etag)
+    if is_not_modified(request, etag):
+        return not_modified_response(headers)
+    return encoded.to_response(request, headers)
 
 
 @router.get("/countries")
-async def list_countries(db: Session = Depends(get_db)):
+async def list_countries(request: Request):
     """List all countries with location counts"""
-    results = db.query(
-        LocationDB.country,
-    ).filter(LocationDB.is_active == 1).group_by(LocationDB.country).all()
-    
-    countries = []
-    for (country,) in results:
-        count = db.query(LocationDB).filter(
-            LocationDB.country == country,
-            LocationDB.is_active == 1
-        ).count()
-        countries.append({"country": country, "count": count})
-    
-    return sorted(countries, key=lambda x: x["country"])
+    return serve_facet(request, location_catalog.current.facets.countries)
 
 
 @router.get("/regions/{country}")
-async def list_regions(country: str, db: Session = Depends(get_db)):
+async def list_regions(country: str, request: Request):
     """List regions for a country"""
-    results = db.query(LocationDB.region).filter(
-        LocationDB.country == country,
-        LocationDB.is_active == 1,
-        LocationDB.region.isnot(None)
-    ).distinct().all()
-    
-    regions = []
-    for (region,) in results:
-        count = db.query(LocationDB).filter(
-            LocationDB.country == country,
-            LocationDB.region == region,
-            LocationDB.is_active == 1
-        ).count()
-        regions.append({"region": region, "count": count})
-    
-    return sorted(regions, key=lambda x: x["region"])
+    return serve_facet(request, location_catalog.current.facets.regions(country))
 
 
 @router.get("/categories")
-async def list_categories(db: Session = Depends(get_db)):
+async def list_categories(request: Request):
     """List all categories with counts"""
-    results = db.query(LocationDB.category).filter(
-        LocationDB.is_active == 1,
-        LocationDB.category.isnot(None)
-    ).distinct().all()
-    
-    categories = []
-    for (category,) in results:
-        count = db.query(LocationDB).filter(
-            LocationDB.category == category,
-            LocationDB.is_active == 1
-        ).count()
-        categories.append({"category": category, "count": count})
-    
-    return sorted(categories, key=lambda x: x["category"])
+    return serve_facet(request, location_catalog.current.facets.categories)
 
 
 @router.get("/search")
 async def search_locations(
     q: str = Query(..., min_length=2, description="Search query"),
-    limit: int = Query(20, ge=1, le=100),
-    db: Session = Depends(get_db)
+    limit: int = Query(20, ge=1, le=100)
 ):
-    """Search locations by name"""
-    locations = db.query(LocationDB).filter(
-        LocationDB.is_active == 1,
-        LocationDB.name.ilike(f"%{q}%")
-    ).limit(limit).all()
+    """Autocomplete: locations ranked by name prefix, word prefix, typo-tolerant match, popularity"""
+    locations = location_catalog.current.search(q, limit)
     
     return [db_to_summary(loc) for loc in locations]
 
@@ -147,38 +176,55 @@ async def search_nearby(
     lat: float = Query(..., ge=-90, le=90),
     lon: float = Query(..., ge=-180, le=180),
     radius_km: float = Query(50, ge=1, le=500),
-    limit: int = Query(10, ge=1, le=50),
-    db: Session = Depends(get_db)
+    limit: int = Query(10, ge=1, le=50)
 ):
-    """Find locations near a point"""
-    all_locations = db.query(LocationDB).filter(LocationDB.is_active == 1).all()
+    """Find locations near a point, nearest first (great-circle distance)"""
+    return [
+        {"location": db_to_summary(loc), "distance_km": round(distance, 1)}
+        for loc, distance in location_catalog.current.spatial_index.within(lat, lon, radius_km, limit)
+    ]
+
+
+@router.get("/export")
+async def export_locations(
+    request: Request,
+    format: str = Query("ndjson", regex="^(ndjson|columnar)$")
+):
+    """
+    Every active location in one streamed response, for full-catalog
+    consumers such as maps: NDJSON (one object per line) or columnar JSON
+    """
+    catalog = location_catalog.current
+    etag = make_etag("export", format, catalog.version)
+    headers = cache_headers(etag)
+    if is_not_modified(request, etag):
+        return not_modified_response(headers)
     
-    results = []
-    for loc in all_locations:
-        lat_diff = (loc.latitude - lat) * 111
-        lon_diff = (loc.longitude - lon) * 111 * math.cos(math.radians(lat))
-        distance = math.sqrt(lat_diff**2 + lon_diff**2)
-        
-        if distance <= radius_km:
-            results.append({
-                "location": db_to_summary(loc),
-                "distance_km": round(distance, 1)
-            })
+    if format == "columnar":
+        return StreamingResponse(export_columnar(catalog), media_type="application/json", headers=headers)
+    return StreamingResponse(export_ndjson(catalog), media_type="application/x-ndjson", headers=headers)
+
+
+@router.get("/tiles/{z}/{x}/{y}")
+async def location_tile(z: int, x: int, y: int, request: Request):
+    """
+    GeoJSON map tile (XYZ scheme) of active locations with tonight's
+    clear dark hours and best seeing; clustered at low zoom
+    """
+    if not 0 <= z <= settings.LOCATION_TILE_MAX_ZOOM or not (0 <= x < 1 << z and 0 <= y < 1 << z):
+        raise HTTPException(status_code=404, detail=f"No tile {z}/{x}/{y}")
     
-    results.sort(key=lambda x: x["distance_km"])
-    return results[:limit]
+    etag, encoded = location_tiles.get(z, x, y)
+    headers = cache_headers(etag, max_age=TILE_MAX_AGE)
+    if is_not_modified(request, etag):
+        return not_modified_response(headers)
+    return encoded.to_response(request, headers)
 
 
 @router.get("/{key}", response_model=Location)
-async def get_location(
-    key: str,
-    db: Session = Depends(get_db)
-):
+async def get_location(key: str):
     """Get a specific location by key"""
-    location = db.query(LocationDB).filter(
-        LocationDB.key == key,
-        LocationDB.is_active == 1
-    ).first()
+    location = location_catalog.current.get(key)
     
     if not location:
         raise HTTPException(status_code=404, detail=f"Location '{key}' not found")
@@ -189,10 +235,10 @@ async def get_location(
 @router.post("/", response_model=Location)
 async def create_location(
     location: LocationCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_write_db)
 ):
     """Create a new location"""
-    existing = db.query(LocationDB).filter(LocationDB.key == location.key).first()
+    existing = (await db.scalars(queries.location_by_key(location.key, active_only=False))).first()
     if existing:
         raise HTTPException(
             status_code=400, 
@@ -215,8 +261,9 @@ async def create_location(
     )
     
     db.add(db_location)
-    db.commit()
-    db.refresh(db_location)
+    await db.commit()
+    await db.refresh(db_location)
+    await location_catalog.refresh()
     
     return db_to_location(db_location)
 
@@ -224,15 +271,16 @@ async def create_location(
 @router.delete("/{key}")
 async def delete_location(
     key: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_write_db)
 ):
     """Soft delete a location"""
-    location = db.query(LocationDB).filter(LocationDB.key == key).first()
+    location = (await db.scalars(queries.location_by_key(key, active_only=False))).first()
     
     if not location:
         raise HTTPException(status_code=404, detail=f"Location '{key}' not found")
     
     location.is_active = 0
-    db.commit()
+    await db.commit()
+    await location_catalog.refresh()
     
     return {"message": f"Location '{key}' deleted"}
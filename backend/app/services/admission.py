@@ -0,0 +1,196 @@
+"""
+Admission Control Service
+Limits how many cold forecast builds run at once, per request class
+
+Catalog locations ("keyed") and arbitrary coordinates ("coords") have
+separate budgets, so a crawler walking random coordinates cannot starve
+the catalog or burn the upstream quota. Each budget allows a fixed number
+of concurrent builds and a bounded queue behind them; anything beyond that
+is shed and the caller answers with a stale response or 503 + Retry-After.
+"""
+
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class Overloaded(Exception):
+    """A build was shed; retry_after is a hint in whole seconds"""
+
+    def __init__(self, kind: str, retry_after: int):
+        super().__init__(f"{kind} builds over capacity")
+        self.kind = kind
+        self.retry_after = retry_after
+
+
+class BuildBudget:
+    """Concurrency limit plus a bounded FIFO queue for one request class"""
+
+    def __init__(self, kind: str, max_concurrent: int, max_queued: int, queue_timeout: float):
+        self.kind = kind
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queued = max(0, max_queued)
+        self.queue_timeout = queue_timeout
+
+        self.running = 0
+        self._waiters: "deque[asyncio.Future]" = deque()
+
+        self.admitted = 0
+        self.shed = 0
+        self.timed_out = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self._build_seconds = deque(maxlen=50)
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        """Seconds until a new request would likely be admitted"""
+        avg_build = (sum(self._build_seconds) / len(self._build_seconds)
+                     if self._build_seconds else 1.0)
+        rounds = (self.queued + self.max_concurrent) / self.max_concurrent
+        return max(1, math.ceil(avg_build * rounds))
+
+    async def acquire(self):
+        if self.running < self.max_concurrent and not self._waiters:
+            self.running += 1
+            self.admitted += 1
+            return
+        if self.queued >= self.max_queued:
+            self.shed += 1
+            raise Overloaded(self.kind, self.retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        queued_at = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if not waiter.done():
+                self._abandon(waiter)
+                self.shed += 1
+                self.timed_out += 1
+                raise Overloaded(self.kind, self.retry_after())
+            # Handed a slot just as the wait ran out: keep it
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                self.release()  # Pass on the slot we were handed
+            else:
+                self._abandon(waiter)
+            raise
+        waited = time.monotonic() - queued_at
+        self.wait_seconds += waited
+        self.max_wait_seconds = max(self.max_wait_seconds, waited)
+        self.admitted += 1
+
+    def _abandon(self, waiter: asyncio.Future):
+        waiter.cancel()
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def release(self, build_seconds: Optional[float] = None):
+        if build_seconds is not None:
+            self._build_seconds.append(build_seconds)
+        # Hand the slot straight to the oldest waiter, keeping running constant
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(True)
+                return
+        self.running -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        admitted = self.admitted
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queued": self.max_queued,
+            "running": self.running,
+            "queued": self.queued,
+            "admitted": admitted,
+            "shed": self.shed,
+            "timed_out": self.timed_out,
+            "avg_wait_ms": round(1000 * self.wait_seconds / admitted, 1) if admitted else 0.0,
+            "max_wait_ms": round(1000 * self.max_wait_seconds, 1),
+            "retry_after": self.retry_after(),
+        }
+
+
+class AdmissionController:
+    """Build budgets by request class, plus coalescing of identical builds"""
+
+    def __init__(self):
+        self.budgets = {
+            "keyed": BuildBudget(
+                "keyed", settings.ADMISSION_KEYED_CONCURRENCY,
+                settings.ADMISSION_KEYED_QUEUE, settings.ADMISSION_QUEUE_TIMEOUT
+            ),
+            "coords": BuildBudget(
+                "coords", settings.ADMISSION_COORDS_CONCURRENCY,
+                settings.ADMISSION_COORDS_QUEUE, settings.ADMISSION_QUEUE_TIMEOUT
+            ),
+        }
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.coalesced = 0
+        self.served_stale = 0
+
+    @asynccontextmanager
+    async def slot(self, kind: str):
+        """Hold one build slot of a class; raises Overloaded when shed"""
+        budget = self.budgets[kind]
+        await budget.acquire()
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            budget.release(time.monotonic() - started)
+
+    async def build(self, kind: str, key: str, factory):
+        """
+        Run factory() under the class budget, unless a build for the same
+        key is already running, in which case share its result
+
+        The build runs in its own task and every caller awaits it through
+        shield(), so a caller that is cancelled (client disconnected) only
+        stops waiting; the build and the other callers carry on.
+        """
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(self._run(kind, factory))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        return await asyncio.shield(task)
+
+    async def _run(self, kind: str, factory):
+        async with self.slot(kind):
+            return await factory()
+
+    def _finished(self, key: str, task: asyncio.Future):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark retrieved so a build nobody awaits any more doesn't log a warning
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "coalesced": self.coalesced,
+            "served_stale": self.served_stale,
+            **{kind: budget.stats() for kind, budget in self.budgets.items()},
+        }
+
+
+admission = AdmissionController()
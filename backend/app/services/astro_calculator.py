@@ -8,6 +8,10 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 import logging
 
+import numpy as np
+
+from . import classification
+
 logger = logging.getLogger(__name__)
 
 
@@ -212,20 +216,8 @@ class AstroCalculator:
         
         Matches Clear Sky Chart color scale
         """
-        if limiting_mag < -3:
-            return "daylight"      # White
-        elif limiting_mag < -1:
-            return "dusk"          # Yellow
-        elif limiting_mag < 1:
-            return "twilight"      # Light turquoise
-        elif limiting_mag < 3:
-            return "bright_moon"   # Light blue
-        elif limiting_mag < 4.5:
-            return "partial_moon"  # Medium blue
-        elif limiting_mag < 5.5:
-            return "dim_moon"      # Deep blue
-        else:
-            return "dark"          # Black/very dark blue
+        code = classification.darkness_category([limiting_mag])
+        return classification.DARKNESS_CATEGORIES[code[0]]
     
     def calculate_hourly_darkness(self, start_time: datetime, 
                                    hours: int = 84) -> List[Dict]:
@@ -241,15 +233,128 @@ class AstroCalculator:
             darkness = self.calculate_darkness(current)
             darkness["time"] = current.isoformat()
             darkness["hour"] = i
-            darkness["color_code"] = self.get_darkness_color_code(
-                darkness["limiting_mag"]
-            )
             results.append(darkness)
             current += timedelta(hours=1)
         
+        codes = classification.darkness_category([d["limiting_mag"] for d in results])
+        for darkness, code in zip(results, codes.tolist()):
+            darkness["color_code"] = classification.DARKNESS_CATEGORIES[code]
+        
         return results
 
 
+def _refraction(apparent_alt: np.ndarray, pressure: float = 1010.0,
+                temp: float = 15.0) -> np.ndarray:
+    """Refraction in degrees at an apparent altitude (libastro's model)"""
+    low = (((2e-5 * apparent_alt + 1.96e-2) * apparent_alt + 1.594e-1) * pressure /
+           ((273 + temp) * ((8.45e-2 * apparent_alt + 5.05e-1) * apparent_alt + 1)))
+    low = np.where((apparent_alt < 0) & (low < 0), 0.0, low)
+    high = np.degrees(7.888888e-5 * pressure /
+                      ((273 + temp) * np.tan(np.radians(np.maximum(apparent_alt, 1.0)))))
+    blend = np.clip(apparent_alt - 14.5, 0, 1)
+    return low * (1 - blend) + high * blend
+
+
+def _apparent_altitude(true_alt: np.ndarray) -> np.ndarray:
+    """Refract true altitudes the way ephem does for its default observer"""
+    alt = true_alt
+    for _ in range(8):
+        alt = true_alt + _refraction(alt)
+    return alt
+
+
+def limiting_magnitude(sun_alt: np.ndarray, moon_alt: np.ndarray,
+                       moon_phase: np.ndarray, times: List[datetime]) -> np.ndarray:
+    """
+    Vectorized AstroCalculator._calculate_limiting_magnitude
+    
+    Altitude arrays are (points, hours); times has one entry per hour.
+    """
+    base_mag = np.full(sun_alt.shape, 7.0)
+    base_mag = np.where(sun_alt > -18, 5.5 + (sun_alt + 18) * -0.58, base_mag)
+    base_mag = np.where(sun_alt > -12, 2.0 + (sun_alt + 12) * -0.67, base_mag)
+    base_mag = np.where(sun_alt > -6, -2.0 + (sun_alt + 6) * -0.33, base_mag)
+    
+    moon_brightness = moon_phase * (1 + 0.5 * np.sin(np.radians(moon_alt)))
+    base_mag = base_mag - np.where(moon_alt > 0, moon_brightness * 2.5, 0.0)
+    
+    years_from_max = np.abs(np.array([dt.year + dt.month / 12 for dt in times]) -
+                            AstroCalculator.SOLAR_CYCLE_REF)
+    cycle_phase = np.cos(2 * np.pi * years_from_max / AstroCalculator.SOLAR_CYCLE_YEARS)
+    base_mag = base_mag - 0.1 * (1 + cycle_phase) / 2
+    
+    return np.where(sun_alt > 0, -4.0, np.clip(base_mag, -4.0, 7.0))
+
+
+def calculate_darkness_batch(lats, lons, start_time: datetime,
+                             hours: int = 84) -> Dict[str, np.ndarray]:
+    """
+    Darkness for many points at once, as (points, hours) arrays
+    
+    Sun and Moon positions are computed once per hour (geocentric); only
+    the altitude transform runs per point, vectorized. Topocentric lunar
+    parallax and refraction are applied to match AstroCalculator's ephem
+    path to within a few hundredths of a degree.
+    
+    Returns limiting_mag, is_daylight, moon_illumination
+    """
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    times = [start_time + timedelta(hours=i) for i in range(hours)]
+    
+    try:
+        import ephem
+    except ImportError:
+        # Simplified per-point path; slow, but only without ephem
+        results = [
+            create_calculator(lat, lon).calculate_hourly_darkness(start_time, hours)
+            for lat, lon in zip(lats.tolist(), lons.tolist())
+        ]
+        return {
+            name: np.array([[d[name] for d in r] for r in results]).reshape(len(lats), hours)
+            for name in ("limiting_mag", "is_daylight", "moon_illumination")
+        }
+    
+    observer = ephem.Observer()
+    observer.lat = 0.0
+    observer.lon = 0.0
+    sun = ephem.Sun()
+    moon = ephem.Moon()
+    
+    sidereal = np.empty(hours)
+    sun_ra, sun_dec = np.empty(hours), np.empty(hours)
+    moon_ra, moon_dec = np.empty(hours), np.empty(hours)
+    moon_parallax, moon_phase = np.empty(hours), np.empty(hours)
+    for i, dt in enumerate(times):
+        observer.date = ephem.Date(dt.replace(tzinfo=None))
+        sun.compute(observer)
+        moon.compute(observer)
+        sidereal[i] = observer.sidereal_time()
+        sun_ra[i], sun_dec[i] = sun.g_ra, sun.g_dec
+        moon_ra[i], moon_dec[i] = moon.g_ra, moon.g_dec
+        moon_parallax[i] = math.asin(ephem.earth_radius / (moon.earth_distance * ephem.meters_per_au))
+        moon_phase[i] = moon.phase / 100.0
+    
+    lat = np.radians(lats)[:, None]
+    lon = np.radians(lons)[:, None]
+    
+    def altitude(ra: np.ndarray, dec: np.ndarray) -> np.ndarray:
+        hour_angle = sidereal + lon - ra
+        sin_alt = np.sin(lat) * np.sin(dec) + np.cos(lat) * np.cos(dec) * np.cos(hour_angle)
+        return np.arcsin(np.clip(sin_alt, -1, 1))
+    
+    sun_alt = _apparent_altitude(np.degrees(altitude(sun_ra, sun_dec)))
+    moon_geo = altitude(moon_ra, moon_dec)
+    moon_alt = _apparent_altitude(np.degrees(moon_geo - moon_parallax * np.cos(moon_geo)))
+    phase = np.broadcast_to(moon_phase, sun_alt.shape)
+    
+    return {
+        "limiting_mag": limiting_magnitude(sun_alt, moon_alt, phase, times),
+        "is_daylight": sun_alt > 0,
+        "moon_illumination": phase,
+    }
+
+
 # Factory function
 def create_calculator(lat: float, lon: float, elevation: float = 0) -> AstroCalculator:
     return AstroCalculator(lat, lon, elevation)
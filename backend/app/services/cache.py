@@ -0,0 +1,188 @@
+"""
+In-Memory Cache Service
+LRU cache with per-entry TTL and optional JSON persistence across restarts
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from itertools import islice
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache where every entry carries its own expiry.
+
+    Failures can be cached too (negative caching) by storing the failure
+    value with a shorter TTL. Expiry times are wall-clock epochs so a
+    persisted cache stays valid across restarts.
+
+    With a hotness function, entries may be stored with a hot key (e.g. the
+    location they belong to). When full, the cache evicts the coldest of
+    its eviction_samples least recently used entries instead of the very
+    oldest, so popular entries survive a burst of one-off keys.
+    """
+
+    def __init__(self, max_entries: int, ttl: float,
+                 persist_path: Optional[Path] = None,
+                 persist_interval: float = 300,
+                 hotness: Optional[Callable[[Optional[str]], float]] = None,
+                 eviction_samples: int = 8):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.persist_path = Path(persist_path) if persist_path else None
+        self.persist_interval = persist_interval
+        self.hotness = hotness
+        self.eviction_samples = eviction_samples
+
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._hot_keys: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_saved = time.time()
+
+        self.hits = 0
+        self.misses = 0
+
+        if self.persist_path:
+            self.load()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self._hot_keys.pop(key, None)
+                self._dirty = True
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None,
+            hot_key: Optional[str] = None):
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            if hot_key is not None:
+                self._hot_keys[key] = hot_key
+            while len(self._entries) > self.max_entries:
+                self._evict_one()
+            self._dirty = True
+
+    def save_due(self) -> bool:
+        """
+        True once persist_interval has passed since the last save
+
+        Saving is left to the owner (the scheduler flushes due caches from
+        a worker thread), so set() never blocks on disk.
+        """
+        return bool(self.persist_path) and time.time() - self._last_saved >= self.persist_interval
+
+    def _evict_one(self):
+        """Drop one entry to make room (lock held)"""
+        if self.hotness is None or not self._hot_keys:
+            key, _ = self._entries.popitem(last=False)
+            self._hot_keys.pop(key, None)
+            return
+        now = time.time()
+        victim, coldest = None, None
+        for key, (expires_at, _) in islice(self._entries.items(), self.eviction_samples):
+            if expires_at <= now:
+                victim = key
+                break
+            score = self.hotness(self._hot_keys.get(key))
+            if coldest is None or score < coldest:
+                victim, coldest = key, score
+        del self._entries[victim]
+        self._hot_keys.pop(victim, None)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._hot_keys.pop(key, None)
+            if self._entries.pop(key, None) is not None:
+                self._dirty = True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._hot_keys.clear()
+            self._dirty = True
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry[0] > time.time()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def load(self):
+        """Load persisted entries, dropping anything already expired"""
+        if not self.persist_path or not self.persist_path.exists():
+            return
+        try:
+            with open(self.persist_path) as f:
+                raw = json.load(f)
+        except Exception as e:
+            logger.warning(f"Could not load cache file {self.persist_path}: {e}")
+            return
+
+        now = time.time()
+        with self._lock:
+            # Persisted oldest-first, so insertion order restores LRU order
+            for key, (expires_at, value, *hot_key) in raw.items():
+                if expires_at > now:
+                    self._entries[key] = (expires_at, value)
+                    if hot_key:
+                        self._hot_keys[key] = hot_key[0]
+            while len(self._entries) > self.max_entries:
+                self._evict_one()
+        logger.info(f"Loaded {len(self._entries)} cache entries from {self.persist_path.name}")
+
+    def save(self):
+        """Write entries to disk atomically (temp file + rename)"""
+        if not self.persist_path:
+            return
+        now = time.time()
+        with self._lock:
+            if not self._dirty:
+                self._last_saved = now
+                return
+            snapshot = {
+                key: [expires_at, value] + ([self._hot_keys[key]] if key in self._hot_keys else [])
+                for key, (expires_at, value) in self._entries.items()
+                if expires_at > now
+            }
+            self._dirty = False
+            self._last_saved = now
+
+        try:
+            self.persist_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.persist_path.with_suffix(".tmp")
+            with open(tmp_path, "w") as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, self.persist_path)
+        except Exception as e:
+            logger.error(f"Could not save cache file {self.persist_path}: {e}")
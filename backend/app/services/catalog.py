@@ -0,0 +1,195 @@
+"""
+Location Catalog Service
+Immutable in-memory copy of the active locations, shared by all routers
+
+Reads (lookups by key or id, listings, facets, search, nearby) are served
+from the current Catalog; SQLite is only used for writes. A new Catalog is
+built on startup, after the API's own writes, and whenever the
+location_revision counter (bumped by triggers on every change to
+locations, including seeding from scripts) moves on. The search and
+spatial indexes are part of each Catalog, and publishing is a single
+assignment, so readers see either the old or the new catalog whole.
+"""
+
+import asyncio
+import hashlib
+import logging
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple, Union
+
+from ..config import settings
+from ..database import AsyncSessionLocal
+from ..queries import (
+    active_locations, location_revision, country_counts, region_counts, category_counts
+)
+from .executors import cpu_executor
+from .facets import FacetSnapshot
+from .search_index import build_search_index
+from .response_cache import location_response_cache
+from .spatial_index import SpatialGrid
+
+logger = logging.getLogger(__name__)
+
+# Attempts at a load during which the revision did not change
+LOAD_ATTEMPTS = 3
+
+ListingKey = Tuple[str, str, str, int]
+
+
+class CatalogLocation:
+    """One active location; attributes mirror LocationDB and are read-only"""
+
+    __slots__ = (
+        "id", "key", "name", "latitude", "longitude", "country", "region", "category",
+        "description", "timezone", "elevation", "is_active", "created_at",
+    )
+
+    def __init__(self, row):
+        for field in self.__slots__:
+            object.__setattr__(self, field, getattr(row, field))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"CatalogLocation is read-only (cannot set {name})")
+
+    def __repr__(self) -> str:
+        return f"<CatalogLocation {self.key}>"
+
+    @property
+    def listing_key(self) -> ListingKey:
+        """Position in listings: (country, region, name, id)"""
+        return (self.country, self.region or "", self.name, self.id)
+
+
+class Catalog:
+    """One immutable build of the catalog"""
+
+    def __init__(self, rows, revision: int, facets: Optional[FacetSnapshot] = None):
+        self.revision = revision
+        self.facets = facets or FacetSnapshot.empty()
+        self.loaded_at = datetime.utcnow()
+        # Table order, as the API returned them when it read SQLite directly
+        self.locations: Tuple[CatalogLocation, ...] = tuple(
+            sorted((CatalogLocation(row) for row in rows), key=lambda loc: loc.id)
+        )
+        self.by_key: Dict[str, CatalogLocation] = {loc.key: loc for loc in self.locations}
+        self.by_id: Dict[int, CatalogLocation] = {loc.id: loc for loc in self.locations}
+
+        # Listing order, with the keys alongside for keyset pagination
+        self.listing: Tuple[CatalogLocation, ...] = tuple(sorted(self.locations, key=lambda loc: loc.listing_key))
+        self._listing_keys: List[ListingKey] = [loc.listing_key for loc in self.listing]
+
+        # Country slices of the listing: country is the leading sort key
+        self._country_slices: Dict[str, Tuple[int, int]] = {}
+        for i, loc in enumerate(self.listing):
+            first, _ = self._country_slices.get(loc.country, (i, i))
+            self._country_slices[loc.country] = (first, i + 1)
+
+        # Changes whenever any served field does, for ETags
+        digest = hashlib.sha1()
+        for loc in self.listing:
+            digest.update(repr([getattr(loc, field) for field in CatalogLocation.__slots__]).encode())
+        self.version = digest.hexdigest()[:16]
+        self.search_index = build_search_index(self.locations)
+        self.spatial_index = SpatialGrid(
+            [(loc.latitude, loc.longitude, loc) for loc in self.locations],
+            settings.LOCATION_INDEX_CELL_DEG
+        )
+
+    def __len__(self) -> int:
+        return len(self.locations)
+
+    def get(self, key: str) -> Optional[CatalogLocation]:
+        return self.by_key.get(key)
+
+    def get_by_id(self, location_id: Union[int, str]) -> Optional[CatalogLocation]:
+        try:
+            return self.by_id.get(int(location_id))
+        except (TypeError, ValueError):
+            return None
+
+    def page(self, country: Optional[str] = None, region: Optional[str] = None,
+             category: Optional[str] = None, after: Optional[ListingKey] = None,
+             skip: int = 0, limit: int = 100) -> Tuple[List[CatalogLocation], bool]:
+        """
+        Up to limit matching locations in listing order, starting after the
+        listing key `after` (keyset) or skipping `skip` matches (offset), and
+        whether more follow
+        """
+        start, stop = self._country_slices.get(country, (0, 0)) if country else (0, len(self.listing))
+        if country and region:
+            # Region is the second sort key, so it's a slice as well
+            start = max(start, bisect_left(self._listing_keys, (country, region)))
+            stop = min(stop, bisect_left(self._listing_keys, (country, region + "\x00")))
+        if after is not None:
+            start = max(start, bisect_right(self._listing_keys, tuple(after)))
+
+        results = []
+        for i in range(start, stop):
+            loc = self.listing[i]
+            if region and loc.region != region:
+                continue
+            if category and loc.category != category:
+                continue
+            if skip:
+                skip -= 1
+                continue
+            if len(results) == limit:
+                return results, True
+            results.append(loc)
+        return results, False
+
+    def search(self, q: str, limit: int) -> List[CatalogLocation]:
+        """Ranked autocomplete over name, key, region and description"""
+        return self.search_index.search(q, limit)
+
+
+class LocationCatalog:
+    """Holder for the current Catalog"""
+
+    def __init__(self):
+        self._current = Catalog([], revision=-1)
+        self._refresh_lock = asyncio.Lock()
+
+    @property
+    def current(self) -> Catalog:
+        return self._current
+
+    async def _revision(self) -> int:
+        """location_revision, read in a transaction of its own"""
+        async with AsyncSessionLocal() as db:
+            return (await db.scalar(location_revision())) or 0
+
+    async def refresh(self):
+        """Rebuild from the database and publish"""
+        # Serialized, so an older read can't be published over a newer one
+        async with self._refresh_lock:
+            for attempt in range(LOAD_ATTEMPTS):
+                revision = await self._revision()
+                async with AsyncSessionLocal() as db:
+                    rows = (await db.scalars(active_locations())).all()
+                    # One GROUP BY per facet, alongside the rows they count
+                    countries = (await db.execute(country_counts())).all()
+                    regions = (await db.execute(region_counts())).all()
+                    categories = (await db.execute(category_counts())).all()
+                # Each SELECT is its own read, so make sure no write landed between them
+                if await self._revision() == revision:
+                    break
+                logger.info("Locations changed while loading the catalog; reloading")
+            facets = await cpu_executor.run(FacetSnapshot, countries, regions, categories)
+            catalog = await cpu_executor.run(Catalog, rows, revision, facets)
+            self._current = catalog
+            location_response_cache.clear()
+            logger.info(f"Loaded location catalog revision {revision}: {len(catalog)} active locations")
+
+    async def refresh_popularity(self):
+        """Let search ranking follow recent request counts"""
+        await cpu_executor.run(self._current.search_index.refresh_popularity)
+
+    async def check(self):
+        """Rebuild if locations changed since the current catalog was read"""
+        if await self._revision() != self._current.revision:
+            await self.refresh()
+
+
+location_catalog = LocationCatalog()
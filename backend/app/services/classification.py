@@ -0,0 +1,280 @@
+"""
+Classification Service
+Vectorized category and color lookup for forecast series
+
+Every scale's thresholds are compiled into sorted arrays once at import,
+so whole series classify with a single np.searchsorted call. Category
+codes are small integers into the *_CATEGORIES tuples (-1 for missing);
+color indices point into the matching COLOR_SCALES entry.
+"""
+
+from typing import Dict, List, Optional, Sequence
+import hashlib
+import json
+
+import numpy as np
+
+
+# Color scales matching Clear Sky Chart (cleardarksky.com)
+COLOR_SCALES = {
+    "cloud_cover": {
+        "colors": [
+            {"max": 5, "color": "#003e7e", "label": "Clear"},
+            {"max": 15, "color": "#135393", "label": "10% covered"},
+            {"max": 25, "color": "#2666a6", "label": "20% covered"},
+            {"max": 35, "color": "#4e8ece", "label": "30% covered"},
+            {"max": 45, "color": "#62a2e2", "label": "40% covered"},
+            {"max": 55, "color": "#76b6f6", "label": "50% covered"},
+            {"max": 65, "color": "#99d9d9", "label": "60% covered"},
+            {"max": 75, "color": "#adeded", "label": "70% covered"},
+            {"max": 85, "color": "#c1c1c1", "label": "80% covered"},
+            {"max": 95, "color": "#e9e9e9", "label": "90% covered"},
+            {"max": 100, "color": "#fafafa", "label": "Overcast"},
+        ]
+    },
+    "transparency": {
+        "colors": [
+            {"value": "too_cloudy", "color": "#f9f9f9", "label": "Too cloudy"},
+            {"value": "poor", "color": "#c7c7c7", "label": "Poor"},
+            {"value": "below_avg", "color": "#95d5d5", "label": "Below Average"},
+            {"value": "average", "color": "#63a3e3", "label": "Average"},
+            {"value": "above_avg", "color": "#2c6cac", "label": "Above Average"},
+            {"value": "transparent", "color": "#003f7f", "label": "Transparent"},
+        ]
+    },
+    "seeing": {
+        "colors": [
+            {"value": "too_cloudy", "color": "#f9f9f9", "label": "Too cloudy"},
+            {"value": "bad", "color": "#c7c7c7", "label": "Bad 1/5"},
+            {"value": "poor", "color": "#95d5d5", "label": "Poor 2/5"},
+            {"value": "average", "color": "#63a3e3", "label": "Average 3/5"},
+            {"value": "good", "color": "#2c6cac", "label": "Good 4/5"},
+            {"value": "excellent", "color": "#003f7f", "label": "Excellent 5/5"},
+        ]
+    },
+    "darkness": {
+        "colors": [
+            {"max": -3.5, "color": "#ffffff", "label": "Daylight"},
+            {"max": -2.5, "color": "#fff1d8", "label": "Bright"},
+            {"max": -1.5, "color": "#ffe3b1", "label": "Bright"},
+            {"max": -0.5, "color": "#ffd58a", "label": "Dusk"},
+            {"max": 0.5, "color": "#ffc662", "label": "Dusk"},
+            {"max": 1.5, "color": "#ffb83b", "label": "Twilight"},
+            {"max": 2.5, "color": "#ffaa14", "label": "Twilight"},
+            {"max": 3.25, "color": "#00ffff", "label": "Bright Moon"},
+            {"max": 3.75, "color": "#00cbff", "label": "Bright Moon"},
+            {"max": 4.25, "color": "#0096ff", "label": "Partial Moon"},
+            {"max": 4.75, "color": "#0064e4", "label": "Partial Moon"},
+            {"max": 5.25, "color": "#0032ca", "label": "Dim Moon"},
+            {"max": 5.75, "color": "#0000af", "label": "Dim Moon"},
+            {"max": 6.25, "color": "#000042", "label": "Dark Sky"},
+            {"max": 7, "color": "#00004b", "label": "Dark Sky"},
+        ]
+    },
+    "wind": {
+        "colors": [
+            {"max": 5, "color": "#003f7f", "label": "0-5 mph"},
+            {"max": 11, "color": "#2c6cac", "label": "6-11 mph"},
+            {"max": 16, "color": "#63a3e3", "label": "12-16 mph"},
+            {"max": 28, "color": "#95d5d5", "label": "17-28 mph"},
+            {"max": 45, "color": "#c7c7c7", "label": "29-45 mph"},
+            {"max": 999, "color": "#f9f9f9", "label": ">45 mph"},
+        ]
+    },
+    "humidity": {
+        "colors": [
+            {"max": 25, "color": "#08035d", "label": "<25%"},
+            {"max": 30, "color": "#0d4d8d", "label": "25-30%"},
+            {"max": 35, "color": "#3070b0", "label": "30-35%"},
+            {"max": 40, "color": "#4e8ece", "label": "35-40%"},
+            {"max": 45, "color": "#71b1f1", "label": "40-45%"},
+            {"max": 50, "color": "#80c0c0", "label": "45-50%"},
+            {"max": 55, "color": "#09feed", "label": "50-55%"},
+            {"max": 60, "color": "#55faad", "label": "55-60%"},
+            {"max": 65, "color": "#94fe6a", "label": "60-65%"},
+            {"max": 70, "color": "#eafb16", "label": "65-70%"},
+            {"max": 75, "color": "#fec600", "label": "70-75%"},
+            {"max": 80, "color": "#fc8602", "label": "75-80%"},
+            {"max": 85, "color": "#fe3401", "label": "80-85%"},
+            {"max": 90, "color": "#ea0000", "label": "85-90%"},
+            {"max": 95, "color": "#b70000", "label": "90-95%"},
+            {"max": 100, "color": "#e10000", "label": "95-100%"},
+        ]
+    },
+    "temperature": {
+        "colors": [
+            {"max": -40, "color": "#fc00fc", "label": "< -40°F"},
+            {"max": -31, "color": "#000085", "label": "-40 to -31°F"},
+            {"max": -21, "color": "#0000b2", "label": "-30 to -21°F"},
+            {"max": -12, "color": "#0000ec", "label": "-21 to -12°F"},
+            {"max": -3, "color": "#0034fe", "label": "-12 to -3°F"},
+            {"max": 5, "color": "#0089fe", "label": "-3 to 5°F"},
+            {"max": 14, "color": "#00d4fe", "label": "5 to 14°F"},
+            {"max": 23, "color": "#1efede", "label": "14 to 23°F"},
+            {"max": 32, "color": "#fbfbfb", "label": "23 to 32°F"},
+            {"max": 41, "color": "#5efe9e", "label": "32 to 41°F"},
+            {"max": 50, "color": "#a2fe5a", "label": "41 to 50°F"},
+            {"max": 59, "color": "#fede00", "label": "50 to 59°F"},
+            {"max": 68, "color": "#fe9e00", "label": "59 to 68°F"},
+            {"max": 77, "color": "#fe5a00", "label": "68 to 77°F"},
+            {"max": 86, "color": "#fe1e00", "label": "77 to 86°F"},
+            {"max": 95, "color": "#e20000", "label": "86 to 95°F"},
+            {"max": 104, "color": "#a90000", "label": "95 to 104°F"},
+            {"max": 113, "color": "#7e0000", "label": "104 to 113°F"},
+            {"max": 999, "color": "#c6c6c6", "label": ">113°F"},
+        ]
+    },
+    "smoke": {
+        "colors": [
+            {"max": 2, "color": "#003f7f", "label": "No Smoke"},
+            {"max": 5, "color": "#4f8fcf", "label": "5 µg/m³"},
+            {"max": 10, "color": "#78bec8", "label": "10 µg/m³"},
+            {"max": 20, "color": "#87d2c1", "label": "20 µg/m³"},
+            {"max": 40, "color": "#d68f87", "label": "40 µg/m³"},
+            {"max": 60, "color": "#c96459", "label": "60 µg/m³"},
+            {"max": 80, "color": "#bd3b2d", "label": "80 µg/m³"},
+            {"max": 100, "color": "#b51504", "label": "100 µg/m³"},
+            {"max": 200, "color": "#654321", "label": "200 µg/m³"},
+            {"max": 999, "color": "#37220f", "label": ">500 µg/m³"},
+        ]
+    }
+}
+
+
+# Changes whenever COLOR_SCALES does, so clients can cache the table by version
+COLOR_SCALES_VERSION = hashlib.sha1(
+    json.dumps(COLOR_SCALES, sort_keys=True).encode()
+).hexdigest()[:12]
+
+# Category labels, in COLOR_SCALES order where a scale exists
+CLOUD_CATEGORIES = ("clear", "mostly_clear", "partly_cloudy", "mostly_cloudy", "cloudy", "overcast")
+SEEING_CATEGORIES = ("too_cloudy", "bad", "poor", "average", "good", "excellent")
+TRANSPARENCY_CATEGORIES = ("too_cloudy", "poor", "below_avg", "average", "above_avg", "transparent")
+DARKNESS_CATEGORIES = ("daylight", "dusk", "twilight", "bright_moon", "partial_moon", "dim_moon", "dark")
+
+MISSING = -1
+
+
+class ThresholdScale:
+    """
+    Maps values to category codes through sorted bin edges
+    
+    With inclusive=False a value equal to an edge falls in the upper bin
+    (``x < edge``); with inclusive=True it falls in the lower bin (``x <= edge``).
+    """
+    
+    def __init__(self, edges: Sequence[float], codes: Sequence[int], inclusive: bool = False):
+        assert len(codes) == len(edges) + 1
+        self.edges = np.asarray(edges, dtype=float)
+        self.codes = np.asarray(codes, dtype=np.int8)
+        self.side = "left" if inclusive else "right"
+    
+    def classify(self, values) -> np.ndarray:
+        values = np.asarray(values, dtype=float)
+        codes = self.codes[np.searchsorted(self.edges, values, side=self.side)]
+        codes[np.isnan(values)] = MISSING
+        return codes
+
+
+class ColorScale:
+    """
+    Compiled form of one COLOR_SCALES entry
+    
+    Range scales ("max" entries) map values to the first color whose max is
+    >= the value. Category scales ("value" entries) map category codes.
+    """
+    
+    def __init__(self, name: str, colors: List[Dict], categories: Optional[Sequence[str]] = None):
+        self.name = name
+        self.colors = [c["color"] for c in colors]
+        self.labels = [c["label"] for c in colors]
+        self.rgb = np.array([_hex_to_rgb(c) for c in self.colors], dtype=np.uint8)
+        
+        if "max" in colors[0]:
+            self.maxes = np.array([c["max"] for c in colors], dtype=float)
+            self._by_code = None
+        else:
+            self.maxes = None
+            index = {c["value"]: i for i, c in enumerate(colors)}
+            self._by_code = np.array([index[c] for c in categories] + [MISSING], dtype=np.int8)
+    
+    def color_index(self, values) -> np.ndarray:
+        """Color indices for raw values (range scales) or category codes"""
+        if self._by_code is not None:
+            # Code -1 lands on the trailing MISSING slot
+            return self._by_code[np.asarray(values, dtype=np.int64)]
+        
+        values = np.asarray(values, dtype=float)
+        idx = np.searchsorted(self.maxes, values, side="left")
+        idx = np.minimum(idx, len(self.maxes) - 1).astype(np.int8)
+        idx[np.isnan(values)] = MISSING
+        return idx
+
+
+def _hex_to_rgb(color: str):
+    return tuple(int(color[i:i + 2], 16) for i in (1, 3, 5))
+
+
+_CLOUD = ThresholdScale([10, 30, 50, 70, 90], range(6))
+# CMC SEEI: higher values = worse seeing
+_CMC_SEEING = ThresholdScale([1.5, 2.0, 2.5, 3.5], [5, 4, 3, 2, 1], inclusive=True)
+# CMC TRSP: higher values = better transparency
+_CMC_TRANSPARENCY = ThresholdScale([1.5, 2.5, 3.5, 4.5], [1, 2, 3, 4, 5])
+_WIND_SEEING = ThresholdScale([6, 12, 20], [4, 3, 2, 1], inclusive=True)
+_HUMIDITY_TRANSPARENCY = ThresholdScale([40, 55, 70, 85], [5, 4, 3, 2, 1], inclusive=True)
+_DARKNESS = ThresholdScale([-3, -1, 1, 3, 4.5, 5.5], range(7))
+
+SCALES: Dict[str, ColorScale] = {
+    name: ColorScale(
+        name,
+        scale["colors"],
+        {"seeing": SEEING_CATEGORIES, "transparency": TRANSPARENCY_CATEGORIES}.get(name)
+    )
+    for name, scale in COLOR_SCALES.items()
+}
+
+
+def categorize_cloud(cloud_pct) -> np.ndarray:
+    return _CLOUD.classify(cloud_pct)
+
+
+def convert_seeing(raw_value) -> np.ndarray:
+    """Seeing codes from CMC seeing index; missing input is too_cloudy"""
+    codes = _CMC_SEEING.classify(raw_value)
+    codes[codes == MISSING] = 0
+    return codes
+
+
+def convert_transparency(raw_value, cloud_cover=None) -> np.ndarray:
+    """Transparency codes from CMC transparency index, too_cloudy above 80% cloud"""
+    codes = _CMC_TRANSPARENCY.classify(raw_value)
+    codes[codes == MISSING] = 0
+    if cloud_cover is not None:
+        codes[np.asarray(cloud_cover, dtype=float) > 80] = 0
+    return codes
+
+
+def estimate_seeing(cloud, wind_mph) -> np.ndarray:
+    """Seeing codes estimated from wind when CMC data is unavailable"""
+    codes = _WIND_SEEING.classify(wind_mph)
+    codes[codes == MISSING] = 2  # poor
+    codes[np.asarray(cloud, dtype=float) > 80] = 0
+    return codes
+
+
+def estimate_transparency(cloud, humidity) -> np.ndarray:
+    """Transparency codes estimated from humidity when CMC data is unavailable"""
+    codes = _HUMIDITY_TRANSPARENCY.classify(humidity)
+    codes[np.asarray(cloud, dtype=float) > 30] = 0
+    return codes
+
+
+def darkness_category(limiting_mag) -> np.ndarray:
+    return _DARKNESS.classify(limiting_mag)
+
+
+def labels(codes: np.ndarray, categories: Sequence[str]) -> List[Optional[str]]:
+    """Category labels for codes, None where missing"""
+    # Appending None lets code -1 index it directly
+    lookup = np.array(tuple(categories) + (None,), dtype=object)
+    return lookup[codes].tolist()
@@ -20,6 +20,11 @@ import logging
 import re
 
 from ..config import settings
+from .cache import TTLCache
+from .hotset import hot_set, cell_key
+from .executors import io_executor
+from . import classification
+from .grid_geometry import GridGeometry
 
 logger = logging.getLogger(__name__)
 
@@ -30,6 +35,7 @@ class CMCDataFetcher:
     """
     
     MODEL_RUNS = ["00", "06", "12", "18"]
+    RUN_AVAILABILITY_DELAY_HOURS = 4  # Hours after run time before we switch to it
     ASTRONOMY_BASE = "https://dd.alpha.meteo.gc.ca/model_gem_regional/astronomy/grib2"
     RDPS_BASE = "https://dd.weather.gc.ca/model_gem_regional/10km/grib2"
     
@@ -46,11 +52,19 @@ class CMCDataFetcher:
         "WDIR_TGL_10": "wind_direction",
     }
     
+    # (variable, data subdirectory, file pattern) making up one model run
+    RUN_SOURCES = (
+        ("seeing", "astronomy", "*_SEEI_*.grib2"),
+        ("transparency", "astronomy", "*_TRSP_*.grib2"),
+        ("cloud_cover", "rdps", "*_TCDC_*.grib2"),
+    )
+    
     def __init__(self):
         self.data_dir = Path(settings.DATA_DIR)
         self.cache_dir = Path(settings.CACHE_DIR)
         self._pygrib = None
         self._grib_available = self._check_grib_support()
+        self._geometries: Dict[str, GridGeometry] = {}
         
         (self.data_dir / "astronomy").mkdir(parents=True, exist_ok=True)
         (self.data_dir / "rdps").mkdir(parents=True, exist_ok=True)
@@ -74,7 +88,7 @@ class CMCDataFetcher:
     def get_latest_model_run(self) -> Tuple[str, datetime]:
         now_utc = datetime.now(timezone.utc)
         hour = now_utc.hour
-        available_hour = hour - 4
+        available_hour = hour - self.RUN_AVAILABILITY_DELAY_HOURS
         
         run_hour = "18"
         run_date = now_utc.date()
@@ -91,6 +105,25 @@ class CMCDataFetcher:
         
         return run_hour, run_datetime
     
+    def get_next_model_run_time(self) -> datetime:
+        """When get_latest_model_run will next switch to a newer run"""
+        now_utc = datetime.now(timezone.utc)
+        today = now_utc.replace(hour=0, minute=0, second=0, microsecond=0)
+        for day in (today, today + timedelta(days=1)):
+            for run in self.MODEL_RUNS:
+                switch = day + timedelta(hours=int(run) + self.RUN_AVAILABILITY_DELAY_HOURS)
+                if switch > now_utc:
+                    return switch
+        return today + timedelta(days=1, hours=self.RUN_AVAILABILITY_DELAY_HOURS)
+    
+    @staticmethod
+    def _write_file(dest_path: Path, content: bytes):
+        """Write then rename, so readers never see a partial file"""
+        part_path = dest_path.with_name(dest_path.name + ".part")
+        with open(part_path, 'wb') as f:
+            f.write(content)
+        os.replace(part_path, dest_path)
+    
     async def fetch_file(self, url: str, dest_path: Path, session: aiohttp.ClientSession = None) -> bool:
         close_session = False
         if session is None:
@@ -102,8 +135,7 @@ class CMCDataFetcher:
                 if response.status == 200:
                     dest_path.parent.mkdir(parents=True, exist_ok=True)
                     content = await response.read()
-                    with open(dest_path, 'wb') as f:
-                        f.write(content)
+                    await io_executor.run(self._write_file, dest_path, content)
                     logger.debug(f"Downloaded: {dest_path.name}")
                     return True
                 else:
@@ -138,7 +170,7 @@ class CMCDataFetcher:
         if model_run is None:
             model_run, run_datetime = self.get_latest_model_run()
         else:
-            run_datetime = datetime.now(timezone.utc).replace(hour=int(model_run), minute=0, second=0, microsecond=0)
+            run_datetime = self._run_datetime(model_run)
         
         base_url = f"{self.ASTRONOMY_BASE}/{model_run}"
         run_str = run_datetime.strftime("%Y%m%d") + model_run
@@ -158,6 +190,8 @@ class CMCDataFetcher:
         
         seeing_files = sorted([f for f in files if "_SEEI_" in f])
         transp_files = sorted([f for f in files if "_TRSP_" in f])
+        # The run is only ingested once every listed file is on disk
+        await io_executor.run(self.write_expected, "astronomy", run_datetime, seeing_files + transp_files)
         
         logger.info(f"Found {len(seeing_files)} seeing files, {len(transp_files)} transparency files")
         
@@ -204,7 +238,7 @@ class CMCDataFetcher:
         if model_run is None:
             model_run, run_datetime = self.get_latest_model_run()
         else:
-            run_datetime = datetime.now(timezone.utc).replace(hour=int(model_run), minute=0, second=0, microsecond=0)
+            run_datetime = self._run_datetime(model_run)
         
         run_str = run_datetime.strftime("%Y%m%d") + model_run
         logger.info(f"Fetching RDPS cloud data for model run {run_str}")
@@ -251,30 +285,11 @@ class CMCDataFetcher:
             "cloud_cover": []
         }
         
-        astro_dir = self.data_dir / "astronomy" / model_run
-        if astro_dir.exists():
-            for grib_file in sorted(astro_dir.glob("*_SEEI_*.grib2")):
+        for name, grib_files in self.run_files(self._run_datetime(model_run)).items():
+            for grib_file in grib_files:
                 value, forecast_hour = self._extract_point_value(grib_file, lat, lon)
                 if value is not None:
-                    result["seeing"].append({
-                        "forecast_hour": forecast_hour,
-                        "value": value
-                    })
-            
-            for grib_file in sorted(astro_dir.glob("*_TRSP_*.grib2")):
-                value, forecast_hour = self._extract_point_value(grib_file, lat, lon)
-                if value is not None:
-                    result["transparency"].append({
-                        "forecast_hour": forecast_hour,
-                        "value": value
-                    })
-        
-        rdps_dir = self.data_dir / "rdps" / model_run
-        if rdps_dir.exists():
-            for grib_file in sorted(rdps_dir.glob("*_TCDC_*.grib2")):
-                value, forecast_hour = self._extract_point_value(grib_file, lat, lon)
-                if value is not None:
-                    result["cloud_cover"].append({
+                    result[name].append({
                         "forecast_hour": forecast_hour,
                         "value": value
                     })
@@ -292,13 +307,16 @@ class CMCDataFetcher:
                 grbs = pygrib.open(str(grib_file))
                 grb = grbs[1]
                 
-                lats, lons = grb.latlons()
+                geometry = self._geometry_for(grib_file.parent, grb)
                 data = grb.values
                 
                 if hasattr(data, 'mask'):
                     data = data.filled(np.nan)
                 
-                value = self._bilinear_interpolate(data, lats, lons, lat, lon)
+                value = None
+                cell = geometry.locate(lat, lon)
+                if cell is not None and not np.isnan(data[cell]):
+                    value = float(data[cell])
                 
                 grbs.close()
                 return value, forecast_hour
@@ -320,31 +338,122 @@ class CMCDataFetcher:
             logger.error(f"Error extracting from {grib_file.name}: {e}")
             return None, None
     
-    def _bilinear_interpolate(self, data: np.ndarray, lats: np.ndarray, lons: np.ndarray,
-                               target_lat: float, target_lon: float) -> Optional[float]:
+    def read_field(self, grib_file: Path) -> Tuple[Optional[np.ndarray], Optional[int], Optional[GridGeometry]]:
+        """
+        Decode a whole GRIB file: (values as (ny, nx) with NaN for missing,
+        forecast hour, grid geometry). Nones when the file can't be read.
+        """
         try:
-            if target_lon < 0:
-                target_lon_360 = target_lon + 360
-            else:
-                target_lon_360 = target_lon
+            match = re.search(r'_PT(\d+)H\.grib2', str(grib_file))
+            forecast_hour = int(match.group(1)) if match else None
             
-            if np.min(lons) < 0:
-                target_lon_use = target_lon
+            if self._pygrib:
+                grbs = self._pygrib.open(str(grib_file))
+                grb = grbs[1]
+                geometry = self._geometry_for(grib_file.parent, grb)
+                data = grb.values
+                grbs.close()
             else:
-                target_lon_use = target_lon_360
-            
-            dist = np.sqrt((lats - target_lat)**2 + (lons - target_lon_use)**2)
-            min_idx = np.unravel_index(np.argmin(dist), dist.shape)
-            value = data[min_idx[0], min_idx[1]]
-            
-            if np.isnan(value):
-                return None
+                import xarray as xr
+                
+                ds = xr.open_dataset(str(grib_file), engine='cfgrib')
+                var_name = list(ds.data_vars)[0]
+                data = ds[var_name].values
+                key = str(grib_file.parent)
+                geometry = self._geometries.get(key)
+                if geometry is None:
+                    geometry = GridGeometry(np.asarray(ds.latitude.values, dtype=float),
+                                            np.asarray(ds.longitude.values, dtype=float))
+                    self._geometries[key] = geometry
+                ds.close()
             
-            return float(value)
+            if hasattr(data, 'mask'):
+                data = data.filled(np.nan)
+            return np.asarray(data, dtype=np.float32), forecast_hour, geometry
             
         except Exception as e:
-            logger.error(f"Interpolation error: {e}")
+            logger.error(f"Error decoding {grib_file.name}: {e}")
+            return None, None, None
+    
+    def _geometry_for(self, grib_dir: Path, grb) -> GridGeometry:
+        """Grid geometry shared by every file in a directory, built once"""
+        key = str(grib_dir)
+        geometry = self._geometries.get(key)
+        if geometry is None:
+            geometry = GridGeometry.from_grib_message(grb)
+            self._geometries[key] = geometry
+        return geometry
+    
+    def run_files(self, run_datetime: datetime) -> Dict[str, List[Path]]:
+        """
+        GRIB files belonging to one model run, by variable
+        
+        Directories are named by run hour only, so files are matched on the
+        run timestamp in their names: older days left in the same directory
+        and downloads still in progress (*.part) are never picked up.
+        """
+        hour_dir = run_datetime.strftime("%H")
+        files = {}
+        for name, kind, pattern in self.RUN_SOURCES:
+            grib_dir = self.data_dir / kind / hour_dir
+            files[name] = sorted(
+                path for path in grib_dir.glob(pattern)
+                if self._file_run(path.name) == run_datetime
+            ) if grib_dir.exists() else []
+        return files
+    
+    def _expected_path(self, kind: str, run_datetime: datetime) -> Path:
+        return self.data_dir / kind / run_datetime.strftime("%H") / f"{run_datetime:%Y%m%d%H}.expected.json"
+    
+    def write_expected(self, kind: str, run_datetime: datetime, filenames: List[str]):
+        """Record the files the server lists for a run (blocking)"""
+        names = sorted(Path(name).name for name in filenames if self._file_run(Path(name).name) == run_datetime)
+        path = self._expected_path(kind, run_datetime)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._write_file(path, json.dumps(names).encode())
+    
+    def run_complete(self, run_datetime: datetime, files: Dict[str, List[Path]]) -> bool:
+        """
+        Whether every file the server listed for a run (write_expected) is
+        among its files on disk
+        
+        Data without a recorded listing, such as files copied in by hand or
+        RDPS cloud files (their download is not scheduled), has nothing to
+        wait for.
+        """
+        present = {path.name for paths in files.values() for path in paths}
+        for kind in {kind for _, kind, _ in self.RUN_SOURCES}:
+            try:
+                expected = json.loads(self._expected_path(kind, run_datetime).read_text())
+            except (OSError, ValueError):
+                continue
+            if not present.issuperset(expected):
+                return False
+        return True
+    
+    def available_runs(self) -> List[datetime]:
+        """Model runs with astronomy files on disk, newest first"""
+        runs = set()
+        for path in (self.data_dir / "astronomy").glob("*/*.grib2"):
+            run_datetime = self._file_run(path.name)
+            if run_datetime is not None:
+                runs.add(run_datetime)
+        return sorted(runs, reverse=True)
+    
+    @staticmethod
+    def _file_run(filename: str) -> Optional[datetime]:
+        """Model run timestamp embedded in a CMC file name"""
+        match = re.match(r'(\d{8})T(\d{2})Z_', filename) or re.search(r'_(\d{8})(\d{2})_P\d+', filename)
+        if not match:
             return None
+        return datetime.strptime(match.group(1) + match.group(2), "%Y%m%d%H").replace(tzinfo=timezone.utc)
+    
+    def _run_datetime(self, model_run: str) -> datetime:
+        """Run datetime for a run hour: the latest run if it matches, else today's"""
+        latest_run, latest_datetime = self.get_latest_model_run()
+        if model_run == latest_run:
+            return latest_datetime
+        return datetime.now(timezone.utc).replace(hour=int(model_run), minute=0, second=0, microsecond=0)
     
     def get_cached_forecast(self, location_key: str, model_run: str) -> Optional[Dict]:
         cache_file = self.cache_dir / "forecasts" / f"{location_key}_{model_run}.json"
@@ -368,19 +477,8 @@ class CMCDataFetcher:
         
         CMC SEEI: Higher values = worse seeing (more turbulence)
         """
-        if raw_value is None:
-            return "too_cloudy"
-        
-        if raw_value <= 1.5:
-            return "excellent"
-        elif raw_value <= 2.0:
-            return "good"
-        elif raw_value <= 2.5:
-            return "average"
-        elif raw_value <= 3.5:
-            return "poor"
-        else:
-            return "bad"
+        code = classification.convert_seeing([raw_value])
+        return classification.SEEING_CATEGORIES[code[0]]
     
     def convert_transparency_value(self, raw_value: float, cloud_cover: float = None) -> str:
         """
@@ -388,61 +486,135 @@ class CMCDataFetcher:
         
         CMC TRSP: Higher values = better transparency
         """
-        if raw_value is None or (cloud_cover is not None and cloud_cover > 80):
-            return "too_cloudy"
-        
-        if raw_value >= 4.5:
-            return "transparent"
-        elif raw_value >= 3.5:
-            return "above_avg"
-        elif raw_value >= 2.5:
-            return "average"
-        elif raw_value >= 1.5:
-            return "below_avg"
-        else:
-            return "poor"
+        cloud = None if cloud_cover is None else [cloud_cover]
+        code = classification.convert_transparency([raw_value], cloud)
+        return classification.TRANSPARENCY_CATEGORIES[code[0]]
 
 
 class OpenMeteoFetcher:
     """
     Fetches ECMWF cloud data from Open-Meteo for comparison layer
+    
+    Responses are cached per upstream model cell and update slot, so nearby
+    locations share a single upstream request until the model refreshes.
     """
-        
-    async def fetch_forecast(self, lat: float, lon: float, 
-                            forecast_days: int = 7) -> Dict[str, Any]:
-        params = {
-            "latitude": lat,
-            "longitude": lon,
-            "hourly": [
-                "cloud_cover",
-                "cloud_cover_low",
-                "cloud_cover_mid", 
-                "cloud_cover_high",
-                "visibility",
-                "temperature_2m",
-                "relative_humidity_2m",
-                "wind_speed_10m",
-                "wind_direction_10m",
-            ],
-            "forecast_days": forecast_days,
-            "timezone": "UTC"  # Changed from "auto"
-        }
-        
+    
+    def __init__(self):
+        self.cache = TTLCache(
+            max_entries=settings.OPEN_METEO_CACHE_SIZE,
+            ttl=settings.OPEN_METEO_CACHE_TTL,
+            persist_path=Path(settings.CACHE_DIR) / "openmeteo_cache.json",
+            persist_interval=settings.OPEN_METEO_CACHE_PERSIST_INTERVAL,
+            hotness=hot_set.score
+        )
+        self._inflight: Dict[str, asyncio.Future] = {}
+    
+    def get_model_cell(self, lat: float, lon: float) -> Tuple[float, float]:
+        """Snap a point to the center of its upstream model cell"""
+        res = settings.OPEN_METEO_CELL_DEG
+        return round(round(lat / res) * res, 4), round(round(lon / res) * res, 4)
+    
+    def get_update_slot(self, update_hours: int) -> datetime:
+        """Start of the current upstream update window"""
+        now_utc = datetime.now(timezone.utc)
+        hour = now_utc.hour - now_utc.hour % update_hours
+        return now_utc.replace(hour=hour, minute=0, second=0, microsecond=0)
+    
+    def _slot_ttl(self, slot: datetime, update_hours: int) -> float:
+        next_slot = slot + timedelta(hours=update_hours)
+        remaining = (next_slot - datetime.now(timezone.utc)).total_seconds()
+        return max(1.0, min(remaining, settings.OPEN_METEO_CACHE_TTL))
+    
+    def _cache_key(self, kind: str, params: Dict[str, Any], lat: float, lon: float,
+                   slot: datetime) -> str:
+        cell_lat, cell_lon = self.get_model_cell(lat, lon)
+        return f"{kind}:{params['forecast_days']}:{cell_lat},{cell_lon}:{slot.strftime('%Y%m%d%H')}"
+    
+    async def _cached_fetch(self, kind: str, url: str, lat: float, lon: float,
+                            params: Dict[str, Any], update_hours: int,
+                            parse) -> Dict[str, Any]:
+        cell_lat, cell_lon = self.get_model_cell(lat, lon)
+        slot = self.get_update_slot(update_hours)
+        key = self._cache_key(kind, params, lat, lon, slot)
+        
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        
+        # Concurrent requests for the same cell wait on one upstream call
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+        
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await self._fetch(url, {**params, "latitude": cell_lat, "longitude": cell_lon}, parse)
+            self._store(key, result, slot, update_hours, (cell_lat, cell_lon))
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark retrieved so an unawaited future doesn't log a warning
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+    
+    def _store(self, key: str, result: Dict[str, Any], slot: datetime, update_hours: int,
+               cell: Tuple[float, float]):
+        hot_key = cell_key(*cell)
+        if result.get("available"):
+            self.cache.set(key, result, ttl=self._slot_ttl(slot, update_hours), hot_key=hot_key)
+        else:
+            self.cache.set(key, result, ttl=settings.OPEN_METEO_NEGATIVE_TTL, hot_key=hot_key)
+    
+    async def _cached_fetch_many(self, kind: str, url: str, points: List[Tuple[float, float]],
+                                 params: Dict[str, Any], update_hours: int,
+                                 parse) -> List[Dict[str, Any]]:
+        """
+        _cached_fetch for many points: uncached cells are fetched with
+        multi-location requests. Results are aligned with points.
+        """
+        slot = self.get_update_slot(update_hours)
+        keys = [self._cache_key(kind, params, lat, lon, slot) for lat, lon in points]
+        
+        results: Dict[str, Dict[str, Any]] = {}
+        missing: Dict[str, Tuple[float, float]] = {}
+        for key, (lat, lon) in zip(keys, points):
+            if key in results or key in missing:
+                continue
+            cached = self.cache.get(key)
+            if cached is not None:
+                results[key] = cached
+            else:
+                missing[key] = self.get_model_cell(lat, lon)
+        
+        items = list(missing.items())
+        batch_size = settings.OPEN_METEO_BATCH_SIZE
+        for start in range(0, len(items), batch_size):
+            batch = items[start:start + batch_size]
+            fetched = await self._fetch_many(url, params, [cell for _, cell in batch], parse)
+            for (key, cell), result in zip(batch, fetched):
+                self._store(key, result, slot, update_hours, cell)
+                results[key] = result
+        
+        if items:
+            logger.info(f"Fetched {len(items)} Open-Meteo {kind} cells in "
+                        f"{(len(items) + batch_size - 1) // batch_size} requests")
+        return [results[key] for key in keys]
+    
+    async def _fetch(self, url: str, params: Dict[str, Any], parse) -> Dict[str, Any]:
         try:
             async with aiohttp.ClientSession() as session:
                 async with session.get(
-                    settings.OPEN_METEO_URL,
+                    url,
                     params=params,
                     timeout=aiohttp.ClientTimeout(total=30)
                 ) as response:
                     if response.status == 200:
                         data = await response.json()
-                        return {
-                            "available": True,
-                            "timezone": data.get("timezone"),
-                            "hourly": data.get("hourly", {}),
-                            "hourly_units": data.get("hourly_units", {})
-                        }
+                        return parse(data)
                     else:
                         logger.warning(f"Open-Meteo request failed: {response.status}")
                         return {"available": False}
@@ -451,33 +623,96 @@ class OpenMeteoFetcher:
             logger.error(f"Error fetching Open-Meteo data: {e}")
             return {"available": False, "error": str(e)}
     
-    async def fetch_air_quality(self, lat: float, lon: float, 
-                            forecast_days: int = 4) -> Dict[str, Any]:
+    async def _fetch_many(self, url: str, params: Dict[str, Any],
+                          cells: List[Tuple[float, float]], parse) -> List[Dict[str, Any]]:
+        """One upstream request for several cells; results in cell order"""
         params = {
-            "latitude": lat,
-            "longitude": lon,
+            **params,
+            "latitude": ",".join(str(lat) for lat, _ in cells),
+            "longitude": ",".join(str(lon) for _, lon in cells),
+        }
+        # A multi-location response is a list with one object per location
+        result = await self._fetch(url, params, lambda data: {
+            "available": True,
+            "items": [parse(item) for item in (data if isinstance(data, list) else [data])]
+        })
+        if not result.get("available") or len(result["items"]) != len(cells):
+            return [{"available": False}] * len(cells)
+        return result["items"]
+    
+    def _forecast_params(self, forecast_days: int) -> Dict[str, Any]:
+        return {
+            "hourly": [
+                "cloud_cover",
+                "cloud_cover_low",
+                "cloud_cover_mid", 
+                "cloud_cover_high",
+                "visibility",
+                "temperature_2m",
+                "relative_humidity_2m",
+                "wind_speed_10m",
+                "wind_direction_10m",
+            ],
+            "forecast_days": forecast_days,
+            "timezone": "UTC"  # Changed from "auto"
+        }
+    
+    @staticmethod
+    def _parse_forecast(data: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "available": True,
+            "timezone": data.get("timezone"),
+            "hourly": data.get("hourly", {}),
+            "hourly_units": data.get("hourly_units", {})
+        }
+    
+    def _air_quality_params(self, forecast_days: int) -> Dict[str, Any]:
+        return {
             "hourly": ["pm2_5", "pm10", "dust"],
             "forecast_days": forecast_days,
             "timezone": "UTC"  # Changed from "auto"
         }
+    
+    @staticmethod
+    def _parse_air_quality(data: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "available": True,
+            "hourly": data.get("hourly", {})
+        }
         
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    "https://air-quality-api.open-meteo.com/v1/air-quality",
-                    params=params,
-                    timeout=aiohttp.ClientTimeout(total=30)
-                ) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return {
-                            "available": True,
-                            "hourly": data.get("hourly", {})
-                        }
-                    return {"available": False}
-        except Exception as e:
-            logger.error(f"Error fetching air quality: {e}")
-            return {"available": False}
+    async def fetch_forecast(self, lat: float, lon: float, 
+                            forecast_days: int = 7) -> Dict[str, Any]:
+        return await self._cached_fetch(
+            "forecast", settings.OPEN_METEO_URL, lat, lon,
+            self._forecast_params(forecast_days),
+            settings.OPEN_METEO_UPDATE_HOURS, self._parse_forecast
+        )
+    
+    async def fetch_air_quality(self, lat: float, lon: float, 
+                            forecast_days: int = 4) -> Dict[str, Any]:
+        return await self._cached_fetch(
+            "air_quality", settings.OPEN_METEO_AIR_QUALITY_URL, lat, lon,
+            self._air_quality_params(forecast_days),
+            settings.OPEN_METEO_AIR_QUALITY_UPDATE_HOURS, self._parse_air_quality
+        )
+    
+    async def fetch_forecast_many(self, points: List[Tuple[float, float]],
+                                  forecast_days: int = 7) -> List[Dict[str, Any]]:
+        """fetch_forecast for many (lat, lon) points, batched upstream"""
+        return await self._cached_fetch_many(
+            "forecast", settings.OPEN_METEO_URL, points,
+            self._forecast_params(forecast_days),
+            settings.OPEN_METEO_UPDATE_HOURS, self._parse_forecast
+        )
+    
+    async def fetch_air_quality_many(self, points: List[Tuple[float, float]],
+                                     forecast_days: int = 4) -> List[Dict[str, Any]]:
+        """fetch_air_quality for many (lat, lon) points, batched upstream"""
+        return await self._cached_fetch_many(
+            "air_quality", settings.OPEN_METEO_AIR_QUALITY_URL, points,
+            self._air_quality_params(forecast_days),
+            settings.OPEN_METEO_AIR_QUALITY_UPDATE_HOURS, self._parse_air_quality
+        )
 
 
 # Singleton instances
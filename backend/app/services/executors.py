@@ -0,0 +1,137 @@
+"""
+Executor Service
+Bounded worker pools for blocking work, so the event loop only orchestrates
+
+- astro_executor: ephem darkness calculations. ephem holds the GIL, so this
+  is a process pool by default and scales with cores.
+- cpu_executor: column merging, response encoding and compression, GRIB
+  decoding (NumPy, zlib and brotli release the GIL for most of this).
+- io_executor: file reads and writes (snapshots, cache persistence,
+  downloaded GRIB files).
+
+Each pool runs at most max_workers jobs at once; further jobs wait on the
+event loop, where their queue depth and wait time are measured.
+"""
+
+import asyncio
+import functools
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class BoundedExecutor:
+    """
+    A thread or process pool with an explicit concurrency limit
+
+    Jobs sent to a process pool must be module-level functions with
+    picklable arguments and results.
+    """
+
+    def __init__(self, name: str, max_workers: int, kind: str = "thread"):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown executor kind: {kind}")
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.kind = kind
+        self._pool: Optional[Executor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.max_queued = 0
+        self.wait_seconds = 0.0
+        self.run_seconds = 0.0
+
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            if self.kind == "process":
+                # spawn, not fork: the parent has threads (pools, sqlite)
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            else:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix=self.name
+                )
+        return self._pool
+
+    def _get_slots(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._slots is None or self._loop is not loop:
+            self._slots = asyncio.Semaphore(self.max_workers)
+            self._loop = loop
+        return self._slots
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run fn(*args, **kwargs) in the pool once a worker is free"""
+        slots = self._get_slots()
+        submitted = time.monotonic()
+        self.queued += 1
+        self.max_queued = max(self.max_queued, self.queued)
+        try:
+            await slots.acquire()
+        finally:
+            self.queued -= 1
+        started = time.monotonic()
+        self.wait_seconds += started - submitted
+        self.running += 1
+        try:
+            call = functools.partial(fn, *args, **kwargs) if kwargs else functools.partial(fn, *args)
+            return await asyncio.get_running_loop().run_in_executor(self._get_pool(), call)
+        except BaseException:
+            self.failed += 1
+            raise
+        finally:
+            self.running -= 1
+            self.completed += 1
+            self.run_seconds += time.monotonic() - started
+            slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "max_workers": self.max_workers,
+            "queued": self.queued,
+            "running": self.running,
+            "max_queued": self.max_queued,
+            "completed": self.completed,
+            "failed": self.failed,
+            "avg_wait_ms": round(1000 * self.wait_seconds / self.completed, 1) if self.completed else 0.0,
+            "avg_run_ms": round(1000 * self.run_seconds / self.completed, 1) if self.completed else 0.0,
+        }
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+cores = os.cpu_count() or 1
+
+astro_executor = BoundedExecutor("astro", settings.ASTRO_WORKERS or cores, settings.ASTRO_EXECUTOR)
+cpu_executor = BoundedExecutor("cpu", settings.CPU_WORKERS or cores)
+io_executor = BoundedExecutor("io", settings.IO_WORKERS)
+
+EXECUTORS = (astro_executor, cpu_executor, io_executor)
+
+
+def executor_stats() -> Dict[str, Dict[str, Any]]:
+    return {executor.name: executor.stats() for executor in EXECUTORS}
+
+
+def shutdown_executors():
+    for executor in EXECUTORS:
+        executor.shutdown()
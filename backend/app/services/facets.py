@@ -0,0 +1,49 @@
+"""
+Facet Snapshot Service
+Pre-encoded country, region and category counts for the browse endpoints
+
+Counts come from one GROUP BY per facet, run when the location catalog
+loads and published with it, so they change only when locations do.
+
+Each facet response is encoded and compressed once, with a content ETag;
+a request is a dictionary lookup or a 304.
+"""
+
+import hashlib
+from typing import Dict, Iterable, Tuple
+
+from .response_cache import EncodedResponse, encoded_json, make_etag
+
+Facet = Tuple[str, EncodedResponse]  # (etag, encoded body)
+
+
+def encode_facet(name: str, field: str, counts: Iterable[Tuple[str, int]]) -> Facet:
+    encoded = encoded_json([{field: value, "count": count} for value, count in sorted(counts)])
+    return make_etag("facet", name, hashlib.sha1(encoded.body).hexdigest()), encoded
+
+
+class FacetSnapshot:
+    """Encoded facets of one catalog build"""
+
+    def __init__(self, country_counts: Iterable[Tuple[str, int]],
+                 region_counts: Iterable[Tuple[str, str, int]],
+                 category_counts: Iterable[Tuple[str, int]]):
+        self.countries = encode_facet("countries", "country", country_counts)
+        self.categories = encode_facet("categories", "category", category_counts)
+
+        by_country: Dict[str, list] = {}
+        for country, region, count in region_counts:
+            by_country.setdefault(country, []).append((region, count))
+        self._regions: Dict[str, Facet] = {
+            country: encode_facet(f"regions/{country}", "region", counts)
+            for country, counts in by_country.items()
+        }
+        self._no_regions = encode_facet("regions", "region", [])
+
+    def regions(self, country: str) -> Facet:
+        """Region counts of a country (an empty list for unknown countries)"""
+        return self._regions.get(country, self._no_regions)
+
+    @classmethod
+    def empty(cls) -> "FacetSnapshot":
+        return cls([], [], [])
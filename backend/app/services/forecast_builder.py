@@ -5,143 +5,121 @@ and astronomical calculations into a unified forecast
 """
 
 from datetime import datetime, timedelta, timezone
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
+import asyncio
+import copy
 import json
 import logging
 
+import numpy as np
+
+from ..config import settings
 from ..models import (
     Location, HourlyForecast, DayForecast, ForecastResponse, get_timezone_offset
 )
 from .cmc_fetcher import cmc_fetcher, openmeteo_fetcher
-from .astro_calculator import create_calculator
+from .astro_calculator import calculate_darkness_batch
+from .run_data import RunData, run_data
+from .cache import TTLCache
+from .executors import astro_executor, cpu_executor
+from .hotset import hot_set, cell_key
+from . import classification
+from .classification import (
+    COLOR_SCALES, CLOUD_CATEGORIES, SEEING_CATEGORIES, TRANSPARENCY_CATEGORIES
+)
 
 logger = logging.getLogger(__name__)
 
 
-# Color scales matching Clear Sky Chart (cleardarksky.com)
-COLOR_SCALES = {
-    "cloud_cover": {
-        "colors": [
-            {"max": 5, "color": "#003e7e", "label": "Clear"},
-            {"max": 15, "color": "#135393", "label": "10% covered"},
-            {"max": 25, "color": "#2666a6", "label": "20% covered"},
-            {"max": 35, "color": "#4e8ece", "label": "30% covered"},
-            {"max": 45, "color": "#62a2e2", "label": "40% covered"},
-            {"max": 55, "color": "#76b6f6", "label": "50% covered"},
-            {"max": 65, "color": "#99d9d9", "label": "60% covered"},
-            {"max": 75, "color": "#adeded", "label": "70% covered"},
-            {"max": 85, "color": "#c1c1c1", "label": "80% covered"},
-            {"max": 95, "color": "#e9e9e9", "label": "90% covered"},
-            {"max": 100, "color": "#fafafa", "label": "Overcast"},
-        ]
-    },
-    "transparency": {
-        "colors": [
-            {"value": "too_cloudy", "color": "#f9f9f9", "label": "Too cloudy"},
-            {"value": "poor", "color": "#c7c7c7", "label": "Poor"},
-            {"value": "below_avg", "color": "#95d5d5", "label": "Below Average"},
-            {"value": "average", "color": "#63a3e3", "label": "Average"},
-            {"value": "above_avg", "color": "#2c6cac", "label": "Above Average"},
-            {"value": "transparent", "color": "#003f7f", "label": "Transparent"},
-        ]
-    },
-    "seeing": {
-        "colors": [
-            {"value": "too_cloudy", "color": "#f9f9f9", "label": "Too cloudy"},
-            {"value": "bad", "color": "#c7c7c7", "label": "Bad 1/5"},
-            {"value": "poor", "color": "#95d5d5", "label": "Poor 2/5"},
-            {"value": "average", "color": "#63a3e3", "label": "Average 3/5"},
-            {"value": "good", "color": "#2c6cac", "label": "Good 4/5"},
-            {"value": "excellent", "color": "#003f7f", "label": "Excellent 5/5"},
-        ]
-    },
-    "darkness": {
-        "colors": [
-            {"max": -3.5, "color": "#ffffff", "label": "Daylight"},
-            {"max": -2.5, "color": "#fff1d8", "label": "Bright"},
-            {"max": -1.5, "color": "#ffe3b1", "label": "Bright"},
-            {"max": -0.5, "color": "#ffd58a", "label": "Dusk"},
-            {"max": 0.5, "color": "#ffc662", "label": "Dusk"},
-            {"max": 1.5, "color": "#ffb83b", "label": "Twilight"},
-            {"max": 2.5, "color": "#ffaa14", "label": "Twilight"},
-            {"max": 3.25, "color": "#00ffff", "label": "Bright Moon"},
-            {"max": 3.75, "color": "#00cbff", "label": "Bright Moon"},
-            {"max": 4.25, "color": "#0096ff", "label": "Partial Moon"},
-            {"max": 4.75, "color": "#0064e4", "label": "Partial Moon"},
-            {"max": 5.25, "color": "#0032ca", "label": "Dim Moon"},
-            {"max": 5.75, "color": "#0000af", "label": "Dim Moon"},
-            {"max": 6.25, "color": "#000042", "label": "Dark Sky"},
-            {"max": 7, "color": "#00004b", "label": "Dark Sky"},
-        ]
-    },
-    "wind": {
-        "colors": [
-            {"max": 5, "color": "#003f7f", "label": "0-5 mph"},
-            {"max": 11, "color": "#2c6cac", "label": "6-11 mph"},
-            {"max": 16, "color": "#63a3e3", "label": "12-16 mph"},
-            {"max": 28, "color": "#95d5d5", "label": "17-28 mph"},
-            {"max": 45, "color": "#c7c7c7", "label": "29-45 mph"},
-            {"max": 999, "color": "#f9f9f9", "label": ">45 mph"},
-        ]
-    },
-    "humidity": {
-        "colors": [
-            {"max": 25, "color": "#08035d", "label": "<25%"},
-            {"max": 30, "color": "#0d4d8d", "label": "25-30%"},
-            {"max": 35, "color": "#3070b0", "label": "30-35%"},
-            {"max": 40, "color": "#4e8ece", "label": "35-40%"},
-            {"max": 45, "color": "#71b1f1", "label": "40-45%"},
-            {"max": 50, "color": "#80c0c0", "label": "45-50%"},
-            {"max": 55, "color": "#09feed", "label": "50-55%"},
-            {"max": 60, "color": "#55faad", "label": "55-60%"},
-            {"max": 65, "color": "#94fe6a", "label": "60-65%"},
-            {"max": 70, "color": "#eafb16", "label": "65-70%"},
-            {"max": 75, "color": "#fec600", "label": "70-75%"},
-            {"max": 80, "color": "#fc8602", "label": "75-80%"},
-            {"max": 85, "color": "#fe3401", "label": "80-85%"},
-            {"max": 90, "color": "#ea0000", "label": "85-90%"},
-            {"max": 95, "color": "#b70000", "label": "90-95%"},
-            {"max": 100, "color": "#e10000", "label": "95-100%"},
-        ]
-    },
-    "temperature": {
-        "colors": [
-            {"max": -40, "color": "#fc00fc", "label": "< -40°F"},
-            {"max": -31, "color": "#000085", "label": "-40 to -31°F"},
-            {"max": -21, "color": "#0000b2", "label": "-30 to -21°F"},
-            {"max": -12, "color": "#0000ec", "label": "-21 to -12°F"},
-            {"max": -3, "color": "#0034fe", "label": "-12 to -3°F"},
-            {"max": 5, "color": "#0089fe", "label": "-3 to 5°F"},
-            {"max": 14, "color": "#00d4fe", "label": "5 to 14°F"},
-            {"max": 23, "color": "#1efede", "label": "14 to 23°F"},
-            {"max": 32, "color": "#fbfbfb", "label": "23 to 32°F"},
-            {"max": 41, "color": "#5efe9e", "label": "32 to 41°F"},
-            {"max": 50, "color": "#a2fe5a", "label": "41 to 50°F"},
-            {"max": 59, "color": "#fede00", "label": "50 to 59°F"},
-            {"max": 68, "color": "#fe9e00", "label": "59 to 68°F"},
-            {"max": 77, "color": "#fe5a00", "label": "68 to 77°F"},
-            {"max": 86, "color": "#fe1e00", "label": "77 to 86°F"},
-            {"max": 95, "color": "#e20000", "label": "86 to 95°F"},
-            {"max": 104, "color": "#a90000", "label": "95 to 104°F"},
-            {"max": 113, "color": "#7e0000", "label": "104 to 113°F"},
-            {"max": 999, "color": "#c6c6c6", "label": ">113°F"},
-        ]
-    },
-    "smoke": {
-        "colors": [
-            {"max": 2, "color": "#003f7f", "label": "No Smoke"},
-            {"max": 5, "color": "#4f8fcf", "label": "5 µg/m³"},
-            {"max": 10, "color": "#78bec8", "label": "10 µg/m³"},
-            {"max": 20, "color": "#87d2c1", "label": "20 µg/m³"},
-            {"max": 40, "color": "#d68f87", "label": "40 µg/m³"},
-            {"max": 60, "color": "#c96459", "label": "60 µg/m³"},
-            {"max": 80, "color": "#bd3b2d", "label": "80 µg/m³"},
-            {"max": 100, "color": "#b51504", "label": "100 µg/m³"},
-            {"max": 200, "color": "#654321", "label": "200 µg/m³"},
-            {"max": 999, "color": "#37220f", "label": ">500 µg/m³"},
+MAX_INPUT_HOURS = 168
+FORECAST_HOURS = 96
+
+COLUMNAR_VERSION = 1
+COLUMNAR_DECIMALS = 2
+
+
+class ForecastColumns:
+    """
+    Hourly forecast series as NumPy columns aligned by forecast hour
+    
+    Float columns use NaN for missing values. Category columns are int8
+    codes into the matching *_CATEGORIES tuple, with -1 for missing.
+    """
+    
+    FLOAT_FIELDS = (
+        "cloud_cover_pct", "ecmwf_cloud_pct", "darkness", "moon_illumination",
+        "smoke_ugm3", "wind_speed_mph", "wind_direction", "humidity_pct", "temperature_f",
+    )
+    
+    def __init__(self, start_time: datetime, hours: np.ndarray, tz_offset: float):
+        n = len(hours)
+        self.start_time = start_time
+        self.hours = hours  # offsets from start_time, in hours
+        self.tz_offset = tz_offset
+        # False for the darkness-only fallback built without upstream weather
+        self.complete = True
+        
+        for name in self.FLOAT_FIELDS:
+            setattr(self, name, np.full(n, np.nan))
+        self.is_daylight = np.zeros(n, dtype=bool)
+        self.cloud_cover_category = np.full(n, -1, dtype=np.int8)
+        self.ecmwf_cloud_category = np.full(n, -1, dtype=np.int8)
+        self.seeing = np.full(n, -1, dtype=np.int8)
+        self.transparency = np.full(n, -1, dtype=np.int8)
+    
+    def __len__(self) -> int:
+        return len(self.hours)
+    
+    def local_times(self) -> np.ndarray:
+        """Local wall-clock times as datetime64[m]"""
+        start = np.datetime64(self.start_time.replace(tzinfo=None), "m")
+        offset = np.timedelta64(int(round(self.tz_offset * 60)), "m")
+        return start + offset + self.hours.astype("timedelta64[h]")
+    
+    def freeze(self):
+        """Make every column read-only so the object can be shared"""
+        for value in vars(self).values():
+            if isinstance(value, np.ndarray):
+                value.flags.writeable = False
+    
+    def for_point(self, tz_offset: float) -> "ForecastColumns":
+        """
+        Copy for one point: weather columns are shared, darkness columns
+        are fresh and writable
+        """
+        columns = copy.copy(self)
+        n = len(self)
+        columns.tz_offset = tz_offset
+        columns.darkness = np.full(n, np.nan)
+        columns.moon_illumination = np.full(n, np.nan)
+        columns.is_daylight = np.zeros(n, dtype=bool)
+        return columns
+    
+    def day_bounds(self, local_times: np.ndarray) -> List[tuple]:
+        """(local date, start index, end index) for each local day"""
+        local_dates = np.datetime_as_string(local_times.astype("datetime64[D]"))
+        _, starts = np.unique(local_dates, return_index=True)
+        # Hours are ascending, so each local date is one contiguous run
+        bounds = sorted(starts.tolist()) + [len(local_dates)]
+        return [
+            (str(local_dates[begin]), begin, end)
+            for begin, end in zip(bounds[:-1], bounds[1:])
         ]
-    }
-}
+
+
+def _optional_list(values: np.ndarray) -> List[Optional[float]]:
+    """Convert a float column to a list with None in place of NaN"""
+    out = values.astype(object)
+    out[np.isnan(values)] = None
+    return out.tolist()
+
+
+def _local_hours(local_times: np.ndarray) -> np.ndarray:
+    return local_times.astype("datetime64[h]").astype(np.int64) % 24
+
+
+def _forecast_run_str(run_datetime: datetime) -> str:
+    return f"{run_datetime.strftime('%Y-%m-%dT%H')}:00:00Z"
 
 
 class ForecastBuilder:
@@ -152,274 +130,506 @@ class ForecastBuilder:
     def __init__(self):
         self.cmc = cmc_fetcher
         self.openmeteo = openmeteo_fetcher
+        self.cell_cache = TTLCache(
+            max_entries=settings.CELL_CACHE_SIZE,
+            ttl=settings.FORECAST_CACHE_TTL,
+            hotness=hot_set.score
+        )
     
     async def build_forecast(self, location: Location, 
                              use_cache: bool = True) -> ForecastResponse:
         """
         Build complete forecast for a location
         """
+        columns, run_datetime = await self.build_columns(location)
+        return self.to_response(columns, run_datetime)
+    
+    def data_version(self, data: Optional[RunData] = None) -> Tuple[datetime, datetime, datetime]:
+        """
+        Inputs that determine a forecast's content, without building it
+        
+        data is the RunData the request pinned (default: the current one);
+        data.version identifies its exact contents.
+        
+        Returns (CMC run datetime, Open-Meteo update slot, start hour)
+        """
+        run_datetime = (data or run_data.current()).run_datetime
+        upstream_slot = self.openmeteo.get_update_slot(settings.OPEN_METEO_UPDATE_HOURS)
+        start_time = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+        return run_datetime, upstream_slot, start_time
+    
+    def next_data_change(self, version: Tuple[datetime, datetime, datetime]) -> datetime:
+        """Earliest time any input of data_version() is expected to change"""
+        _, upstream_slot, start_time = version
+        return min(
+            start_time + timedelta(hours=1),
+            upstream_slot + timedelta(hours=settings.OPEN_METEO_UPDATE_HOURS),
+            self.cmc.get_next_model_run_time()
+        )
+    
+    async def build_columns(self, location: Location,
+                            data: Optional[RunData] = None):
+        """
+        Build the hourly forecast columns for a location
+        
+        Weather series come from the shared per-cell cache; only darkness
+        and local time are computed for the exact point.
+        
+        Returns (ForecastColumns, model run datetime)
+        """
         logger.info(f"Building forecast for {location.name} ({location.latitude}, {location.longitude})")
         
-        # Get timezone offset - handle both Location and ForecastLocation
+        cell_columns, run_datetime = await self.build_cell_columns(
+            location.latitude, location.longitude, data, key=getattr(location, "id", None)
+        )
+        columns = cell_columns.for_point(self._tz_offset(location))
+        
+        darkness = await astro_executor.run(
+            calculate_darkness_batch, [location.latitude], [location.longitude],
+            columns.start_time, FORECAST_HOURS
+        )
+        self._apply_darkness(columns, darkness, 0)
+        
+        return columns, run_datetime
+    
+    async def build_columns_many(self, locations: List,
+                                 data: Optional[RunData] = None,
+                                 fallback: bool = False):
+        """
+        Batched build_columns for many locations
+        
+        CMC series for every uncached cell are sampled from the run data in
+        one pass, Open-Meteo cells are fetched with multi-location requests
+        and darkness is computed in one vectorized pass. Entries are None
+        where Open-Meteo had no data for the location's cell, or with
+        fallback, the darkness-only columns build_columns would give
+        (complete is False).
+        
+        Returns (list of ForecastColumns or None, model run datetime)
+        """
+        start_time = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+        data = data or run_data.current()
+        run_datetime = data.run_datetime
+        upstream_slot = self.openmeteo.get_update_slot(settings.OPEN_METEO_UPDATE_HOURS)
+        if not locations:
+            return [], run_datetime
+        
+        lats = np.array([loc.latitude for loc in locations], dtype=float)
+        lons = np.array([loc.longitude for loc in locations], dtype=float)
+        version_keys, cells = await self._fill_cells(
+            lats, lons, [getattr(loc, "id", None) for loc in locations],
+            data, upstream_slot, start_time
+        )
+        
+        darkness = await self._darkness_many(lats, lons, start_time)
+        
+        results: List[Optional[ForecastColumns]] = []
+        for i, (location, version_key) in enumerate(zip(locations, version_keys)):
+            cell_columns, available = cells[version_key]
+            if not available and not fallback:
+                results.append(None)
+                continue
+            columns = cell_columns.for_point(self._tz_offset(location))
+            self._apply_darkness(columns, darkness, i)
+            results.append(columns)
+        
+        return results, run_datetime
+    
+    async def _darkness_many(self, lats: np.ndarray, lons: np.ndarray,
+                             start_time: datetime) -> Dict[str, np.ndarray]:
+        """calculate_darkness_batch split across every astro worker"""
+        n_chunks = min(astro_executor.max_workers, max(1, len(lats) // 100))
+        chunks = [chunk for chunk in np.array_split(np.arange(len(lats)), n_chunks) if len(chunk)]
+        parts = await asyncio.gather(*(
+            astro_executor.run(calculate_darkness_batch, lats[chunk], lons[chunk], start_time, FORECAST_HOURS)
+            for chunk in chunks
+        ))
+        return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+    
+    async def warm_cells(self, points: List[Tuple[float, float]],
+                         data: Optional[RunData] = None):
+        """Fill the cell cache for points without building their forecasts"""
+        if not points:
+            return
+        start_time = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+        upstream_slot = self.openmeteo.get_update_slot(settings.OPEN_METEO_UPDATE_HOURS)
+        lats, lons = (np.array(values, dtype=float) for values in zip(*points))
+        await self._fill_cells(lats, lons, [None] * len(points),
+                               data or run_data.current(), upstream_slot, start_time)
+    
+    async def _fill_cells(self, lats: np.ndarray, lons: np.ndarray, keys: List[Optional[str]],
+                          data: RunData, upstream_slot: datetime, start_time: datetime):
+        """
+        Cell columns for many points, building every uncached cell once
+        
+        Returns (version key per point, {version key: (columns, available)})
+        """
+        # One representative point per cell not already cached
+        version_keys = []
+        cells: Dict[str, Tuple[ForecastColumns, bool]] = {}
+        pending: Dict[str, int] = {}
+        for i, (key, lat, lon) in enumerate(zip(keys, lats.tolist(), lons.tolist())):
+            version_key = self._version_key(
+                self.get_cell_key(lat, lon, data, key),
+                data, upstream_slot, start_time
+            )
+            version_keys.append(version_key)
+            if version_key in cells or version_key in pending:
+                continue
+            cached = self.cell_cache.get(version_key)
+            if cached is not None:
+                cells[version_key] = (cached, True)
+            else:
+                pending[version_key] = i
+        
+        if pending:
+            rep = np.fromiter(pending.values(), dtype=np.int64)
+            logger.info(f"Building {len(rep)} model cells for {len(keys)} points")
+            cmc_data = data.series_many(lats[rep], lons[rep], MAX_INPUT_HOURS)
+            points = list(zip(lats[rep].tolist(), lons[rep].tolist()))
+            forecasts = await self.openmeteo.fetch_forecast_many(points, forecast_days=7)
+            air_qualities = await self.openmeteo.fetch_air_quality_many(points, forecast_days=4)
+            
+            def merge(chunk: np.ndarray) -> List[ForecastColumns]:
+                return [
+                    self._merge_columns(
+                        start_time, cmc_data["seeing"][j], cmc_data["transparency"][j],
+                        cmc_data["cloud_cover"][j], forecasts[j], air_qualities[j]
+                    )
+                    for j in chunk.tolist()
+                ]
+            
+            n_chunks = min(cpu_executor.max_workers, max(1, len(points) // 50))
+            merged = await asyncio.gather(*(
+                cpu_executor.run(merge, chunk)
+                for chunk in np.array_split(np.arange(len(points)), n_chunks)
+            ))
+            all_columns = [columns for part in merged for columns in part]
+            
+            for j, version_key in enumerate(pending):
+                columns = all_columns[j]
+                available = bool(forecasts[j].get("available"))
+                if available:
+                    self.cell_cache.set(version_key, columns, hot_key=cell_key(*points[j]))
+                cells[version_key] = (columns, available)
+        
+        return version_keys, cells
+    
+    def _tz_offset(self, location) -> float:
+        # Handle both Location and ForecastLocation
         if hasattr(location, 'timezone') and location.timezone:
-            tz_offset = get_timezone_offset(location.timezone)
+            return get_timezone_offset(location.timezone)
         elif hasattr(location, 'tz_offset'):
-            tz_offset = location.tz_offset
-        else:
-            tz_offset = 0
+            return location.tz_offset
+        return 0
+    
+    def get_cell_key(self, lat: float, lon: float, data: RunData,
+                     key: Optional[str] = None) -> str:
+        """Canonical key for the CMC and Open-Meteo cells containing a point"""
+        om_lat, om_lon = self.openmeteo.get_model_cell(lat, lon)
+        return f"{data.cell_key(lat, lon, key)}|{om_lat}_{om_lon}"
+    
+    def _version_key(self, cell_key: str, data: RunData,
+                     upstream_slot: datetime, start_time: datetime) -> str:
+        return f"{cell_key}|{data.version}|{upstream_slot:%Y%m%d%H}|{start_time:%Y%m%d%H}"
+    
+    async def build_cell_columns(self, lat: float, lon: float,
+                                 data: Optional[RunData] = None,
+                                 key: Optional[str] = None):
+        """
+        Weather columns for the model cells containing a point
+        
+        Cached per (CMC cells, Open-Meteo cell, data version); the cached
+        arrays are read-only and shared by every point in those cells.
         
+        Returns (ForecastColumns without darkness, model run datetime)
+        """
         now = datetime.now(timezone.utc)
         start_time = now.replace(minute=0, second=0, microsecond=0)
         
-        astro = create_calculator(
-            location.latitude, 
-            location.longitude,
-            location.elevation or 0
-        )
+        data = data or run_data.current()
+        upstream_slot = self.openmeteo.get_update_slot(settings.OPEN_METEO_UPDATE_HOURS)
         
-        model_run, run_datetime = self.cmc.get_latest_model_run()
+        version_key = self._version_key(self.get_cell_key(lat, lon, data, key), data, upstream_slot, start_time)
+        cached = self.cell_cache.get(version_key)
+        if cached is not None:
+            return cached, data.run_datetime
         
-        cmc_data = None
-        if self.cmc._grib_available:
-            cache_key = f"{location.latitude:.2f}_{location.longitude:.2f}"
-            cmc_data = self.cmc.get_cached_forecast(cache_key, model_run)
-            
-            if cmc_data is None:
-                cmc_data = self.cmc.extract_point_forecast(
-                    location.latitude,
-                    location.longitude,
-                    model_run
-                )
-                
-                if cmc_data.get("seeing") or cmc_data.get("transparency"):
-                    self.cmc.save_cached_forecast(cache_key, model_run, cmc_data)
-                    logger.info(f"Cached CMC data for {location.name}")
-        
-        openmeteo_data = await self.openmeteo.fetch_forecast(
-            location.latitude,
-            location.longitude,
-            forecast_days=7
-        )
+        # CMC series indexed by forecast_hour - 1
+        cmc_data = data.series(lat, lon, MAX_INPUT_HOURS)
         
-        # Fetch air quality for smoke
-        air_quality = await self.openmeteo.fetch_air_quality(
-            location.latitude,
-            location.longitude,
-            forecast_days=4
-        )
+        openmeteo_data = await self.openmeteo.fetch_forecast(lat, lon, forecast_days=7)
         
-        darkness_data = astro.calculate_hourly_darkness(start_time, hours=96)
+        # Fetch air quality for smoke
+        air_quality = await self.openmeteo.fetch_air_quality(lat, lon, forecast_days=4)
         
-        hourly_forecasts = []
+        columns = await cpu_executor.run(
+            self._merge_columns, start_time, cmc_data["seeing"], cmc_data["transparency"],
+            cmc_data["cloud_cover"], openmeteo_data, air_quality
+        )
+        # Without upstream data, let the fetcher's short negative cache decide retries
+        if openmeteo_data.get("available"):
+            self.cell_cache.set(version_key, columns, hot_key=cell_key(lat, lon))
         
-        cmc_seeing_by_hour = {}
-        cmc_transp_by_hour = {}
-        cmc_cloud_by_hour = {}
-        
-        if cmc_data:
-            for item in cmc_data.get("seeing", []):
-                if item.get("forecast_hour"):
-                    cmc_seeing_by_hour[item["forecast_hour"]] = item["value"]
-            for item in cmc_data.get("transparency", []):
-                if item.get("forecast_hour"):
-                    cmc_transp_by_hour[item["forecast_hour"]] = item["value"]
-            for item in cmc_data.get("cloud_cover", []):
-                if item.get("forecast_hour"):
-                    cmc_cloud_by_hour[item["forecast_hour"]] = item["value"]
-        
-        has_cmc_seeing = len(cmc_seeing_by_hour) > 0
-        has_cmc_transp = len(cmc_transp_by_hour) > 0
-        
-        if has_cmc_seeing or has_cmc_transp:
-            logger.info(f"Using CMC astronomy data: {len(cmc_seeing_by_hour)} seeing, {len(cmc_transp_by_hour)} transparency values")
+        return columns, data.run_datetime
+    
+    def _merge_columns(self, start_time: datetime, cmc_seeing: np.ndarray,
+                       cmc_transp: np.ndarray, cmc_cloud: np.ndarray,
+                       openmeteo_data: Dict, air_quality: Dict) -> ForecastColumns:
+        """Frozen weather columns from CMC series and Open-Meteo responses"""
+        n_seeing = int(np.count_nonzero(~np.isnan(cmc_seeing)))
+        n_transp = int(np.count_nonzero(~np.isnan(cmc_transp)))
+        if n_seeing or n_transp:
+            logger.debug(f"Using CMC astronomy data: {n_seeing} seeing, {n_transp} transparency values")
         else:
-            logger.info("No CMC astronomy data available, using estimation")
+            logger.debug("No CMC astronomy data available, using estimation")
         
+        columns = None
         if openmeteo_data.get("available"):
             hourly = openmeteo_data.get("hourly", {})
-            times = hourly.get("time", [])
+            times = hourly.get("time", [])[:MAX_INPUT_HOURS]
+            n = len(times)
             
-            for i, time_str in enumerate(times[:168]):
-                try:
-                    dt = datetime.fromisoformat(time_str.replace('Z', '+00:00'))
-                    if dt.tzinfo is None:
-                        dt = dt.replace(tzinfo=timezone.utc)
-                except:
-                    dt = start_time + timedelta(hours=i)
-                    
-                # Skip past hours
-                if dt < start_time:
-                    continue
-                
-                forecast_hour = i + 1
-                
-                cloud_cover = hourly.get("cloud_cover", [None] * len(times))[i]
-                temp_c = hourly.get("temperature_2m", [None] * len(times))[i]
-                humidity = hourly.get("relative_humidity_2m", [None] * len(times))[i]
-                wind_speed = hourly.get("wind_speed_10m", [None] * len(times))[i]
-                wind_dir = hourly.get("wind_direction_10m", [None] * len(times))[i]
-                visibility = hourly.get("visibility", [None] * len(times))[i]
+            hours_from_start = self._hours_from_start(times, start_time)
+            # Open-Meteo index i corresponds to CMC forecast hour i + 1
+            sel = np.flatnonzero(hours_from_start >= 0)[:FORECAST_HOURS]
+            
+            if len(sel):
+                columns = ForecastColumns(start_time, hours_from_start[sel], 0)
                 
-                cmc_cloud = cmc_cloud_by_hour.get(forecast_hour)
-                if cmc_cloud is not None:
-                    cloud_cover = cmc_cloud
+                ecmwf_cloud = self._column(hourly, "cloud_cover", n)[sel]
+                temp_c = self._column(hourly, "temperature_2m", n)[sel]
+                humidity = self._column(hourly, "relative_humidity_2m", n)[sel]
+                wind_speed = self._column(hourly, "wind_speed_10m", n)[sel]
+                wind_dir = self._column(hourly, "wind_direction_10m", n)[sel]
                 
-                temp_f = (temp_c * 9/5 + 32) if temp_c is not None else None
-                wind_mph = (wind_speed * 0.621371) if wind_speed is not None else None
+                cmc_cloud_sel = cmc_cloud[sel]
+                cloud = np.where(np.isnan(cmc_cloud_sel), ecmwf_cloud, cmc_cloud_sel)
+                wind_mph = wind_speed * 0.621371
                 
-                hours_from_start = int((dt - start_time).total_seconds() / 3600)
-                dark = darkness_data[hours_from_start] if 0 <= hours_from_start < len(darkness_data) else {}
+                columns.cloud_cover_pct = cloud
+                columns.cloud_cover_category = classification.categorize_cloud(cloud)
+                columns.ecmwf_cloud_pct = ecmwf_cloud
+                columns.ecmwf_cloud_category = classification.categorize_cloud(ecmwf_cloud)
+                columns.temperature_f = temp_c * 9 / 5 + 32
+                columns.wind_speed_mph = wind_mph
+                columns.wind_direction = wind_dir
+                columns.humidity_pct = humidity
                 
-                if has_cmc_seeing and forecast_hour in cmc_seeing_by_hour:
-                    raw_seeing = cmc_seeing_by_hour[forecast_hour]
-                    seeing = self.cmc.convert_seeing_value(raw_seeing)
-                else:
-                    seeing = self._estimate_seeing(cloud_cover, wind_mph)
+                raw_seeing = cmc_seeing[sel]
+                columns.seeing = np.where(
+                    np.isnan(raw_seeing),
+                    classification.estimate_seeing(cloud, wind_mph),
+                    classification.convert_seeing(raw_seeing)
+                ).astype(np.int8)
                 
-                if has_cmc_transp and forecast_hour in cmc_transp_by_hour:
-                    raw_transp = cmc_transp_by_hour[forecast_hour]
-                    transparency = self.cmc.convert_transparency_value(raw_transp, cloud_cover)
-                else:
-                    transparency = self._estimate_transparency(cloud_cover, humidity, visibility)
+                raw_transp = cmc_transp[sel]
+                columns.transparency = np.where(
+                    np.isnan(raw_transp),
+                    classification.estimate_transparency(cloud, humidity),
+                    classification.convert_transparency(raw_transp, cloud)
+                ).astype(np.int8)
                 
-                if cloud_cover is not None and cloud_cover > 90:
-                    seeing = "too_cloudy"
-                    transparency = "too_cloudy"
+                overcast = cloud > 90
+                columns.seeing[overcast] = 0
+                columns.transparency[overcast] = 0
                 
                 # Get smoke (PM2.5)
-                smoke = None
                 if air_quality.get("available"):
                     aq_hourly = air_quality.get("hourly", {})
-                    pm25_list = aq_hourly.get("pm2_5", [])
-                    if i < len(pm25_list):
-                        smoke = pm25_list[i]
-                
-                local_dt = dt + timedelta(hours=tz_offset)
-                
-                hourly_forecast = HourlyForecast(
-                    time=dt,
-                    hour_local=local_dt.hour,
-                    cloud_cover_pct=cloud_cover,
-                    cloud_cover_category=self._categorize_cloud(cloud_cover),
-                    ecmwf_cloud_pct=hourly.get("cloud_cover", [None] * len(times))[i],
-                    ecmwf_cloud_category=self._categorize_cloud(hourly.get("cloud_cover", [None] * len(times))[i]),
-                    transparency=transparency,
-                    seeing=seeing,
-                    darkness=dark.get("limiting_mag"),
-                    is_daylight=dark.get("is_daylight", False),
-                    moon_illumination=dark.get("moon_illumination"),
-                    wind_speed_mph=wind_mph,
-                    wind_direction=wind_dir,
-                    humidity_pct=humidity,
-                    temperature_f=temp_f,
-                    smoke_ugm3=smoke,
-                    is_connected_block=False
-                )
-                hourly_forecasts.append(hourly_forecast)
-                
-                if len(hourly_forecasts) >= 96:
-                    break
+                    columns.smoke_ugm3 = self._column(aq_hourly, "pm2_5", n)[sel]
         
-        if not hourly_forecasts:
-            for i, dark in enumerate(darkness_data):
-                dt = start_time + timedelta(hours=i)
-                local_dt = dt + timedelta(hours=tz_offset)
-                
-                hourly_forecast = HourlyForecast(
-                    time=dt,
-                    hour_local=local_dt.hour,
-                    darkness=dark.get("limiting_mag"),
-                    is_daylight=dark.get("is_daylight", False),
-                    moon_illumination=dark.get("moon_illumination"),
-                )
-                hourly_forecasts.append(hourly_forecast)
+        if columns is None:
+            columns = ForecastColumns(start_time, np.arange(FORECAST_HOURS), 0)
+            columns.complete = False
         
-        days = self._group_by_day(hourly_forecasts, tz_offset)
+        columns.freeze()
+        return columns
+    
+    def to_response(self, columns: ForecastColumns,
+                    run_datetime: datetime) -> ForecastResponse:
+        """Materialize columns into the API response model"""
+        hours = columns.hours.tolist()
+        local_times = columns.local_times()
+        local_hours = _local_hours(local_times).tolist()
+        
+        fields = {name: _optional_list(getattr(columns, name)) for name in ForecastColumns.FLOAT_FIELDS}
+        cloud_cat = classification.labels(columns.cloud_cover_category, CLOUD_CATEGORIES)
+        ecmwf_cat = classification.labels(columns.ecmwf_cloud_category, CLOUD_CATEGORIES)
+        seeing = classification.labels(columns.seeing, SEEING_CATEGORIES)
+        transparency = classification.labels(columns.transparency, TRANSPARENCY_CATEGORIES)
+        is_daylight = columns.is_daylight.tolist()
         
-        forecast_run_str = f"{run_datetime.strftime('%Y-%m-%dT%H')}:00:00Z"
+        hourly_forecasts = []
+        for i, h in enumerate(hours):
+            hourly_forecasts.append(HourlyForecast(
+                time=columns.start_time + timedelta(hours=h),
+                hour_local=local_hours[i],
+                cloud_cover_pct=fields["cloud_cover_pct"][i],
+                cloud_cover_category=cloud_cat[i],
+                ecmwf_cloud_pct=fields["ecmwf_cloud_pct"][i],
+                ecmwf_cloud_category=ecmwf_cat[i],
+                transparency=transparency[i],
+                seeing=seeing[i],
+                darkness=fields["darkness"][i],
+                is_daylight=is_daylight[i],
+                moon_illumination=fields["moon_illumination"][i],
+                wind_speed_mph=fields["wind_speed_mph"][i],
+                wind_direction=fields["wind_direction"][i],
+                humidity_pct=fields["humidity_pct"][i],
+                temperature_f=fields["temperature_f"][i],
+                smoke_ugm3=fields["smoke_ugm3"][i],
+                is_connected_block=False
+            ))
+        
+        days = [
+            DayForecast(date=date, hours=hourly_forecasts[begin:end])
+            for date, begin, end in columns.day_bounds(local_times)
+        ]
         
         return ForecastResponse(
             location=None,
             generated_at=datetime.now(timezone.utc),
-            forecast_run=forecast_run_str,
+            forecast_run=_forecast_run_str(run_datetime),
             forecast_hours=len(hourly_forecasts),
             days=days,
             color_scales=COLOR_SCALES
         )
     
-    def _categorize_cloud(self, cloud_pct: Optional[float]) -> Optional[str]:
-        if cloud_pct is None:
-            return None
-        if cloud_pct < 10:
-            return "clear"
-        elif cloud_pct < 30:
-            return "mostly_clear"
-        elif cloud_pct < 50:
-            return "partly_cloudy"
-        elif cloud_pct < 70:
-            return "mostly_cloudy"
-        elif cloud_pct < 90:
-            return "cloudy"
-        else:
-            return "overcast"
-    
-    def _estimate_transparency(self, cloud: Optional[float], 
-                               humidity: Optional[float],
-                               visibility: Optional[float]) -> Optional[str]:
-        if cloud is not None and cloud > 30:
-            return "too_cloudy"
-        
-        if humidity is None:
-            return None
-        
-        if humidity > 85:
-            return "poor"
-        elif humidity > 70:
-            return "below_avg"
-        elif humidity > 55:
-            return "average"
-        elif humidity > 40:
-            return "above_avg"
-        else:
-            return "transparent"
-    
-    def _estimate_seeing(self, cloud: Optional[float], 
-                         wind_mph: Optional[float]) -> Optional[str]:
-        if cloud is not None and cloud > 80:
-            return "too_cloudy"
-        
-        if wind_mph is None:
-            return "poor"
-        
-        if wind_mph > 20:
-            return "bad"
-        elif wind_mph > 12:
-            return "poor"
-        elif wind_mph > 6:
-            return "average"
-        else:
-            return "good"
+    def to_columnar(self, columns: ForecastColumns,
+                    run_datetime: datetime) -> Dict[str, Any]:
+        """
+        Columnar wire format: one array per field
+        
+        Categories are small-integer codes into the "categories" tables and
+        every colored field gets a column of COLOR_SCALES indices. The color
+        scales themselves are served separately, identified by version.
+        """
+        local_times = columns.local_times()
+        scales = classification.SCALES
+        
+        data = {
+            "hour_offset": columns.hours.tolist(),
+            "hour_local": _local_hours(local_times).tolist(),
+            "is_daylight": columns.is_daylight.astype(np.int8).tolist(),
+            "cloud_cover_category": columns.cloud_cover_category.tolist(),
+            "ecmwf_cloud_category": columns.ecmwf_cloud_category.tolist(),
+            "seeing": columns.seeing.tolist(),
+            "transparency": columns.transparency.tolist(),
+        }
+        for name in ForecastColumns.FLOAT_FIELDS:
+            data[name] = _optional_list(np.round(getattr(columns, name), COLUMNAR_DECIMALS))
+        
+        colors = {
+            "cloud_cover": scales["cloud_cover"].color_index(columns.cloud_cover_pct),
+            "ecmwf_cloud": scales["cloud_cover"].color_index(columns.ecmwf_cloud_pct),
+            "transparency": scales["transparency"].color_index(columns.transparency),
+            "seeing": scales["seeing"].color_index(columns.seeing),
+            "darkness": scales["darkness"].color_index(columns.darkness),
+            "wind": scales["wind"].color_index(columns.wind_speed_mph),
+            "humidity": scales["humidity"].color_index(columns.humidity_pct),
+            "temperature": scales["temperature"].color_index(columns.temperature_f),
+            "smoke": scales["smoke"].color_index(columns.smoke_ugm3),
+        }
+        
+        return {
+            "format": "columnar",
+            "format_version": COLUMNAR_VERSION,
+            "location": None,
+            "generated_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "forecast_run": _forecast_run_str(run_datetime),
+            "forecast_hours": len(columns),
+            "start_time": columns.start_time.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "tz_offset": columns.tz_offset,
+            "days": [
+                {"date": date, "start": begin, "count": end - begin}
+                for date, begin, end in columns.day_bounds(local_times)
+            ],
+            "columns": data,
+            "categories": {
+                "cloud_cover_category": list(CLOUD_CATEGORIES),
+                "ecmwf_cloud_category": list(CLOUD_CATEGORIES),
+                "seeing": list(SEEING_CATEGORIES),
+                "transparency": list(TRANSPARENCY_CATEGORIES),
+            },
+            "colors": {name: idx.tolist() for name, idx in colors.items()},
+            "color_scales_version": classification.COLOR_SCALES_VERSION,
+        }
     
-    def _group_by_day(self, forecasts: List[HourlyForecast], 
-                      tz_offset: float) -> List[DayForecast]:
-        days_dict: Dict[str, List[HourlyForecast]] = {}
+    def to_columnar_batch(self, columns_list: List[Optional[ForecastColumns]],
+                          run_datetime: datetime) -> Dict[str, Any]:
+        """
+        Columnar format for many locations at once
         
-        for f in forecasts:
-            local_dt = f.time + timedelta(hours=tz_offset)
-            date_str = local_dt.strftime("%Y-%m-%d")
-            
-            if date_str not in days_dict:
-                days_dict[date_str] = []
-            days_dict[date_str].append(f)
-        
-        days = []
-        for date_str in sorted(days_dict.keys()):
-            days.append(DayForecast(
-                date=date_str,
-                hours=days_dict[date_str]
-            ))
+        Every per-location value of to_columnar becomes a list with one
+        entry per location, in order (null where a location has no data);
+        the shared tables are given once.
+        """
+        payloads = [
+            self.to_columnar(columns, run_datetime) if columns is not None else None
+            for columns in columns_list
+        ]
+        first = next((payload for payload in payloads if payload is not None), None)
+        
+        def per_location(get) -> List:
+            return [get(payload) if payload is not None else None for payload in payloads]
         
-        return days
+        return {
+            "format": "columnar-batch",
+            "format_version": COLUMNAR_VERSION,
+            "locations": None,
+            "generated_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "forecast_run": _forecast_run_str(run_datetime),
+            "start_time": first["start_time"] if first else None,
+            "count": len(payloads),
+            "forecast_hours": per_location(lambda p: p["forecast_hours"]),
+            "tz_offset": per_location(lambda p: p["tz_offset"]),
+            "days": per_location(lambda p: p["days"]),
+            "columns": {
+                name: per_location(lambda p: p["columns"][name])
+                for name in (first["columns"] if first else ())
+            },
+            "categories": {
+                "cloud_cover_category": list(CLOUD_CATEGORIES),
+                "ecmwf_cloud_category": list(CLOUD_CATEGORIES),
+                "seeing": list(SEEING_CATEGORIES),
+                "transparency": list(TRANSPARENCY_CATEGORIES),
+            },
+            "colors": {
+                name: per_location(lambda p: p["colors"][name])
+                for name in (first["colors"] if first else ())
+            },
+            "color_scales_version": classification.COLOR_SCALES_VERSION,
+        }
+    
+    def _column(self, hourly: Dict[str, List], name: str, n: int) -> np.ndarray:
+        column = np.full(n, np.nan)
+        values = hourly.get(name)
+        if values:
+            values = np.array(values[:n], dtype=float)
+            column[:len(values)] = values
+        return column
+    
+    def _hours_from_start(self, times: List[str], start_time: datetime) -> np.ndarray:
+        start = np.datetime64(start_time.replace(tzinfo=None), "m")
+        try:
+            if times and times[0].endswith("Z"):
+                times = [t[:-1] for t in times]
+            parsed = np.array(times, dtype="datetime64[m]")
+            return ((parsed - start) // np.timedelta64(1, "h")).astype(np.int64)
+        except ValueError:
+            # Unparseable timestamps: assume hourly series starting now
+            return np.arange(len(times), dtype=np.int64)
+    
+    def _apply_darkness(self, columns: ForecastColumns,
+                        darkness: Dict[str, np.ndarray], row: int):
+        """Copy one point's row of calculate_darkness_batch output"""
+        limiting_mag = darkness["limiting_mag"][row]
+        valid = columns.hours < len(limiting_mag)
+        idx = columns.hours[valid]
+        columns.darkness[valid] = limiting_mag[idx]
+        columns.moon_illumination[valid] = darkness["moon_illumination"][row][idx]
+        columns.is_daylight[valid] = darkness["is_daylight"][row][idx]
 
 
-forecast_builder = ForecastBuilder()
\ No newline at end of file
+forecast_builder = ForecastBuilder()
@@ -0,0 +1,139 @@
+"""
+Grid Geometry Service
+Maps latitude/longitude to (row, col) cells of a CMC GRIB grid
+
+The RDPS astronomy grid is polar stereographic (PS35km), so lookups use the
+analytic projection when the GRIB keys describe one. Any other grid falls
+back to a nearest-neighbour search over the grid's own lat/lon arrays.
+"""
+
+import logging
+from typing import Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_M = 6371229.0
+
+
+def _unit_vectors(lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    lat = np.radians(lats)
+    lon = np.radians(lons)
+    return np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+class PolarStereographic:
+    """Forward projection for a north-pole polar stereographic grid"""
+
+    def __init__(self, lad: float, lov: float, dx: float, dy: float,
+                 lat1: float, lon1: float, j_positive: bool = True,
+                 radius: float = EARTH_RADIUS_M):
+        self.scale = radius * (1 + np.sin(np.radians(lad)))
+        self.lov = lov
+        self.dx = dx
+        self.dy = dy
+        self.j_positive = j_positive
+        self.x0, self.y0 = self.project(np.array([lat1]), np.array([lon1]))
+        self.x0, self.y0 = float(self.x0[0]), float(self.y0[0])
+
+    def project(self, lats: np.ndarray, lons: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        lat = np.radians(lats)
+        dlon = np.radians(lons - self.lov)
+        m = self.scale * np.cos(lat) / (1 + np.sin(lat))
+        return m * np.sin(dlon), -m * np.cos(dlon)
+
+    def cells(self, lats: np.ndarray, lons: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        x, y = self.project(lats, lons)
+        cols = np.rint((x - self.x0) / self.dx).astype(np.int64)
+        if self.j_positive:
+            rows = np.rint((y - self.y0) / self.dy).astype(np.int64)
+        else:
+            rows = np.rint((self.y0 - y) / self.dy).astype(np.int64)
+        return rows, cols
+
+
+class GridGeometry:
+    """
+    Cell lookup for one GRIB grid (shape ny x nx)
+
+    Points more than ~1.5 grid spacings from every cell are outside the grid.
+    """
+
+    def __init__(self, lats: np.ndarray, lons: np.ndarray,
+                 projection: Optional[PolarStereographic] = None):
+        self.shape = lats.shape
+        self._vectors = _unit_vectors(lats, lons).reshape(-1, 3)
+
+        # Typical angular spacing between neighbouring cells
+        step = np.einsum("ij,ij->i", self._vectors[:-1], self._vectors[1:])
+        self._max_angle = 1.5 * float(np.median(np.arccos(np.clip(step, -1, 1))))
+
+        self.projection = projection
+        if projection is not None and not self._projection_matches(lats, lons):
+            logger.warning("GRIB projection keys do not match grid coordinates; using nearest-neighbour lookup")
+            self.projection = None
+
+    @classmethod
+    def from_grib_message(cls, grb) -> "GridGeometry":
+        lats, lons = grb.latlons()
+        return cls(np.asarray(lats, dtype=float), np.asarray(lons, dtype=float),
+                   cls._projection_from_grib(grb))
+
+    @staticmethod
+    def _projection_from_grib(grb) -> Optional[PolarStereographic]:
+        try:
+            if grb["gridType"] != "polar_stereographic" or grb["projectionCentreFlag"] & 128:
+                return None
+            radius = grb["radius"] if grb.has_key("radius") else EARTH_RADIUS_M
+            return PolarStereographic(
+                lad=grb["LaDInDegrees"],
+                lov=grb["orientationOfTheGridInDegrees"],
+                dx=grb["DxInMetres"],
+                dy=grb["DyInMetres"],
+                lat1=grb["latitudeOfFirstGridPointInDegrees"],
+                lon1=grb["longitudeOfFirstGridPointInDegrees"],
+                j_positive=bool(grb["jScansPositively"]),
+                radius=radius
+            )
+        except Exception as e:
+            logger.debug(f"No usable projection keys: {e}")
+            return None
+
+    def _projection_matches(self, lats: np.ndarray, lons: np.ndarray) -> bool:
+        ny, nx = self.shape
+        rows = np.linspace(0, ny - 1, 7).astype(int).repeat(7)
+        cols = np.tile(np.linspace(0, nx - 1, 7).astype(int), 7)
+        got_rows, got_cols = self.projection.cells(lats[rows, cols], lons[rows, cols])
+        return bool(np.array_equal(got_rows, rows) and np.array_equal(got_cols, cols))
+
+    def locate(self, lat: float, lon: float) -> Optional[Tuple[int, int]]:
+        """(row, col) of the cell containing a point, or None outside the grid"""
+        rows, cols, valid = self.locate_many(np.array([lat]), np.array([lon]))
+        if not valid[0]:
+            return None
+        return int(rows[0]), int(cols[0])
+
+    def locate_many(self, lats: np.ndarray, lons: np.ndarray,
+                    chunk: int = 256) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Vectorized locate: (rows, cols, valid mask)"""
+        lats = np.asarray(lats, dtype=float)
+        lons = np.asarray(lons, dtype=float)
+        ny, nx = self.shape
+
+        if self.projection is not None:
+            rows, cols = self.projection.cells(lats, lons)
+            valid = (rows >= 0) & (rows < ny) & (cols >= 0) & (cols < nx)
+            return np.where(valid, rows, 0), np.where(valid, cols, 0), valid
+
+        points = _unit_vectors(lats, lons)
+        flat = np.empty(len(points), dtype=np.int64)
+        best = np.empty(len(points))
+        for start in range(0, len(points), chunk):
+            dots = points[start:start + chunk] @ self._vectors.T
+            idx = np.argmax(dots, axis=1)
+            flat[start:start + chunk] = idx
+            best[start:start + chunk] = dots[np.arange(len(idx)), idx]
+        valid = np.arccos(np.clip(best, -1, 1)) <= self._max_angle
+        rows, cols = np.divmod(flat, nx)
+        return rows, cols, valid
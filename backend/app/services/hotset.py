@@ -0,0 +1,288 @@
+"""
+Hot-Set Tracking Service
+Decaying access frequencies for locations and coordinate cells
+
+Requests are counted in a count-min sketch whose counts halve every
+HOTSET_HALF_LIFE_HOURS, with a top-K list of the hottest keys alongside.
+Memory is fixed regardless of how many distinct keys are seen, so custom
+coordinates can be tracked as well as catalog locations.
+
+Consumers:
+- snapshot builds (and so rollover warming) go hottest location first
+- the hottest coordinate cells are warmed after each build
+- caches evict the coldest of their least recently used entries
+
+The API counts the requests it answers. Snapshot files served by the web
+server are counted from its access log (AccessLogTail), since those
+requests never reach the API.
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+# Rescale once weights grow this large, long before float64 loses precision
+MAX_WEIGHT = 2.0 ** 30
+
+# A snapshot request in a web server access log line ("combined" or similar)
+SNAPSHOT_REQUEST = re.compile(r'"(?:GET|HEAD) /api/forecast/([A-Za-z0-9_-]+) HTTP/')
+
+
+def location_key(key: str) -> str:
+    """Hot-set key for a catalog location"""
+    return f"loc:{key}"
+
+
+def cell_key(lat: float, lon: float) -> str:
+    """Hot-set key for the Open-Meteo model cell containing a point"""
+    res = settings.OPEN_METEO_CELL_DEG
+    return f"cell:{round(round(lat / res) * res, 4)}_{round(round(lon / res) * res, 4)}"
+
+
+def parse_cell_key(key: str) -> Optional[Tuple[float, float]]:
+    """Inverse of cell_key: the cell center, or None for other keys"""
+    if not key.startswith("cell:"):
+        return None
+    lat, lon = key[5:].split("_")
+    return float(lat), float(lon)
+
+
+class HotSet:
+    """
+    Count-min sketch with exponential decay plus a top-K list
+
+    Decay is applied lazily: each hit adds 2 ** (age / half_life) instead of
+    1, and reads divide by the same factor, so nothing is touched on the
+    clock. Updates are conservative (only the smallest counters grow), which
+    keeps overestimates from hash collisions low.
+    """
+
+    def __init__(self, width: int, depth: int, top_k: int, half_life_hours: float,
+                 persist_path: Optional[Path] = None,
+                 persist_interval: float = 300):
+        self.width = width
+        self.depth = depth
+        self.top_k = top_k
+        self.half_life = half_life_hours * 3600
+        self.persist_path = Path(persist_path) if persist_path else None
+        self.persist_interval = persist_interval
+
+        self._counts = np.zeros((depth, width), dtype=np.float64)
+        self._rows = np.arange(depth)
+        self._epoch = time.time()
+        # Hottest keys with their estimate, in the same units as _counts
+        self._top: Dict[str, float] = {}
+        self._floor = 0.0
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_saved = time.time()
+
+        self.recorded = 0
+
+        if self.persist_path:
+            self.load()
+
+    def _columns(self, key: str) -> np.ndarray:
+        digest = hashlib.blake2b(key.encode(), digest_size=4 * self.depth).digest()
+        return np.frombuffer(digest, dtype="<u4") % self.width
+
+    def _weight(self, now: float) -> float:
+        return 2.0 ** ((now - self._epoch) / self.half_life)
+
+    def _rescale(self, now: float):
+        """Move the epoch to now; estimates are unchanged"""
+        weight = self._weight(now)
+        self._counts /= weight
+        self._top = {key: value / weight for key, value in self._top.items()}
+        self._floor /= weight
+        self._epoch = now
+
+    def record(self, key: str, n: float = 1):
+        """Count n accesses to a key"""
+        now = time.time()
+        columns = self._columns(key)
+        with self._lock:
+            weight = self._weight(now)
+            if weight > MAX_WEIGHT:
+                self._rescale(now)
+                weight = 1.0
+            current = self._counts[self._rows, columns]
+            estimate = current.min() + n * weight
+            self._counts[self._rows, columns] = np.maximum(current, estimate)
+            self._offer(key, estimate)
+            self.recorded += 1
+            self._dirty = True
+
+    def save_due(self) -> bool:
+        """True once persist_interval has passed since the last save"""
+        return bool(self.persist_path) and time.time() - self._last_saved >= self.persist_interval
+
+    def _offer(self, key: str, estimate: float):
+        """Keep key in the top-K list if it is hot enough (lock held)"""
+        top = self._top
+        if key in top or len(top) < self.top_k:
+            top[key] = estimate
+            if len(top) == self.top_k:
+                self._floor = min(top.values())
+            return
+        if estimate <= self._floor:
+            return
+        del top[min(top, key=top.get)]
+        top[key] = estimate
+        self._floor = min(top.values())
+
+    def score(self, key: Optional[str]) -> float:
+        """Decayed access count for a key (an upper bound); 0 for None"""
+        if key is None:
+            return 0.0
+        columns = self._columns(key)
+        with self._lock:
+            return float(self._counts[self._rows, columns].min()) / self._weight(time.time())
+
+    def scores(self, keys: Iterable[str]) -> np.ndarray:
+        """score for many keys in one pass"""
+        keys = list(keys)
+        if not keys:
+            return np.zeros(0)
+        columns = np.stack([self._columns(key) for key in keys], axis=1)
+        with self._lock:
+            counts = self._counts[self._rows[:, None], columns].min(axis=0)
+            return counts / self._weight(time.time())
+
+    def top(self, n: Optional[int] = None, prefix: str = "") -> List[Tuple[str, float]]:
+        """Hottest tracked keys with their decayed counts, hottest first"""
+        with self._lock:
+            weight = self._weight(time.time())
+            items = [(key, value / weight) for key, value in self._top.items() if key.startswith(prefix)]
+        items.sort(key=lambda item: item[1], reverse=True)
+        return items[:n] if n is not None else items
+
+    def stats(self) -> Dict:
+        return {
+            "recorded": self.recorded,
+            "tracked": len(self._top),
+            "top": [[key, round(value, 1)] for key, value in self.top(10)],
+        }
+
+    def load(self):
+        """Restore a persisted sketch, decayed by the time it spent on disk"""
+        if not self.persist_path or not self.persist_path.exists():
+            return
+        try:
+            with open(self.persist_path) as f:
+                raw = json.load(f)
+            counts = np.frombuffer(base64.b64decode(raw["counts"]), dtype=np.float32)
+            counts = counts.astype(np.float64).reshape(raw["depth"], raw["width"])
+        except Exception as e:
+            logger.warning(f"Could not load hot set {self.persist_path}: {e}")
+            return
+        if counts.shape != self._counts.shape:
+            logger.info("Hot set dimensions changed; starting from empty counts")
+            return
+
+        with self._lock:
+            self._counts = counts
+            self._epoch = raw["epoch"]
+            self._top = {}
+            self._floor = 0.0
+            for key, value in sorted(raw["top"].items(), key=lambda item: item[1], reverse=True):
+                self._offer(key, value)
+        logger.info(f"Loaded hot set with {len(self._top)} tracked keys")
+
+    def save(self):
+        """Write the sketch to disk atomically (temp file + rename)"""
+        if not self.persist_path:
+            return
+        now = time.time()
+        with self._lock:
+            if not self._dirty:
+                self._last_saved = now
+                return
+            # Small epoch-relative values, so float32 loses nothing that matters
+            self._rescale(now)
+            snapshot = {
+                "width": self.width,
+                "depth": self.depth,
+                "epoch": self._epoch,
+                "counts": base64.b64encode(self._counts.astype(np.float32).tobytes()).decode(),
+                "top": dict(self._top),
+            }
+            self._dirty = False
+            self._last_saved = now
+
+        try:
+            self.persist_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.persist_path.with_suffix(".tmp")
+            with open(tmp_path, "w") as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, self.persist_path)
+        except Exception as e:
+            logger.error(f"Could not save hot set {self.persist_path}: {e}")
+
+
+hot_set = HotSet(
+    width=settings.HOTSET_WIDTH,
+    depth=settings.HOTSET_DEPTH,
+    top_k=settings.HOTSET_TOP_K,
+    half_life_hours=settings.HOTSET_HALF_LIFE_HOURS,
+    persist_path=Path(settings.CACHE_DIR) / "hotset.json",
+    persist_interval=settings.HOTSET_PERSIST_INTERVAL
+)
+
+
+class AccessLogTail:
+    """
+    Snapshot requests appended to a web server access log since the last read
+
+    Reading starts at the end of the log, so a restart doesn't count old
+    lines again, and follows rotation (a new file, or the same one
+    truncated). A partly written last line is left for the next read.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._inode: Optional[int] = None
+        self._offset: Optional[int] = None
+
+    def read(self) -> Counter:
+        """Request counts by location key (blocking)"""
+        try:
+            stat = self.path.stat()
+        except OSError:
+            return Counter()
+        if self._offset is None:
+            self._inode, self._offset = stat.st_ino, stat.st_size
+            return Counter()
+        if stat.st_ino != self._inode or stat.st_size < self._offset:
+            self._inode, self._offset = stat.st_ino, 0
+
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+        self._offset += end
+        return Counter(
+            match.group(1)
+            for match in SNAPSHOT_REQUEST.finditer(data[:end].decode("utf-8", "replace"))
+        )
+
+
+def record_request(key: Optional[str], lat: float, lon: float, n: float = 1):
+    """Count forecast requests against their location (if any) and cell"""
+    if key:
+        hot_set.record(location_key(key), n)
+    hot_set.record(cell_key(lat, lon), n)
@@ -0,0 +1,161 @@
+"""
+Location Tiles Service
+GeoJSON map tiles of the active locations, colored by tonight's conditions
+
+/api/locations/tiles/{z}/{x}/{y} uses the usual XYZ (Web Mercator) scheme.
+Every point feature carries the location's tonight scores from the
+published snapshot (clear dark hours, best seeing and transparency). Up to
+LOCATION_TILE_CLUSTER_MAX_ZOOM, locations are clustered on a grid of
+LOCATION_TILE_CLUSTER_GRID cells per tile side; a cluster carries its
+count, its best member's scores and key, and sits at its members' mean.
+
+Tiles depend only on the catalog and the snapshot run, so they are encoded
+once per (catalog version, run) and cached; a new run or a location write
+changes the version and later requests build fresh tiles.
+"""
+
+import logging
+import math
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..config import settings
+from .catalog import Catalog, location_catalog
+from .precompute import snapshot_store
+from .response_cache import EncodedResponse, encode_json, location_tile_cache, make_etag
+from .tonight import TonightScores, NO_SCORE
+
+logger = logging.getLogger(__name__)
+
+# Web Mercator stops short of the poles
+MAX_LATITUDE = 85.0511287798
+# Browser cache lifetime; tiles change with each snapshot run
+TILE_MAX_AGE = 600
+COORDINATE_DIGITS = 5
+
+Tile = Tuple[str, EncodedResponse]
+
+
+def mercator(lats: np.ndarray, lons: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Normalized Web Mercator coordinates: x, y in [0, 1), y growing southwards"""
+    lat = np.radians(np.clip(lats, -MAX_LATITUDE, MAX_LATITUDE))
+    x = ((lons + 180.0) / 360.0) % 1.0
+    y = (1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / math.pi) / 2.0
+    return x, np.clip(y, 0.0, np.nextafter(1.0, 0.0))
+
+
+class TileLayer:
+    """Projected locations and scores of one (catalog, run) pair"""
+
+    def __init__(self, catalog: Catalog, tonight: Optional[TonightScores]):
+        self.version = f"{catalog.version}:{tonight.version if tonight else 'none'}"
+        self.locations = catalog.locations
+        self.lat = np.array([loc.latitude for loc in self.locations], dtype=np.float64)
+        self.lon = np.array([loc.longitude for loc in self.locations], dtype=np.float64)
+        self.x, self.y = mercator(self.lat, self.lon)
+
+        scores = [tonight.get(loc.key) if tonight else NO_SCORE for loc in self.locations]
+        self.hours = np.array([s[0] for s in scores], dtype=np.int16)
+        self.seeing = np.array([s[1] for s in scores], dtype=np.int8)
+        self.transparency = np.array([s[2] for s in scores], dtype=np.int8)
+
+    def _score(self, i: int) -> Tuple[int, int, int]:
+        return int(self.hours[i]), int(self.seeing[i]), int(self.transparency[i])
+
+    def _point(self, i: int) -> Dict:
+        loc = self.locations[i]
+        return {
+            "type": "Feature",
+            "geometry": {
+                "type": "Point",
+                "coordinates": [round(loc.longitude, COORDINATE_DIGITS), round(loc.latitude, COORDINATE_DIGITS)],
+            },
+            "properties": {
+                "key": loc.key,
+                "name": loc.name,
+                "category": loc.category,
+                **TonightScores.labels(self._score(i)),
+            },
+        }
+
+    def _clusters(self, members: np.ndarray, tx: np.ndarray, ty: np.ndarray) -> List[Dict]:
+        """Grid-cluster a tile's members; tx, ty are their positions within the tile"""
+        grid = settings.LOCATION_TILE_CLUSTER_GRID
+        cells = np.minimum((ty * grid).astype(np.int64), grid - 1) * grid + np.minimum((tx * grid).astype(np.int64), grid - 1)
+        # Best first (most clear dark hours, then seeing), so each cell's first member is its best
+        order = np.lexsort((-self.seeing[members], -self.hours[members], cells))
+        members, cells = members[order], cells[order]
+        starts = np.flatnonzero(np.r_[True, cells[1:] != cells[:-1]])
+        counts = np.diff(np.r_[starts, len(cells)])
+        lat_means = np.add.reduceat(self.lat[members], starts) / counts
+        lon_means = np.add.reduceat(self.lon[members], starts) / counts
+
+        features = []
+        for start, count, lat, lon in zip(starts, counts, lat_means, lon_means):
+            best = members[start]
+            if count == 1:
+                features.append(self._point(best))
+                continue
+            features.append({
+                "type": "Feature",
+                "geometry": {
+                    "type": "Point",
+                    "coordinates": [round(float(lon), COORDINATE_DIGITS), round(float(lat), COORDINATE_DIGITS)],
+                },
+                "properties": {
+                    "cluster": True,
+                    "point_count": int(count),
+                    "best_key": self.locations[best].key,
+                    **TonightScores.labels(self._score(best)),
+                },
+            })
+        return features
+
+    def tile(self, z: int, x: int, y: int) -> Dict:
+        """FeatureCollection of one tile"""
+        scale = 1 << z
+        tx = self.x * scale - x
+        ty = self.y * scale - y
+        members = np.flatnonzero((tx >= 0) & (tx < 1) & (ty >= 0) & (ty < 1))
+
+        if z <= settings.LOCATION_TILE_CLUSTER_MAX_ZOOM and len(members) > 1:
+            features = self._clusters(members, tx[members], ty[members])
+        else:
+            features = [self._point(i) for i in members]
+        return {"type": "FeatureCollection", "features": features}
+
+
+class LocationTiles:
+    """Current TileLayer, rebuilt when the catalog or the snapshot run changes"""
+
+    def __init__(self):
+        self._layer: Optional[TileLayer] = None
+
+    def layer(self) -> TileLayer:
+        catalog = location_catalog.current
+        tonight = snapshot_store.tonight() if settings.SNAPSHOT_ENABLED else None
+        version = f"{catalog.version}:{tonight.version if tonight else 'none'}"
+        layer = self._layer
+        if layer is None or layer.version != version:
+            layer = TileLayer(catalog, tonight)
+            self._layer = layer
+            logger.info(f"Built location tile layer {version}: {len(catalog)} locations")
+        return layer
+
+    def get(self, z: int, x: int, y: int) -> Tile:
+        """(etag, encoded GeoJSON) of one tile, encoded once per version"""
+        layer = self.layer()
+        cache_key = f"{layer.version}:{z}/{x}/{y}"
+        cached = location_tile_cache.get(cache_key)
+        if cached is None:
+            body = encode_json(layer.tile(z, x, y))
+            cached = (
+                make_etag("location-tile", cache_key),
+                EncodedResponse(body, media_type="application/geo+json", compress=True),
+            )
+            location_tile_cache.set(cache_key, cached)
+        return cached
+
+
+location_tiles = LocationTiles()
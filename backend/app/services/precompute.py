@@ -0,0 +1,347 @@
+"""
+Snapshot Precompute Service
+Builds every active location's forecast once per model run, and again each
+hour as the series' start hour and upstream slot move on, and writes it as
+static files (raw plus precompressed) that a web server can serve directly
+
+Layout under SNAPSHOT_DIR:
+    runs/{run}_{built}/forecast/{key}.json, .json.gz, .json.br
+    runs/{run}_{built}/manifest.json
+    runs/{run}_{built}/tonight.json   (per-location tonight scores for map tiles)
+    current -> runs/{run}_{built}
+
+A build is written to a hidden partial directory, renamed into place when
+complete, and published by atomically replacing the "current" symlink, so
+readers always see one whole run. Its file work (writing, renaming, the
+symlink swap and pruning old runs) runs on the executor pools, never on the
+event loop.
+
+The build doubles as the cache warmer at run rollover: locations are written
+hottest first (see hotset), and each one switches to the new run as soon as
+its file exists. Everything else keeps serving the previous run until
+publication. The hottest custom-coordinate cells are warmed afterwards.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import shutil
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from ..config import settings
+from .catalog import location_catalog
+from .executors import cpu_executor, io_executor
+from .forecast_builder import forecast_builder
+from .hotset import hot_set, location_key, cell_key, parse_cell_key
+from .response_cache import EncodedResponse, ENCODING_SUFFIXES
+from .run_data import RunData, run_data
+from .tonight import TonightScores, tonight_scores
+
+logger = logging.getLogger(__name__)
+
+
+def write_encoded(encoded: EncodedResponse, path: Path):
+    """Write a body and its precompressed variants side by side"""
+    path.write_bytes(encoded.body)
+    for coding, body in encoded.variants.items():
+        path.with_name(path.name + ENCODING_SUFFIXES[coding]).write_bytes(body)
+
+
+def read_encoded(path: Path, media_type: str = "application/json") -> Optional[EncodedResponse]:
+    """Inverse of write_encoded; None when the file does not exist"""
+    try:
+        encoded = EncodedResponse(path.read_bytes(), media_type=media_type)
+    except FileNotFoundError:
+        return None
+    for coding, suffix in ENCODING_SUFFIXES.items():
+        variant = path.with_name(path.name + suffix)
+        if variant.exists():
+            encoded.variants[coding] = variant.read_bytes()
+    return encoded
+
+
+class SnapshotStore:
+    """
+    Per-run static forecast files for every active location
+
+    The API only reads from here on a cache miss; a web server in front of
+    it can serve current/forecast/{key}.json without touching Python.
+    """
+
+    def __init__(self, root: str = settings.SNAPSHOT_DIR):
+        self.root = Path(root)
+        self.runs_dir = self.root / "runs"
+        self.current_link = self.root / "current"
+        self._lock = asyncio.Lock()
+        self._target: Optional[str] = None
+        self._manifest: Optional[Dict] = None
+        self._tonight_target: Optional[str] = None
+        self._tonight: Optional[TonightScores] = None
+        # Run being warmed: {"data": RunData, "dir": Path, "ready": set of keys}
+        self._rollover: Optional[Dict] = None
+
+    def current_manifest(self) -> Optional[Dict]:
+        """Manifest of the published snapshot, re-read only when it changes"""
+        try:
+            target = os.readlink(self.current_link)
+        except OSError:
+            return None
+        if target != self._target:
+            try:
+                with open(self.current_link / "manifest.json") as f:
+                    self._manifest = json.load(f)
+                self._target = target
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not read snapshot manifest: {e}")
+                return None
+        return self._manifest
+
+    def tonight(self) -> Optional[TonightScores]:
+        """Tonight scores of the published snapshot, re-read only when it changes"""
+        try:
+            target = os.readlink(self.current_link)
+        except OSError:
+            return None
+        if target != self._tonight_target:
+            self._tonight = TonightScores.read(self.current_link / "tonight.json")
+            self._tonight_target = target
+        return self._tonight
+
+    def active_run(self) -> RunData:
+        """
+        Run data served to locations not yet switched over
+
+        This is the published snapshot's run, so a newer run only takes over
+        once it has been warmed. Without snapshots, when the snapshot's data
+        is no longer held in memory, or when it has fallen more than
+        SNAPSHOT_MAX_RUN_LAG_HOURS behind, it is the current run data.
+        """
+        current = run_data.current()
+        manifest = self.current_manifest() if settings.SNAPSHOT_ENABLED else None
+        if manifest is None:
+            return current
+        data = run_data.get(manifest.get("ingest_id", ""))
+        if data is None:
+            return current
+        if current.run_datetime - data.run_datetime > timedelta(hours=settings.SNAPSHOT_MAX_RUN_LAG_HOURS):
+            return current
+        return data
+
+    def run_for(self, key: Optional[str] = None) -> RunData:
+        """
+        Run data to serve for a location: the warming run once its entry is
+        ready. Requests call this once and use the result throughout.
+        """
+        rollover = self._rollover
+        if rollover is not None and key in rollover["ready"]:
+            return rollover["data"]
+        return self.active_run()
+
+    def snapshot_version(self, key: Optional[str], data: RunData) -> Optional[Tuple[datetime, datetime, datetime]]:
+        """
+        (CMC run, Open-Meteo slot, start hour) of the snapshot file load()
+        would read for a location, as recorded by its build; None if there
+        is none for the given run data
+        """
+        rollover = self._rollover
+        if rollover is not None and key in rollover["ready"] and rollover["data"] is data:
+            return rollover["version"]
+
+        manifest = self.current_manifest()
+        if manifest is None or manifest.get("ingest_id") != data.version or "upstream_slot" not in manifest:
+            return None
+        return (
+            data.run_datetime,
+            datetime.fromisoformat(manifest["upstream_slot"]),
+            datetime.fromisoformat(manifest["start_time"]),
+        )
+
+    def load(self, key: str, data: RunData) -> Optional[EncodedResponse]:
+        """
+        Encoded forecast for a location from the current snapshot, or from
+        the build in progress once the location has been written
+
+        Callers check snapshot_version() first: a file is only current
+        during the hour and upstream slot it was built in.
+        """
+        rollover = self._rollover
+        if rollover is not None and key in rollover["ready"] and rollover["data"] is data:
+            return read_encoded(rollover["dir"] / "forecast" / f"{key}.json")
+
+        manifest = self.current_manifest()
+        if manifest is None or manifest.get("ingest_id") != data.version:
+            return None
+        if "/" in key or key.startswith("."):
+            return None
+        return read_encoded(self.current_link / "forecast" / f"{key}.json")
+
+    def load_stale(self, key: str) -> Optional[EncodedResponse]:
+        """The published snapshot's file for a location, whatever its run or age"""
+        if "/" in key or key.startswith("."):
+            return None
+        return read_encoded(self.current_link / "forecast" / f"{key}.json")
+
+    async def build(self, force: bool = False) -> Optional[Dict]:
+        """
+        Precompute the current model run for every active location
+
+        Skipped when the published snapshot already covers the same
+        downloaded data, start hour and upstream slot, or when a build is
+        already running.
+
+        Returns the new manifest, or None if nothing was built or too few
+        locations had upstream data to publish (SNAPSHOT_MIN_WRITTEN_SHARE).
+        """
+        if self._lock.locked():
+            logger.info("Snapshot build already running")
+            return None
+
+        async with self._lock:
+            data = run_data.current()
+            if not force and self.snapshot_version(None, data) == forecast_builder.data_version(data):
+                logger.info(f"Snapshot for {data.version} is current")
+                return None
+
+            try:
+                return await self._build(data)
+            finally:
+                self._rollover = None
+
+    async def _build(self, data: RunData) -> Optional[Dict]:
+        # Rendering helpers live with the router that defines the representation
+        from ..routers.forecast import ForecastLocation, db_to_summary, encode_forecast
+
+        started = time.monotonic()
+        rows = list(location_catalog.current.locations)
+        # Hottest first, then by how busy their cell is; stable, so
+        # locations never requested keep table order
+        location_scores = hot_set.scores(location_key(row.key) for row in rows)
+        cell_scores = hot_set.scores(cell_key(row.latitude, row.longitude) for row in rows)
+        order = sorted(range(len(rows)), key=lambda i: (-location_scores[i], -cell_scores[i]))
+        rows = [rows[i] for i in order]
+
+        locations = [ForecastLocation(row) for row in rows]
+        _, upstream_slot, start_time = forecast_builder.data_version(data)
+        all_columns, run_datetime = await forecast_builder.build_columns_many(locations, data)
+        if all_columns and all_columns[0] is not None:
+            start_time = all_columns[0].start_time
+
+        # Unique per build, so a rebuild never touches the published directory
+        name = f"{run_datetime:%Y%m%d%H}_{datetime.now(timezone.utc):%Y%m%d%H%M%S%f}"
+        partial = self.runs_dir / f".{name}.partial"
+        await io_executor.run(self._prepare, partial)
+        ready = set()
+        self._rollover = {
+            "data": data, "dir": partial, "ready": ready,
+            "version": (data.run_datetime, upstream_slot, start_time),
+        }
+
+        def write_chunk(chunk: List[int]) -> List[Tuple[str, Tuple[int, int, int]]]:
+            written = []
+            for i in chunk:
+                columns = all_columns[i]
+                if columns is None:
+                    continue
+                encoded = encode_forecast("json", columns, run_datetime, db_to_summary(rows[i]))
+                write_encoded(encoded, partial / "forecast" / f"{rows[i].key}.json")
+                written.append((rows[i].key, tonight_scores(columns)))
+            return written
+
+        # Encoding and compression run on the CPU workers, a chunk at a time,
+        # so the event loop keeps serving requests in between. Each chunk's
+        # locations switch to the new run as soon as it is on disk.
+        chunk_size = settings.SNAPSHOT_CHUNK_SIZE
+        scores = []
+        for start in range(0, len(rows), chunk_size):
+            chunk_scores = await cpu_executor.run(write_chunk, range(start, min(start + chunk_size, len(rows))))
+            ready.update(key for key, _ in chunk_scores)
+            scores.extend(chunk_scores)
+        written = len(ready)
+        # With Open-Meteo down every entry is None: publishing that would
+        # replace a good snapshot with an empty one and prune the good runs
+        if written == 0 or written < settings.SNAPSHOT_MIN_WRITTEN_SHARE * len(rows):
+            await io_executor.run(shutil.rmtree, partial, ignore_errors=True)
+            logger.warning(f"Snapshot {name} abandoned: only {written} of {len(rows)} locations "
+                           f"had upstream data; keeping the published snapshot")
+            return None
+
+        manifest = {
+            "ingest_id": data.version,
+            "model_run": data.model_run,
+            "run_datetime": run_datetime.isoformat(),
+            "start_time": start_time.isoformat(),
+            "upstream_slot": upstream_slot.isoformat(),
+            "generated_at": datetime.now(timezone.utc).isoformat(),
+            "locations": written,
+            "skipped": len(rows) - written,
+            "seconds": round(time.monotonic() - started, 1),
+        }
+        final = self.runs_dir / name
+        # Ready locations read from partial until the rename, and miss (then
+        # build) while it runs on the I/O workers
+        await io_executor.run(self._finish, partial, final, name, scores, manifest)
+        self._rollover["dir"] = final
+        await io_executor.run(self._publish, final)
+        await io_executor.run(self._prune, final)
+
+        logger.info(f"Published snapshot {name}: {written} locations, "
+                    f"{manifest['skipped']} skipped in {manifest['seconds']}s")
+
+        await self._warm_cells(data, rows)
+        return manifest
+
+    async def _warm_cells(self, data: RunData, rows: List):
+        """
+        Build cell columns for the hottest coordinate cells that no catalog
+        location covers, so /coords requests there are warm after rollover
+        """
+        covered = {cell_key(row.latitude, row.longitude) for row in rows}
+        points = []
+        for key, _ in hot_set.top(prefix="cell:"):
+            if key not in covered:
+                points.append(parse_cell_key(key))
+                if len(points) >= settings.HOTSET_WARM_CELLS:
+                    break
+        if points:
+            await forecast_builder.warm_cells(points, data)
+            logger.info(f"Warmed {len(points)} hot coordinate cells")
+
+    def _prepare(self, partial: Path):
+        """Start an empty partial build directory"""
+        shutil.rmtree(partial, ignore_errors=True)
+        (partial / "forecast").mkdir(parents=True)
+
+    def _finish(self, partial: Path, final: Path, name: str, scores: List, manifest: Dict):
+        """Write tonight scores and the manifest, then move the build into place"""
+        TonightScores.write(partial / "tonight.json", name, scores)
+        with open(partial / "manifest.json", "w") as f:
+            json.dump(manifest, f)
+        os.rename(partial, final)
+
+    def _publish(self, run_dir: Path):
+        """Point "current" at a finished run directory in one rename"""
+        tmp_link = self.root / ".current.tmp"
+        if tmp_link.is_symlink() or tmp_link.exists():
+            tmp_link.unlink()
+        os.symlink(run_dir.relative_to(self.root), tmp_link)
+        os.replace(tmp_link, self.current_link)
+
+    def _prune(self, current: Path):
+        """Keep the newest SNAPSHOT_KEEP_RUNS runs; drop abandoned partial builds"""
+        runs = sorted(
+            (p for p in self.runs_dir.iterdir() if p.is_dir() and not p.name.startswith(".")),
+            key=lambda p: p.name,
+            reverse=True
+        )
+        keep = {current} | set(runs[:settings.SNAPSHOT_KEEP_RUNS])
+        # Called under the build lock, so no partial directory is in use
+        for path in self.runs_dir.iterdir():
+            if path not in keep:
+                shutil.rmtree(path, ignore_errors=True)
+
+
+snapshot_store = SnapshotStore()
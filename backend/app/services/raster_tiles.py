@@ -0,0 +1,247 @@
+"""
+Raster Tile Service
+XYZ PNG map tiles of the decoded CMC fields, one set per run
+
+Tiles are rendered on first request straight from a RunData cube and
+written under MAP_TILE_DIR/{run version}/{variable}/{hour}/{z}/{x}/{y}.png,
+so later requests (or a web server in front of the API) serve them as
+static files. URLs carry the run version, so a tile never changes once
+written.
+
+Resampling is nearest-neighbour from the model grid to Web Mercator pixel
+centers. Mercator is separable, so each zoom's pixel latitudes and
+longitudes are two 1-D axes computed once; a tile's (row, col) lookup into
+the model grid is computed from them once per grid and reused for every
+variable, hour and run on that grid.
+
+The tile directory of each run is an LRU cache bounded by
+MAP_TILE_CACHE_MAX_BYTES, and directories of runs no longer held in
+memory are removed.
+"""
+
+import logging
+import math
+import os
+import shutil
+import struct
+import weakref
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+from ..config import settings
+from .cache import TTLCache
+from .classification import SCALES, convert_seeing, convert_transparency
+from .executors import cpu_executor, io_executor
+from .grid_geometry import GridGeometry
+from .run_data import RunData, run_data
+
+logger = logging.getLogger(__name__)
+
+TILE_SIZE = 256
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# Variable -> (COLOR_SCALES entry, raw values to the values that scale maps)
+RASTER_VARIABLES: Dict[str, Tuple[str, Callable[[np.ndarray], np.ndarray]]] = {
+    "cloud_cover": ("cloud_cover", lambda values: values),
+    "seeing": ("seeing", convert_seeing),
+    "transparency": ("transparency", convert_transparency),
+}
+
+
+def png_chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+def encode_png(pixels: np.ndarray, palette: np.ndarray, alpha: np.ndarray) -> bytes:
+    """
+    Indexed-color PNG of a (height, width) uint8 array of palette indices
+
+    palette is (n, 3) uint8 RGB and alpha one uint8 opacity per entry.
+    """
+    height, width = pixels.shape
+    # Each scanline starts with its filter type (0: none)
+    scanlines = np.zeros((height, width + 1), dtype=np.uint8)
+    scanlines[:, 1:] = pixels
+    header = struct.pack(">IIBBBBB", width, height, 8, 3, 0, 0, 0)
+    return b"".join((
+        PNG_SIGNATURE,
+        png_chunk(b"IHDR", header),
+        png_chunk(b"PLTE", palette.astype(np.uint8).tobytes()),
+        png_chunk(b"tRNS", alpha.astype(np.uint8).tobytes()),
+        png_chunk(b"IDAT", zlib.compress(scanlines.tobytes(), settings.MAP_TILE_PNG_LEVEL)),
+        png_chunk(b"IEND", b""),
+    ))
+
+
+def pixel_axes(z: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Latitudes of every pixel row and longitudes of every pixel column at zoom z"""
+    n = TILE_SIZE << z
+    centers = (np.arange(n) + 0.5) / n
+    lons = centers * 360.0 - 180.0
+    lats = np.degrees(np.arctan(np.sinh(math.pi * (1.0 - 2.0 * centers))))
+    return lats, lons
+
+
+class ResamplingIndex:
+    """Per-tile cell lookups into one model grid"""
+
+    def __init__(self, geometry: GridGeometry):
+        self.geometry = geometry
+        self._axes: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+        # Flat cell index per tile pixel (-1 outside the grid), 256 KB each
+        self._tiles = TTLCache(max_entries=settings.MAP_TILE_INDEX_CACHE_SIZE, ttl=365 * 24 * 3600)
+
+    def axes(self, z: int) -> Tuple[np.ndarray, np.ndarray]:
+        axes = self._axes.get(z)
+        if axes is None:
+            axes = self._axes[z] = pixel_axes(z)
+        return axes
+
+    def tile(self, z: int, x: int, y: int) -> np.ndarray:
+        key = f"{z}/{x}/{y}"
+        index = self._tiles.get(key)
+        if index is None:
+            lats, lons = self.axes(z)
+            tile_lats = np.repeat(lats[y * TILE_SIZE:(y + 1) * TILE_SIZE], TILE_SIZE)
+            tile_lons = np.tile(lons[x * TILE_SIZE:(x + 1) * TILE_SIZE], TILE_SIZE)
+            rows, cols, valid = self.geometry.locate_many(tile_lats, tile_lons)
+            index = np.where(valid, rows * self.geometry.shape[1] + cols, -1).astype(np.int32)
+            self._tiles.set(key, index)
+        return index
+
+
+# Shared by every run on the same grid; dropped with the grid
+_indexes: "weakref.WeakKeyDictionary[GridGeometry, ResamplingIndex]" = weakref.WeakKeyDictionary()
+
+
+def resampling_index(geometry: GridGeometry) -> ResamplingIndex:
+    index = _indexes.get(geometry)
+    if index is None:
+        index = _indexes[geometry] = ResamplingIndex(geometry)
+    return index
+
+
+def render_tile(data: RunData, variable: str, hour: int, z: int, x: int, y: int) -> bytes:
+    """PNG of one tile; pixels without data are transparent"""
+    scale_name, convert = RASTER_VARIABLES[variable]
+    scale = SCALES[scale_name]
+    field = data.fields[variable]
+    index = resampling_index(field.geometry).tile(z, x, y)
+
+    values = field.cube[hour - 1].reshape(-1)[np.maximum(index, 0)]
+    missing = (index < 0) | np.isnan(values)
+    colors = scale.color_index(convert(values)).astype(np.int16)
+    # The extra last palette entry is the transparent one
+    colors[missing | (colors < 0)] = len(scale.rgb)
+
+    palette = np.vstack([scale.rgb, np.zeros((1, 3), dtype=np.uint8)])
+    alpha = np.full(len(palette), 255, dtype=np.uint8)
+    alpha[-1] = 0
+    return encode_png(colors.astype(np.uint8).reshape(TILE_SIZE, TILE_SIZE), palette, alpha)
+
+
+def write_tile(path: Path, body: bytes) -> int:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(body)
+    os.replace(tmp, path)
+    return len(body)
+
+
+class RasterTileStore:
+    """On-disk tiles of the runs in memory, rendered on demand"""
+
+    def __init__(self):
+        self.root = Path(settings.MAP_TILE_DIR)
+        # Tile path -> size in bytes, least recently used first
+        self._lru: "OrderedDict[Path, int]" = OrderedDict()
+        self._bytes = 0
+        self._runs: set = set()
+        self._hours: Dict[str, Dict[str, List[int]]] = {}
+
+    def path(self, version: str, variable: str, hour: int, z: int, x: int, y: int) -> Path:
+        return self.root / version / variable / str(hour) / str(z) / str(x) / f"{y}.png"
+
+    def hours(self, data: RunData) -> Dict[str, List[int]]:
+        """Forecast hours with any data, per variable (computed once per run)"""
+        hours = self._hours.get(data.version)
+        if hours is None:
+            hours = {
+                name: (np.flatnonzero((~np.isnan(data.fields[name].cube)).any(axis=(1, 2))) + 1).tolist()
+                for name in RASTER_VARIABLES if name in data.fields
+            }
+            self._hours = {data.version: hours}
+        return hours
+
+    def _scan(self, version: str) -> Tuple[List[Tuple[Path, int]], List[str]]:
+        """
+        Tiles of a run already on disk (oldest first), after removing the
+        directories of runs no longer held in memory (blocking)
+        """
+        removed = []
+        if self.root.is_dir():
+            for run_dir in self.root.iterdir():
+                if run_dir.is_dir() and run_data.get(run_dir.name) is None:
+                    shutil.rmtree(run_dir, ignore_errors=True)
+                    removed.append(run_dir.name)
+                    logger.info(f"Removed map tiles of run {run_dir.name}")
+
+        run_dir = self.root / version
+        if not run_dir.is_dir():
+            return [], removed
+        found = [(path, path.stat()) for path in run_dir.rglob("*.png")]
+        found.sort(key=lambda item: item[1].st_mtime)
+        return [(path, stat.st_size) for path, stat in found], removed
+
+    async def _adopt(self, version: str):
+        """Start tracking a run's directory"""
+        self._runs.add(version)
+        found, removed = await io_executor.run(self._scan, version)
+        for path, size in found:
+            self._track(path, size)
+        for name in removed:
+            self._runs.discard(name)
+            run_dir = self.root / name
+            for path in [path for path in self._lru if path.is_relative_to(run_dir)]:
+                self._bytes -= self._lru.pop(path)
+
+    def _track(self, path: Path, size: int):
+        self._bytes += size - self._lru.pop(path, 0)
+        self._lru[path] = size
+
+    def _evict(self) -> List[Path]:
+        evicted = []
+        while self._bytes > settings.MAP_TILE_CACHE_MAX_BYTES and len(self._lru) > 1:
+            path, size = self._lru.popitem(last=False)
+            self._bytes -= size
+            evicted.append(path)
+        return evicted
+
+    async def get(self, data: RunData, variable: str, hour: int, z: int, x: int, y: int) -> Path:
+        """Path of a tile on disk, rendering it first if needed"""
+        path = self.path(data.version, variable, hour, z, x, y)
+        if path in self._lru:
+            self._lru.move_to_end(path)
+            return path
+
+        if data.version not in self._runs:
+            await self._adopt(data.version)
+            if path in self._lru:
+                return path
+        body = await cpu_executor.run(render_tile, data, variable, hour, z, x, y)
+        self._track(path, await io_executor.run(write_tile, path, body))
+
+        evicted = self._evict()
+        if evicted:
+            await io_executor.run(lambda: [p.unlink(missing_ok=True) for p in evicted])
+        return path
+
+    def stats(self) -> Dict:
+        return {"tiles": len(self._lru), "bytes": self._bytes, "runs": sorted(self._runs)}
+
+
+raster_tiles = RasterTileStore()
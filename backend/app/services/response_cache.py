@@ -0,0 +1,186 @@
+"""
+Response Cache Service
+Stores responses as pre-encoded (and precompressed) bytes so cache hits skip
+validation, serialization and compression entirely
+"""
+
+import gzip
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+import orjson
+from fastapi import Request, Response
+
+from ..config import settings
+from .cache import TTLCache
+from .hotset import hot_set
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# File suffixes for precompressed variants (as nginx gzip_static/brotli_static expect)
+ENCODING_SUFFIXES = {"gzip": ".gz", "br": ".br"}
+
+
+def encode_json(obj: Any) -> bytes:
+    """Encode to JSON bytes, with UTC datetimes written as ...Z like Pydantic"""
+    return orjson.dumps(obj, option=orjson.OPT_UTC_Z | orjson.OPT_SERIALIZE_NUMPY)
+
+
+def parse_accept_encoding(request: Request) -> Dict[str, float]:
+    """Accept-Encoding as {coding: q}"""
+    accepted = {}
+    for part in request.headers.get("accept-encoding", "").split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.replace(" ", "")
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name] = q
+    return accepted
+
+
+def choose_encoding(request: Request, available) -> Optional[str]:
+    """Best available coding the client accepts, or None for identity"""
+    accepted = parse_accept_encoding(request)
+    wildcard = accepted.get("*", 0.0)
+    best, best_q = None, 0.0
+    # Preference order breaks ties: br compresses better than gzip
+    for coding in ("br", "gzip"):
+        if coding not in available:
+            continue
+        q = accepted.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress_variants(body: bytes) -> Dict[str, bytes]:
+    """Precompressed copies of a body, skipped when too small to matter"""
+    if len(body) < settings.COMPRESS_MIN_BYTES:
+        return {}
+    variants = {"gzip": gzip.compress(body, compresslevel=settings.GZIP_LEVEL)}
+    if brotli is not None:
+        variants["br"] = brotli.compress(body, quality=settings.BROTLI_QUALITY)
+    return variants
+
+
+def make_etag(*parts: Any) -> str:
+    """Strong ETag from the inputs that determine a response's content"""
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode()).hexdigest()
+    return f'"{digest[:20]}"'
+
+
+def cache_headers(etag: str, last_modified: Optional[datetime] = None,
+                  max_age: Optional[int] = None) -> Dict[str, str]:
+    headers = {"ETag": etag, "Vary": "Accept, Accept-Encoding"}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified.astimezone(timezone.utc), usegmt=True)
+    if max_age is not None:
+        headers["Cache-Control"] = f"public, max-age={max(0, int(max_age))}"
+    return headers
+
+
+def is_not_modified(request: Request, etag: str,
+                    last_modified: Optional[datetime] = None) -> bool:
+    """Evaluate If-None-Match (preferred) or If-Modified-Since"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        base = etag.strip('"')
+        for tag in if_none_match.split(","):
+            # Tags from before encodings shared one ETag carry a -gzip/-br suffix
+            tag = tag.strip().removeprefix("W/").strip('"')
+            if tag == base or tag.split("-")[0] == base:
+                return True
+        return False
+    
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def not_modified_response(headers: Dict[str, str]) -> Response:
+    return Response(status_code=304, headers=headers)
+
+
+class EncodedResponse:
+    """
+    Response body encoded once, with precompressed variants alongside
+    
+    Serving a hit is a dictionary lookup by negotiated Content-Encoding;
+    nothing is serialized or compressed per request.
+    """
+
+    __slots__ = ("body", "media_type", "variants")
+
+    def __init__(self, body: bytes, media_type: str = "application/json",
+                 compress: bool = False):
+        self.body = body
+        self.media_type = media_type
+        self.variants: Dict[str, bytes] = compress_variants(body) if compress else {}
+
+    def to_response(self, request: Request,
+                    headers: Optional[Dict[str, str]] = None) -> Response:
+        headers = dict(headers or {"Vary": "Accept, Accept-Encoding"})
+        coding = choose_encoding(request, self.variants)
+        if coding is None:
+            return Response(content=self.body, media_type=self.media_type, headers=headers)
+        
+        # The ETag stays the same for every encoding (Vary: Accept-Encoding
+        # keys caches apart), so a 304, which is built without negotiating,
+        # carries the same validator as the 200 it revalidates
+        headers["Content-Encoding"] = coding
+        return Response(content=self.variants[coding], media_type=self.media_type, headers=headers)
+
+
+def encoded_json(obj: Any) -> EncodedResponse:
+    return EncodedResponse(encode_json(obj), compress=True)
+
+
+def encoded_html(html: str) -> EncodedResponse:
+    return EncodedResponse(html.encode(), media_type="text/html", compress=True)
+
+
+# Encoded forecasts keyed by variant, location and data version
+forecast_cache = TTLCache(
+    max_entries=settings.FORECAST_CACHE_SIZE,
+    ttl=settings.FORECAST_CACHE_TTL,
+    hotness=hot_set.score
+)
+
+# Last (etag, encoded) built per variant and location, served while builds are shed
+stale_forecast_cache = TTLCache(
+    max_entries=settings.STALE_FORECAST_CACHE_SIZE,
+    ttl=settings.STALE_FORECAST_CACHE_TTL,
+    hotness=hot_set.score
+)
+
+# Location list and embed responses; cleared whenever a location is written
+location_response_cache = TTLCache(
+    max_entries=settings.LOCATION_RESPONSE_CACHE_SIZE,
+    ttl=settings.LOCATION_RESPONSE_CACHE_TTL
+)
+
+# (etag, encoded) map tiles keyed by catalog version, snapshot run and z/x/y
+location_tile_cache = TTLCache(
+    max_entries=settings.LOCATION_TILE_CACHE_SIZE,
+    ttl=settings.LOCATION_TILE_CACHE_TTL
+)
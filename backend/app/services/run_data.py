@@ -0,0 +1,258 @@
+"""
+Run Data Service
+Immutable, versioned in-memory snapshots of a model run's decoded data
+
+Ingestion decodes a complete run into a new RunData off the event loop and
+publishes it with a single reference assignment (read-copy-update). Readers
+take one RunData at the start of a request and use it throughout, so they
+take no locks and never see a run that is half ingested.
+"""
+
+import logging
+from datetime import datetime, timedelta
+from types import MappingProxyType
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..config import settings
+from ..database import SessionLocal, LocationDB
+from .cmc_fetcher import cmc_fetcher
+from .executors import cpu_executor, io_executor
+from .grid_geometry import GridGeometry
+
+logger = logging.getLogger(__name__)
+
+MAX_HOURS = 168  # Series length handed to the forecast builder
+
+
+class RunField:
+    """One variable of a run: a (forecast hour, ny, nx) cube on one grid"""
+
+    __slots__ = ("geometry", "cube")
+
+    def __init__(self, geometry: GridGeometry, cube: np.ndarray):
+        cube.flags.writeable = False
+        self.geometry = geometry
+        self.cube = cube  # float32, index forecast_hour - 1, NaN where missing
+
+    def sample(self, lats: np.ndarray, lons: np.ndarray, hours: int) -> np.ndarray:
+        """(points, hours) values at many points; NaN outside the grid"""
+        rows, cols, valid = self.geometry.locate_many(lats, lons)
+        out = np.full((len(lats), hours), np.nan)
+        n = min(hours, self.cube.shape[0])
+        out[:, :n] = self.cube[:n, rows, cols].T
+        out[~valid] = np.nan
+        return out
+
+
+class RunData:
+    """
+    Decoded data for one model run, never modified once published
+
+    version identifies the exact inputs (run plus file count), so anything
+    derived from a RunData can be cached under it.
+    """
+
+    def __init__(self, model_run: str, run_datetime: datetime,
+                 fields: Dict[str, RunField], n_files: int,
+                 cell_index: Optional[Dict[str, str]] = None):
+        self.model_run = model_run
+        self.run_datetime = run_datetime
+        self.version = f"{run_datetime:%Y%m%d%H}.{n_files}"
+        self.fields = MappingProxyType(fields)
+        # Active location key -> cell_key, computed once per run
+        self.cell_index = MappingProxyType(cell_index or {})
+        self._grids = self._distinct_grids(fields)
+
+    @staticmethod
+    def _distinct_grids(fields: Dict[str, RunField]) -> Tuple[GridGeometry, ...]:
+        grids = []
+        for field in fields.values():
+            if all(field.geometry is not grid for grid in grids):
+                grids.append(field.geometry)
+        return tuple(grids)
+
+    @property
+    def run(self) -> Tuple[str, datetime]:
+        return self.model_run, self.run_datetime
+
+    @property
+    def has_data(self) -> bool:
+        return bool(self.fields)
+
+    def cell_key(self, lat: float, lon: float, key: Optional[str] = None) -> str:
+        """
+        Canonical key for the grid cells containing a point, across every
+        grid in the run. Points sharing it get identical CMC values.
+        """
+        if key is not None:
+            cached = self.cell_index.get(key)
+            if cached is not None:
+                return cached
+        return self.cell_keys(np.array([lat]), np.array([lon]))[0]
+
+    def cell_keys(self, lats: np.ndarray, lons: np.ndarray) -> List[str]:
+        if not self._grids:
+            return ["none"] * len(lats)  # No CMC data contributes to the forecast
+        parts = []
+        for grid in self._grids:
+            rows, cols, valid = grid.locate_many(lats, lons)
+            parts.append([
+                f"c{r}_{c}" if ok else "out"
+                for r, c, ok in zip(rows.tolist(), cols.tolist(), valid.tolist())
+            ])
+        return [".".join(cells) for cells in zip(*parts)]
+
+    def series_many(self, lats, lons, hours: int = MAX_HOURS) -> Dict[str, np.ndarray]:
+        """
+        CMC series for many points as (points, hours) arrays indexed by
+        forecast_hour - 1, NaN where missing
+        """
+        lats = np.asarray(lats, dtype=float)
+        lons = np.asarray(lons, dtype=float)
+        result = {}
+        for name, _, _ in cmc_fetcher.RUN_SOURCES:
+            field = self.fields.get(name)
+            result[name] = (field.sample(lats, lons, hours) if field is not None
+                            else np.full((len(lats), hours), np.nan))
+        return result
+
+    def series(self, lat: float, lon: float, hours: int = MAX_HOURS) -> Dict[str, np.ndarray]:
+        return {name: values[0] for name, values in self.series_many([lat], [lon], hours).items()}
+
+
+class RunDataStore:
+    """
+    Holds the published RunData versions
+
+    Publishing replaces whole objects and dictionaries rather than mutating
+    them, so a plain attribute read is all a reader ever does.
+    """
+
+    def __init__(self):
+        self._current: Optional[RunData] = None
+        self._versions: Dict[str, RunData] = {}
+        self._placeholders: Dict[str, RunData] = {}
+
+    def current(self) -> RunData:
+        """Newest published run, or an empty one for the clock's run"""
+        current = self._current
+        if current is not None:
+            return current
+        model_run, run_datetime = cmc_fetcher.get_latest_model_run()
+        placeholder = self._placeholders.get(model_run + run_datetime.isoformat())
+        if placeholder is None:
+            placeholder = RunData(model_run, run_datetime, {}, 0)
+            self._placeholders = {model_run + run_datetime.isoformat(): placeholder}
+        return placeholder
+
+    def get(self, version: str) -> Optional[RunData]:
+        return self._versions.get(version)
+
+    def publish(self, data: RunData):
+        versions = dict(self._versions)
+        versions[data.version] = data
+        newest = sorted(versions.values(), key=lambda d: (d.run_datetime, d.version), reverse=True)
+        self._versions = {d.version: d for d in newest[:settings.RUN_DATA_KEEP]}
+        self._current = data
+        logger.info(f"Published run data {data.version} ({len(data.fields)} fields, "
+                    f"{len(data.cell_index)} locations indexed)")
+
+    async def refresh(self) -> Optional[RunData]:
+        """
+        Decode and publish the newest complete run on disk if it changed
+
+        Prefers the clock's latest run; until all of its files arrive, the
+        newest complete run from the last RUN_DATA_MAX_AGE_HOURS is used. A
+        partial run is only published when there is nothing else to serve,
+        and is not republished as more of its files arrive: every new file
+        would change its version and invalidate everything derived from it.
+
+        Returns the new RunData, or None if nothing changed.
+        """
+        found = await io_executor.run(self.find_run)
+        if found is None:
+            return None
+        run_datetime, files, complete = found
+        n_files = sum(len(paths) for paths in files.values())
+
+        current = self._current
+        version = f"{run_datetime:%Y%m%d%H}.{n_files}"
+        if current is not None and (
+            not complete or current.version == version or current.run_datetime > run_datetime
+        ):
+            return None
+
+        if not complete:
+            logger.warning(f"Publishing partial run {run_datetime:%Y%m%d%H} ({n_files} files): no complete run on disk")
+        data = await cpu_executor.run(self.load, run_datetime, files)
+        self.publish(data)
+        return data
+
+    def find_run(self) -> Optional[Tuple[datetime, Dict[str, List], bool]]:
+        """
+        Newest complete run on disk, or the newest partial one if no run is
+        complete (blocking)
+
+        Returns (run datetime, files by variable, complete), or None when
+        there are no files at all.
+        """
+        _, latest = cmc_fetcher.get_latest_model_run()
+        candidates = [latest] + [
+            run for run in cmc_fetcher.available_runs()
+            if run < latest and latest - run <= timedelta(hours=settings.RUN_DATA_MAX_AGE_HOURS)
+        ]
+        partial = None
+        for run_datetime in candidates:
+            files = cmc_fetcher.run_files(run_datetime)
+            if not any(files.values()):
+                continue
+            if cmc_fetcher.run_complete(run_datetime, files):
+                return run_datetime, files, True
+            partial = partial or (run_datetime, files, False)
+        return partial
+
+    def load(self, run_datetime: datetime, files: Dict[str, List]) -> RunData:
+        """Decode every file of a run and index active locations (blocking)"""
+        fields = {}
+        n_files = 0
+        for name, paths in files.items():
+            planes = {}
+            geometry = None
+            for path in paths:
+                values, forecast_hour, grid = cmc_fetcher.read_field(path)
+                n_files += 1
+                if values is None or not forecast_hour or forecast_hour > MAX_HOURS:
+                    continue
+                if geometry is None:
+                    geometry = grid
+                elif grid.shape != geometry.shape:
+                    logger.warning(f"Skipping {path.name}: grid differs from the rest of the run")
+                    continue
+                planes[forecast_hour] = values
+            if planes:
+                cube = np.full((max(planes),) + geometry.shape, np.nan, dtype=np.float32)
+                for forecast_hour, values in planes.items():
+                    cube[forecast_hour - 1] = values
+                fields[name] = RunField(geometry, cube)
+
+        data = RunData(f"{run_datetime:%H}", run_datetime, fields, n_files)
+        if not data.has_data:
+            return data
+
+        db = SessionLocal()
+        try:
+            rows = db.query(LocationDB.key, LocationDB.latitude, LocationDB.longitude).filter(
+                LocationDB.is_active == 1
+            ).all()
+        finally:
+            db.close()
+        if rows:
+            keys, lats, lons = zip(*rows)
+            cell_index = dict(zip(keys, data.cell_keys(np.array(lats), np.array(lons))))
+            data = RunData(data.model_run, run_datetime, fields, n_files, cell_index)
+        return data
+
+
+run_data = RunDataStore()
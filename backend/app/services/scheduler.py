@@ -5,13 +5,24 @@ Handles periodic data updates from CMC
 
 import asyncio
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 
 from ..config import settings
-from .cmc_fetcher import cmc_fetcher
+from .catalog import location_catalog
+from .cmc_fetcher import cmc_fetcher, openmeteo_fetcher
+from .executors import io_executor
+from .hotset import AccessLogTail, hot_set, record_request
+from .precompute import snapshot_store
+from .run_data import run_data
 
 logger = logging.getLogger(__name__)
 
+# Persisted in-memory state, flushed from a worker thread when due
+PERSISTED = (openmeteo_fetcher.cache, hot_set)
+PERSIST_CHECK_SECONDS = 30
+# Past the hour before refreshing snapshots, so the start hour has rolled
+SNAPSHOT_REFRESH_DELAY_SECONDS = 5
+
 
 async def update_cmc_data():
     """Fetch latest CMC data"""
@@ -28,10 +39,76 @@ async def update_cmc_data():
         
         logger.info("CMC data update complete")
         
+        # Decode the run once and publish it to readers
+        await run_data.refresh()
+        
+        # Precompute every location once the run's data is in place
+        if settings.SNAPSHOT_ENABLED:
+            await snapshot_store.build()
+        
     except Exception as e:
         logger.error(f"Error updating CMC data: {e}")
 
 
+async def refresh_snapshots():
+    """
+    Rebuild the snapshot just after each hour, when forecasts start an hour
+    later and the upstream slot may have moved on (build() skips it otherwise)
+    """
+    while True:
+        now = datetime.now(timezone.utc)
+        next_hour = now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+        await asyncio.sleep((next_hour - now).total_seconds() + SNAPSHOT_REFRESH_DELAY_SECONDS)
+        try:
+            await snapshot_store.build()
+        except Exception as e:
+            logger.error(f"Error refreshing snapshot: {e}")
+
+
+async def persist_state():
+    """Periodically write persisted caches to disk off the event loop"""
+    while True:
+        await asyncio.sleep(PERSIST_CHECK_SECONDS)
+        for store in PERSISTED:
+            if store.save_due():
+                try:
+                    await io_executor.run(store.save)
+                except Exception as e:
+                    logger.error(f"Error persisting state: {e}")
+
+
+async def count_snapshot_hits(tail: AccessLogTail):
+    """Record snapshot requests the web server answered since the last read"""
+    counts = await io_executor.run(tail.read)
+    catalog = location_catalog.current
+    for key, n in counts.items():
+        location = catalog.get(key)
+        if location is not None:
+            record_request(key, location.latitude, location.longitude, n)
+
+
+async def ingest_access_log():
+    """Follow HOTSET_ACCESS_LOG, so snapshot traffic counts toward the hot set"""
+    tail = AccessLogTail(settings.HOTSET_ACCESS_LOG)
+    while True:
+        try:
+            await count_snapshot_hits(tail)
+        except Exception as e:
+            logger.error(f"Error reading access log: {e}")
+        await asyncio.sleep(settings.HOTSET_ACCESS_LOG_SECONDS)
+
+
+async def watch_catalog():
+    """Reload the location catalog after writes from outside the API (e.g. seeding)"""
+    while True:
+        await asyncio.sleep(settings.CATALOG_CHECK_SECONDS)
+        try:
+            await location_catalog.check()
+            await location_catalog.refresh_popularity()
+        except Exception as e:
+            logger.error(f"Error checking location catalog: {e}")
+
+
 async def start_scheduler():
     """Start the background data update scheduler"""
     logger.info("Starting background scheduler...")
@@ -0,0 +1,179 @@
+"""
+Location Search Service
+Ranked, typo-tolerant autocomplete over the location catalog
+
+Indexed words come from name, key, region and description. Results are
+ranked in tiers:
+  0. the name starts with the query ("lake lou" -> "Lake Louise")
+  1. every query word starts some indexed word, better fields first
+     (name, then key, region, description)
+  2. fuzzy: words that miss are close by trigram similarity ("louse")
+Within a tier, popular locations (hot-set request counts) come first,
+then names alphabetically.
+
+Prefix lookups use the sorted term list as a flattened trie: the terms
+starting with a prefix are one contiguous range of term ids, found by
+bisection, and (word, location) pairs are stored in term order, so their
+locations are one contiguous slice. A keystroke touches only the pairs
+that match, plus a few NumPy passes over one value per location.
+"""
+
+import re
+import unicodedata
+from bisect import bisect_left
+from typing import Dict, List, Sequence, Set
+
+import numpy as np
+
+from ..config import settings
+from .hotset import hot_set, location_key
+
+# Word-prefix matches by field, best first
+FIELDS = ("name", "key", "region", "description")
+NO_MATCH = len(FIELDS)
+NOT_FOUND = 3  # tier of locations that don't match
+
+WORD_SEPARATORS = re.compile(r"[\W_]+")
+
+
+def normalize(text) -> str:
+    """Lowercase, strip accents and collapse punctuation to single spaces"""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+    return WORD_SEPARATORS.sub(" ", text).strip()
+
+
+def trigrams(word: str) -> Set[str]:
+    """Trigrams of a padded word, as pg_trgm pads them"""
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    """Search structures of one catalog build (immutable apart from popularity)"""
+
+    def __init__(self, locations: Sequence, fuzzy_threshold: float):
+        self.locations = locations
+        self.fuzzy_threshold = fuzzy_threshold
+        n = len(locations)
+
+        # Tier 0: locations ordered by normalized name, for prefix ranges
+        names = [normalize(loc.name) for loc in locations]
+        name_order = sorted(range(n), key=names.__getitem__)
+        self._sorted_names = [names[i] for i in name_order]
+        self._name_order = np.array(name_order, dtype=np.int64)
+        self._name_rank = np.empty(n, dtype=np.int64)
+        self._name_rank[self._name_order] = np.arange(n)
+
+        # Each location's distinct words, with the best field they occur in
+        location_words: List[Dict[str, int]] = []
+        for loc in locations:
+            words: Dict[str, int] = {}
+            for rank, field in enumerate(FIELDS):
+                value = getattr(loc, field)
+                for word in ([value.lower()] if field == "key" else normalize(value).split()):
+                    words.setdefault(word, rank)
+            location_words.append(words)
+
+        self._terms = sorted({word for words in location_words for word in words})
+        term_ids = {term: i for i, term in enumerate(self._terms)}
+
+        # (word, location) pairs in term order; term t's are [term_start[t], term_start[t + 1])
+        pair_term = np.array([term_ids[word] for words in location_words for word in words], dtype=np.int64)
+        pair_location = np.repeat(np.arange(n), [len(words) for words in location_words])
+        pair_field = np.array([rank for words in location_words for rank in words.values()], dtype=np.int8)
+        order = np.argsort(pair_term, kind="stable")
+        self._pair_location = pair_location[order]
+        self._pair_field = pair_field[order]
+        self._term_start = np.searchsorted(pair_term[order], np.arange(len(self._terms) + 1))
+
+        # Trigram -> ids of the terms containing it
+        postings: Dict[str, List[int]] = {}
+        term_grams = np.empty(len(self._terms), dtype=np.int64)
+        for i, term in enumerate(self._terms):
+            grams = trigrams(term)
+            term_grams[i] = len(grams)
+            for gram in grams:
+                postings.setdefault(gram, []).append(i)
+        self._trigram_terms = {gram: np.array(ids, dtype=np.int64) for gram, ids in postings.items()}
+        self._term_grams = term_grams
+
+        self.popularity = np.zeros(n)
+        self.refresh_popularity()
+
+    def __len__(self) -> int:
+        return len(self.locations)
+
+    def refresh_popularity(self):
+        """Re-read request counts from the hot set (swapped in whole)"""
+        self.popularity = hot_set.scores(location_key(loc.key) for loc in self.locations)
+
+    def _prefix_fields(self, token: str) -> np.ndarray:
+        """Per location, the best field with a word starting with token (NO_MATCH if none)"""
+        lo = bisect_left(self._terms, token)
+        hi = bisect_left(self._terms, token + "\uffff")
+        first, last = self._term_start[lo], self._term_start[hi]
+        best = np.full(len(self.locations), NO_MATCH, dtype=np.int8)
+        np.minimum.at(best, self._pair_location[first:last], self._pair_field[first:last])
+        return best
+
+    def _fuzzy_scores(self, token: str) -> np.ndarray:
+        """Per location, the best trigram similarity (Jaccard) of a word to token"""
+        grams = trigrams(token)
+        hits = [self._trigram_terms[gram] for gram in grams if gram in self._trigram_terms]
+        if not hits:
+            return np.zeros(len(self.locations))
+        shared = np.bincount(np.concatenate(hits), minlength=len(self._terms))
+        similarity = shared / (len(grams) + self._term_grams - shared)
+        close = np.flatnonzero(similarity >= self.fuzzy_threshold)
+
+        # Pairs of the close terms: concatenated [term_start[t], term_start[t + 1]) ranges
+        starts = self._term_start[close]
+        lengths = self._term_start[close + 1] - starts
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        pairs = np.repeat(starts, lengths) + offsets
+
+        best = np.zeros(len(self.locations))
+        np.maximum.at(best, self._pair_location[pairs], np.repeat(similarity[close], lengths))
+        return best
+
+    def search(self, q: str, limit: int) -> List:
+        """Best matches for a (possibly partial) query, best first"""
+        query = normalize(q)
+        tokens = query.split()
+        if not tokens or not len(self.locations):
+            return []
+
+        fields = [self._prefix_fields(token) for token in tokens]
+        worst_field = np.maximum.reduce(fields)
+        tier = np.where(worst_field < NO_MATCH, 1, NOT_FOUND).astype(np.int8)
+        secondary = worst_field.astype(np.float64)
+
+        lo = bisect_left(self._sorted_names, query)
+        hi = bisect_left(self._sorted_names, query + "\uffff")
+        exact = self._name_order[lo:hi]
+        tier[exact] = 0
+        secondary[exact] = 0
+
+        # Typo tolerance only when the prefix tiers can't fill the page
+        if np.count_nonzero(tier < NOT_FOUND) < limit:
+            scores = [
+                np.where(field < NO_MATCH, 1.0, self._fuzzy_scores(token))
+                for token, field in zip(tokens, fields)
+            ]
+            fuzzy = (tier == NOT_FOUND) & (np.minimum.reduce(scores) >= self.fuzzy_threshold)
+            tier[fuzzy] = 2
+            secondary[fuzzy] = -np.mean(scores, axis=0)[fuzzy]
+
+        candidates = np.flatnonzero(tier < NOT_FOUND)
+        order = np.lexsort((
+            self._name_rank[candidates],
+            -self.popularity[candidates],
+            secondary[candidates],
+            tier[candidates],
+        ))[:limit]
+        return [self.locations[i] for i in candidates[order]]
+
+
+def build_search_index(locations: Sequence) -> SearchIndex:
+    return SearchIndex(locations, settings.SEARCH_FUZZY_THRESHOLD)
@@ -0,0 +1,124 @@
+"""
+Spatial Index Service
+In-memory grid over active locations for radius and nearest queries
+
+Points are bucketed into LOCATION_INDEX_CELL_DEG latitude/longitude cells
+and stored cell by cell (CSR layout), so the cells overlapping a query's
+bounding box are a few contiguous slices per grid row. Only those
+candidates get an exact haversine distance, vectorized with NumPy.
+
+Each grid is immutable and belongs to one Catalog build, so it always
+holds exactly the locations of the catalog it is read from.
+"""
+
+import math
+from typing import Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088  # Mean radius
+HALF_CIRCUMFERENCE_KM = math.pi * EARTH_RADIUS_KM
+
+
+def haversine_km(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray,
+                 cos_lats: Optional[np.ndarray] = None) -> np.ndarray:
+    """Great-circle distances from one point to many (all in radians)"""
+    if cos_lats is None:
+        cos_lats = np.cos(lats)
+    a = np.sin((lats - lat) / 2) ** 2 + math.cos(lat) * cos_lats * np.sin((lons - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class SpatialGrid:
+    """One immutable build of the index"""
+
+    def __init__(self, points: Sequence[Tuple[float, float, Any]], cell_deg: float):
+        self.cell_deg = cell_deg
+        self.n_rows = math.ceil(180 / cell_deg)
+        self.n_cols = math.ceil(360 / cell_deg)
+
+        lats = np.array([p[0] for p in points], dtype=np.float64)
+        lons = np.array([p[1] for p in points], dtype=np.float64)
+        rows = np.clip(np.floor((lats + 90) / cell_deg), 0, self.n_rows - 1).astype(np.int64)
+        cols = np.floor(((lons + 180) % 360) / cell_deg).astype(np.int64) % self.n_cols
+        cells = rows * self.n_cols + cols
+
+        order = np.argsort(cells, kind="stable")
+        self.items = [points[i][2] for i in order]
+        self.lat = np.radians(lats[order])
+        self.lon = np.radians(lons[order])
+        self.cos_lat = np.cos(self.lat)
+        # Points of cell c are [start[c], start[c + 1])
+        self.start = np.searchsorted(cells[order], np.arange(self.n_rows * self.n_cols + 1))
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def _row(self, lat: float) -> int:
+        return min(max(math.floor((lat + 90) / self.cell_deg), 0), self.n_rows - 1)
+
+    def _col(self, lon: float) -> int:
+        return math.floor(((lon + 180) % 360) / self.cell_deg) % self.n_cols
+
+    def _candidates(self, lat: float, lon: float, radius_km: float) -> np.ndarray:
+        """Positions of the points in cells overlapping the query's bounding box"""
+        radius_deg = math.degrees(radius_km / EARTH_RADIUS_KM)
+        lat_lo, lat_hi = lat - radius_deg, lat + radius_deg
+        row_lo, row_hi = self._row(lat_lo), self._row(lat_hi)
+
+        # Widest longitude offset on a spherical cap; all columns if it holds a pole
+        if lat_lo <= -90 or lat_hi >= 90:
+            spans = [(0, self.n_cols - 1)]
+        else:
+            sin_ratio = math.sin(math.radians(radius_deg)) / math.cos(math.radians(lat))
+            dlon = math.degrees(math.asin(sin_ratio)) if sin_ratio < 1 else 180.0
+            if dlon >= 180:
+                spans = [(0, self.n_cols - 1)]
+            else:
+                col_lo, col_hi = self._col(lon - dlon), self._col(lon + dlon)
+                if col_lo <= col_hi:
+                    spans = [(col_lo, col_hi)]
+                else:  # Crosses the antimeridian
+                    spans = [(col_lo, self.n_cols - 1), (0, col_hi)]
+
+        start = self.start
+        slices = []
+        for row in range(row_lo, row_hi + 1):
+            base = row * self.n_cols
+            for col_lo, col_hi in spans:
+                first, last = start[base + col_lo], start[base + col_hi + 1]
+                if last > first:
+                    slices.append(np.arange(first, last))
+        if len(slices) == 1:
+            return slices[0]
+        return np.concatenate(slices) if slices else np.zeros(0, dtype=np.int64)
+
+    def within(self, lat: float, lon: float, radius_km: float,
+               limit: Optional[int] = None) -> List[Tuple[Any, float]]:
+        """(item, distance km) within radius_km, nearest first"""
+        candidates = self._candidates(lat, lon, radius_km)
+        if not len(candidates):
+            return []
+        distances = haversine_km(math.radians(lat), math.radians(lon), self.lat[candidates],
+                                 self.lon[candidates], self.cos_lat[candidates])
+        inside = distances <= radius_km
+        candidates, distances = candidates[inside], distances[inside]
+
+        if limit is not None and limit < len(distances):
+            nearest = np.argpartition(distances, limit - 1)[:limit]
+            candidates, distances = candidates[nearest], distances[nearest]
+        order = np.argsort(distances, kind="stable")
+        return [(self.items[candidates[i]], float(distances[i])) for i in order]
+
+    def nearest(self, lat: float, lon: float, k: int,
+                max_radius_km: Optional[float] = None) -> List[Tuple[Any, float]]:
+        """k nearest items (within max_radius_km, if given), nearest first"""
+        limit = HALF_CIRCUMFERENCE_KM if max_radius_km is None else min(max_radius_km, HALF_CIRCUMFERENCE_KM)
+        # Grow the search radius until it holds k points; anything found inside
+        # the radius is closer than anything outside it, so the result is exact
+        radius = min(limit, EARTH_RADIUS_KM * math.radians(self.cell_deg))
+        while True:
+            found = self.within(lat, lon, radius, k)
+            if len(found) >= k or radius >= limit:
+                return found
+            radius = min(limit, radius * 2)
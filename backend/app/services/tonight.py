@@ -0,0 +1,98 @@
+"""
+Tonight Scores
+One-line summary of each location's coming night, for maps
+
+Computed from each location's forecast columns during the snapshot build
+and written beside the manifest as tonight.json, so map tiles can color
+every site without building any forecasts.
+"""
+
+import json
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+from .classification import SEEING_CATEGORIES, TRANSPARENCY_CATEGORIES, MISSING, darkness_category
+
+logger = logging.getLogger(__name__)
+
+# Tonight is the first night that begins within this many forecast hours
+TONIGHT_SEARCH_HOURS = 24
+# Cloud categories counted as clear (clear, mostly_clear)
+CLEAR_MAX_CATEGORY = 1
+# Darkness categories counted as dark (dim_moon, dark)
+DARK_MIN_CATEGORY = 5
+
+# (clear dark hours, best seeing code, best transparency code)
+Score = Tuple[int, int, int]
+NO_SCORE: Score = (0, MISSING, MISSING)
+
+
+def tonight_scores(columns) -> Score:
+    """Clear dark hours and best seeing/transparency over tonight's window"""
+    night = np.flatnonzero(~columns.is_daylight & (columns.hours < TONIGHT_SEARCH_HOURS))
+    if not len(night):
+        return NO_SCORE
+    first = night[0]
+    daylight = np.flatnonzero(columns.is_daylight[first:])
+    window = slice(first, first + daylight[0] if len(daylight) else len(columns))
+
+    clear = (columns.cloud_cover_category[window] >= 0) & (columns.cloud_cover_category[window] <= CLEAR_MAX_CATEGORY)
+    dark = darkness_category(columns.darkness[window]) >= DARK_MIN_CATEGORY
+    return (
+        int(np.count_nonzero(clear & dark)),
+        int(columns.seeing[window].max()),
+        int(columns.transparency[window].max()),
+    )
+
+
+class TonightScores:
+    """Scores of one snapshot build, by location key"""
+
+    def __init__(self, version: str, scores: Dict[str, Score]):
+        self.version = version
+        self.scores = scores
+
+    def get(self, key: str) -> Score:
+        return self.scores.get(key, NO_SCORE)
+
+    @staticmethod
+    def labels(score: Score) -> Dict[str, Optional[object]]:
+        hours, seeing, transparency = score
+        return {
+            "clear_dark_hours": hours,
+            "best_seeing": SEEING_CATEGORIES[seeing] if seeing != MISSING else None,
+            "best_transparency": TRANSPARENCY_CATEGORIES[transparency] if transparency != MISSING else None,
+        }
+
+    @staticmethod
+    def write(path: Path, version: str, scores: Iterable[Tuple[str, Score]]):
+        """Columnar JSON: keys plus one array per score"""
+        keys, values = [], []
+        for key, score in scores:
+            keys.append(key)
+            values.append(score)
+        columns = list(zip(*values)) if values else [(), (), ()]
+        with open(path, "w") as f:
+            json.dump({
+                "version": version,
+                "keys": keys,
+                "clear_dark_hours": list(columns[0]),
+                "best_seeing": list(columns[1]),
+                "best_transparency": list(columns[2]),
+            }, f, separators=(",", ":"))
+
+    @classmethod
+    def read(cls, path: Path) -> Optional["TonightScores"]:
+        try:
+            with open(path) as f:
+                raw = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read tonight scores {path}: {e}")
+            return None
+        scores = zip(raw["clear_dark_hours"], raw["best_seeing"], raw["best_transparency"])
+        return cls(raw["version"], dict(zip(raw["keys"], scores)))
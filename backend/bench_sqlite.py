@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+SQLite Engine Profile Benchmark
+
+Measures concurrent read throughput of the API's async engines with and
+without the tuned SQLite profile, optionally while a writer commits
+continuously (as seeding does). Each profile runs on its own copy of the
+database, so the source file is never modified.
+
+Usage:
+    python bench_sqlite.py [--db cleardarksky.db] [--concurrency 32] [--seconds 5] [--no-writer]
+"""
+
+import argparse
+import asyncio
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add parent to path for imports
+sys.path.insert(0, '.')
+
+from sqlalchemy import func, select, update
+
+from app.database import LocationDB, create_async_engines
+
+
+def prepare_copy(source: Path, dest: Path, wal: bool):
+    """Copy the database and set its journal mode for the profile"""
+    shutil.copy(source, dest)
+    conn = sqlite3.connect(dest)
+    conn.execute(f"PRAGMA journal_mode = {'WAL' if wal else 'DELETE'}")
+    conn.close()
+
+
+def percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+async def run_profile(path: Path, tuned: bool, concurrency: int, seconds: float, writer: bool):
+    read_engine, write_engine = create_async_engines(f"sqlite:///{path}", tuned=tuned)
+
+    async with read_engine.connect() as conn:
+        keys = (await conn.execute(select(LocationDB.key).where(LocationDB.is_active == 1))).scalars().all()
+        countries = (await conn.execute(select(LocationDB.country).distinct())).scalars().all()
+
+    # The shapes of the locations endpoints: by key, filtered page, search, count
+    queries = [
+        lambda: select(LocationDB).where(LocationDB.key == random.choice(keys), LocationDB.is_active == 1),
+        lambda: select(LocationDB).where(LocationDB.is_active == 1,
+                                         LocationDB.country == random.choice(countries)).limit(100),
+        lambda: select(LocationDB).where(LocationDB.is_active == 1,
+                                         LocationDB.name.ilike(f"%{random.choice(keys)[:3]}%")).limit(20),
+        lambda: select(func.count()).select_from(LocationDB).where(
+            LocationDB.is_active == 1, LocationDB.country == random.choice(countries)),
+    ]
+
+    latencies = []
+    errors = 0
+    commits = 0
+    deadline = time.monotonic() + seconds
+
+    async def reader():
+        nonlocal errors
+        while time.monotonic() < deadline:
+            started = time.monotonic()
+            try:
+                async with read_engine.connect() as conn:
+                    (await conn.execute(random.choice(queries)())).all()
+                latencies.append(time.monotonic() - started)
+            except Exception:
+                errors += 1
+
+    async def write_loop():
+        nonlocal commits, errors
+        while time.monotonic() < deadline:
+            try:
+                async with write_engine.begin() as conn:
+                    await conn.execute(
+                        update(LocationDB).where(LocationDB.key == random.choice(keys))
+                        .values(description=f"bench {time.time()}")
+                    )
+                commits += 1
+            except Exception:
+                errors += 1
+            await asyncio.sleep(0.005)
+
+    tasks = [reader() for _ in range(concurrency)]
+    if writer:
+        tasks.append(write_loop())
+    await asyncio.gather(*tasks)
+
+    await read_engine.dispose()
+    if write_engine is not read_engine:
+        await write_engine.dispose()
+
+    return {
+        "qps": len(latencies) / seconds,
+        "p50": percentile(latencies, 50) * 1000,
+        "p95": percentile(latencies, 95) * 1000,
+        "p99": percentile(latencies, 99) * 1000,
+        "commits": commits,
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the SQLite engine profile")
+    parser.add_argument("--db", default="cleardarksky.db", help="Database file to copy")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent readers")
+    parser.add_argument("--seconds", type=float, default=5, help="Duration per profile")
+    parser.add_argument("--no-writer", action="store_true", help="Skip the concurrent writer")
+    args = parser.parse_args()
+
+    source = Path(args.db)
+    if not source.exists():
+        print(f"Database not found: {source}")
+        sys.exit(1)
+
+    print(f"{args.concurrency} readers, {args.seconds:g}s per profile, "
+          f"writer {'off' if args.no_writer else 'on'}\n")
+    print(f"{'profile':<10} {'reads/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'commits':>8} {'errors':>7}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, tuned in (("baseline", False), ("tuned", True)):
+            path = Path(tmp) / f"{name}.db"
+            prepare_copy(source, path, wal=tuned)
+            result = asyncio.run(run_profile(path, tuned, args.concurrency, args.seconds, not args.no_writer))
+            print(f"{name:<10} {result['qps']:>9.0f} {result['p50']:>8.1f} {result['p95']:>8.1f} "
+                  f"{result['p99']:>8.1f} {result['commits']:>8} {result['errors']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Shared test setup
+
+Settings are read from the environment when app.config is first imported
+(and importing app.database creates and migrates the database), so the
+database, caches and snapshots are pointed at a temporary directory before
+anything from app is imported. Open-Meteo is replaced by deterministic
+hourly data; the CMC scheduler is never started, so there is no run data
+unless a test publishes one.
+"""
+
+import os
+import random
+import shutil
+import tempfile
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import numpy as np
+
+TEST_DIR = tempfile.mkdtemp(prefix="cleardarksky-tests-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{TEST_DIR}/test.db",
+    "DATA_DIR": os.path.join(TEST_DIR, "data"),
+    "CACHE_DIR": os.path.join(TEST_DIR, "cache"),
+    "SNAPSHOT_DIR": os.path.join(TEST_DIR, "snapshots"),
+    "MAP_TILE_DIR": os.path.join(TEST_DIR, "tiles"),
+    "SNAPSHOT_ENABLED": "false",
+    "ASTRO_EXECUTOR": "thread",
+})
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.database import LocationDB, SessionLocal
+from app.services.cmc_fetcher import openmeteo_fetcher
+from app.services.forecast_builder import forecast_builder
+from app.services.grid_geometry import GridGeometry, PolarStereographic
+from app.services.response_cache import forecast_cache
+from app.services.run_data import RunData, RunField
+
+# (key, name, latitude, longitude, country, region, category)
+LOCATIONS = [
+    ("AlgonquinON", "Algonquin Park", 45.58, -78.36, "Canada", "Ontario", "park"),
+    ("BancroftON", "Bancroft Observatory", 45.06, -77.86, "Canada", "Ontario", "observatory"),
+    ("TorontoON", "Toronto", 43.65, -79.38, "Canada", "Ontario", None),
+    ("MontMegQC", "Mont Megantic Observatory", 45.46, -71.15, "Canada", "Quebec", "observatory"),
+    ("KittPeakAZ", "Kitt Peak", 31.96, -111.60, "USA", "Arizona", "observatory"),
+    ("FlagstaffAZ", "Flagstaff Dark Sky", 35.20, -111.65, "USA", "Arizona", "dark-sky"),
+    ("McDonaldTX", "McDonald Observatory", 30.67, -104.02, "USA", "Texas", "observatory"),
+    ("BigBendTX", "Big Bend", 29.25, -103.25, "USA", "Texas", "park"),
+    ("NassauBS", "Nassau", 25.05, -77.35, "Bahamas", None, None),
+]
+INACTIVE_KEY = "ClosedON"
+
+
+def seed_locations():
+    with SessionLocal() as db:
+        for key, name, lat, lon, country, region, category in LOCATIONS:
+            db.add(LocationDB(key=key, name=name, latitude=lat, longitude=lon,
+                              country=country, region=region, category=category,
+                              timezone="America/Toronto"))
+        db.add(LocationDB(key=INACTIVE_KEY, name="Closed Site", latitude=44.0, longitude=-79.0,
+                          country="Canada", region="Ontario", is_active=0))
+        db.commit()
+
+
+def location_rows() -> list:
+    """LOCATIONS as rows with every LocationDB attribute the catalog reads"""
+    return [
+        SimpleNamespace(id=i, key=key, name=name, latitude=lat, longitude=lon, country=country,
+                        region=region, category=category, description=None, timezone="America/Toronto",
+                        elevation=None, is_active=1, created_at=datetime(2026, 1, 1))
+        for i, (key, name, lat, lon, country, region, category) in enumerate(LOCATIONS, start=1)
+    ]
+
+
+def hourly_data(seed: int = 1) -> dict:
+    """An Open-Meteo response body: a week of hourly values from UTC midnight"""
+    rnd = random.Random(seed)
+    start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    times = [(start + timedelta(hours=i)).strftime("%Y-%m-%dT%H:%M") for i in range(168)]
+
+    def column(low, high):
+        return [round(rnd.uniform(low, high), 1) for _ in times]
+
+    return {"hourly": {
+        "time": times,
+        "cloud_cover": column(0, 100),
+        "visibility": column(0, 100000),
+        "temperature_2m": column(-20, 30),
+        "relative_humidity_2m": column(10, 100),
+        "wind_speed_10m": column(0, 50),
+        "wind_direction_10m": column(0, 360),
+        "pm2_5": column(0, 40),
+    }}
+
+
+class FakeUpstream:
+    """Stands in for Open-Meteo's HTTP layer and counts requests"""
+
+    def __init__(self):
+        self.available = True
+        self.requests = []
+
+    async def fetch(self, url, params, parse):
+        self.requests.append((url, params))
+        if not self.available:
+            return {"available": False, "error": "upstream down"}
+        latitudes = str(params["latitude"]).split(",")
+        if len(latitudes) > 1:
+            return parse([hourly_data(i) for i in range(len(latitudes))])
+        return parse(hourly_data())
+
+
+# A small polar stereographic run: the shape of the CMC grid at 80 km spacing
+SYNTHETIC_HOURS = 6
+SYNTHETIC_NY, SYNTHETIC_NX = 60, 80
+
+
+def synthetic_run(n_files: int = 3 * SYNTHETIC_HOURS) -> RunData:
+    """Seeded random CMC fields; n_files sets the version"""
+    hours, ny, nx = SYNTHETIC_HOURS, SYNTHETIC_NY, SYNTHETIC_NX
+    projection = PolarStereographic(lad=60, lov=249, dx=80000, dy=80000, lat1=18.0, lon1=-142.0)
+    x = projection.x0 + np.arange(nx) * projection.dx
+    y = projection.y0 + np.arange(ny) * projection.dy
+    xx, yy = np.meshgrid(x, y)
+    lats = 90 - 2 * np.degrees(np.arctan(np.hypot(xx, yy) / projection.scale))
+    lons = (249 + np.degrees(np.arctan2(xx, -yy)) + 180) % 360 - 180
+    geometry = GridGeometry(lats, lons, projection)
+
+    rng = np.random.default_rng(0)
+    cloud = rng.uniform(0, 100, (hours, ny, nx)).astype(np.float32)
+    cloud[-1] = np.nan  # An hour that never arrived
+    fields = {
+        "cloud_cover": RunField(geometry, cloud),
+        "seeing": RunField(geometry, rng.uniform(1, 4, (hours, ny, nx)).astype(np.float32)),
+        "transparency": RunField(geometry, rng.uniform(1, 5, (hours, ny, nx)).astype(np.float32)),
+    }
+    return RunData("00", datetime(2026, 10, 19, 0, tzinfo=timezone.utc), fields, n_files)
+
+
+def clear_forecast_caches():
+    openmeteo_fetcher.cache.clear()
+    forecast_builder.cell_cache.clear()
+    forecast_cache.clear()
+
+
+@pytest.fixture(scope="session")
+def upstream():
+    fake = FakeUpstream()
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(openmeteo_fetcher, "_fetch", fake.fetch)
+        yield fake
+
+
+@pytest.fixture(scope="session")
+def client(upstream):
+    """TestClient of the app, started once for the session"""
+    import app.main
+
+    async def no_scheduler():
+        pass
+
+    seed_locations()
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(app.main, "start_scheduler", no_scheduler)
+        with TestClient(app.main.app) as client:
+            yield client
+    shutil.rmtree(TEST_DIR, ignore_errors=True)
+
+
+@pytest.fixture
+def upstream_down(upstream):
+    """Open-Meteo unavailable for one test, with nothing cached from before"""
+    clear_forecast_caches()
+    upstream.available = False
+    yield upstream
+    upstream.available = True
+    clear_forecast_caches()
@@ -0,0 +1,156 @@
+"""
+Admission control: per-class build budgets, shedding and coalescing
+"""
+
+import asyncio
+
+import pytest
+
+from app.services.admission import AdmissionController, BuildBudget, Overloaded
+
+
+def controller(max_concurrent: int = 1, max_queued: int = 1, queue_timeout: float = 5.0) -> AdmissionController:
+    admission = AdmissionController()
+    admission.budgets = {
+        kind: BuildBudget(kind, max_concurrent, max_queued, queue_timeout) for kind in ("keyed", "coords")
+    }
+    return admission
+
+
+def test_builds_beyond_the_queue_are_shed():
+    async def scenario():
+        admission = controller(max_concurrent=1, max_queued=1)
+        release = asyncio.Event()
+
+        async def slow():
+            await release.wait()
+            return "built"
+
+        running = asyncio.ensure_future(admission.build("keyed", "a", slow))
+        queued = asyncio.ensure_future(admission.build("keyed", "b", slow))
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded) as shed:
+            await admission.build("keyed", "c", slow)
+        assert shed.value.kind == "keyed"
+        assert shed.value.retry_after >= 1
+
+        # The other class has its own budget
+        assert await admission.build("coords", "d", lambda: asyncio.sleep(0, "coords")) == "coords"
+
+        release.set()
+        assert await asyncio.gather(running, queued) == ["built", "built"]
+        stats = admission.stats()["keyed"]
+        assert (stats["admitted"], stats["shed"], stats["running"], stats["queued"]) == (2, 1, 0, 0)
+
+    asyncio.run(scenario())
+
+
+def test_queued_build_times_out():
+    async def scenario():
+        admission = controller(max_concurrent=1, max_queued=5, queue_timeout=0.05)
+        release = asyncio.Event()
+        running = asyncio.ensure_future(admission.build("coords", "a", release.wait))
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded):
+            await admission.build("coords", "b", release.wait)
+        assert admission.stats()["coords"]["timed_out"] == 1
+
+        release.set()
+        await running
+        assert admission.budgets["coords"].running == 0
+
+    asyncio.run(scenario())
+
+
+def test_identical_builds_are_coalesced():
+    async def scenario():
+        admission = controller()
+        calls = []
+
+        async def build():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return 42
+
+        results = await asyncio.gather(*[admission.build("keyed", "same", build) for _ in range(5)])
+        assert results == [42] * 5
+        assert len(calls) == 1
+        assert admission.coalesced == 4
+        assert admission._inflight == {}
+
+    asyncio.run(scenario())
+
+
+def test_follower_survives_the_leader_being_cancelled():
+    async def scenario():
+        admission = controller()
+
+        async def build():
+            await asyncio.sleep(0.02)
+            return 42
+
+        leader = asyncio.ensure_future(admission.build("keyed", "same", build))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(admission.build("keyed", "same", build))
+        await asyncio.sleep(0)
+        leader.cancel()
+
+        assert await follower == 42
+        assert leader.cancelled()
+        assert admission._inflight == {}
+
+    asyncio.run(scenario())
+
+
+def test_failed_build_reaches_every_caller_and_frees_the_key():
+    async def scenario():
+        admission = controller()
+
+        async def build():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream exploded")
+
+        results = await asyncio.gather(
+            admission.build("keyed", "same", build), admission.build("keyed", "same", build),
+            return_exceptions=True
+        )
+        assert [str(result) for result in results] == ["upstream exploded"] * 2
+        assert admission._inflight == {}
+        assert await admission.build("keyed", "same", lambda: asyncio.sleep(0, "retried")) == "retried"
+        assert admission.budgets["keyed"].running == 0
+
+    asyncio.run(scenario())
+
+
+def test_batch_answers_503_with_retry_after_when_shed(client, monkeypatch):
+    from app.services.admission import admission
+
+    async def overloaded(kind, key, factory):
+        raise Overloaded(kind, 7)
+
+    monkeypatch.setattr(admission, "build", overloaded)
+    response = client.post("/api/forecast/batch", json={"locations": [{"lat": 12.5, "lon": 34.5}]})
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "7"
+
+
+def test_shed_forecast_is_served_stale_or_503(client, monkeypatch):
+    from app.services.admission import admission
+    from app.services.response_cache import forecast_cache
+
+    fresh = client.get("/api/forecast/KittPeakAZ")
+    assert fresh.status_code == 200
+
+    async def overloaded(kind, key, factory):
+        raise Overloaded(kind, 7)
+
+    monkeypatch.setattr(admission, "build", overloaded)
+    forecast_cache.clear()
+    stale = client.get("/api/forecast/KittPeakAZ")
+    assert stale.status_code == 200
+    assert stale.headers["warning"] == '110 - "Response is Stale"'
+    assert stale.json() == fresh.json()
+
+    never_built = client.get("/api/forecast/coords/?lat=12.5&lon=34.5")
+    assert never_built.status_code == 503
+    assert never_built.headers["retry-after"] == "7"
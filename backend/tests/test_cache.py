@@ -0,0 +1,200 @@
+"""
+TTLCache (expiry, LRU and hot-set eviction, persistence) and the Open-Meteo
+response cache built on it (per cell and slot, negative caching, coalescing)
+"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from app.config import settings
+from app.services import cache
+from app.services.cache import TTLCache
+from app.services.cmc_fetcher import OpenMeteoFetcher
+from conftest import FakeUpstream
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache, "time", SimpleNamespace(time=clock.time))
+    return clock
+
+
+def test_entries_expire(clock):
+    c = TTLCache(max_entries=10, ttl=60)
+    c.set("a", 1)
+    c.set("b", 2, ttl=5)
+    clock.now += 5
+    assert c.get("b") is None and "b" not in c
+    assert c.get("a") == 1
+    clock.now += 55
+    assert c.get("a", "gone") == "gone"
+    assert len(c) == 0
+    assert c.stats()["hits"] == 1 and c.stats()["misses"] == 2
+
+
+def test_least_recently_used_is_evicted(clock):
+    c = TTLCache(max_entries=2, ttl=60)
+    c.set("a", 1)
+    c.set("b", 2)
+    c.get("a")
+    c.set("c", 3)
+    assert "b" not in c
+    assert c.get("a") == 1 and c.get("c") == 3
+
+
+def test_coldest_sampled_entry_is_evicted(clock):
+    scores = {"hot": 10.0}
+    c = TTLCache(max_entries=3, ttl=60, hotness=lambda key: scores.get(key, 0.0), eviction_samples=2)
+    c.set("popular", 1, hot_key="hot")
+    c.set("one-off", 2, hot_key="cold")
+    c.set("recent", 3, hot_key="cold")
+    c.set("new", 4)
+    # The oldest entry is popular, so the next oldest goes instead
+    assert "popular" in c and "one-off" not in c
+
+    # Expired entries go first, whatever their score
+    c.set("stale", 5, ttl=1, hot_key="hot")
+    clock.now += 2
+    c.set("newer", 6)
+    assert len(c) == 3 and "popular" in c and "recent" not in c
+
+
+def test_persistence_round_trip(clock, tmp_path):
+    path = tmp_path / "cache.json"
+    c = TTLCache(max_entries=10, ttl=60, persist_path=path, persist_interval=30)
+    assert not c.save_due()
+    c.set("first", {"hourly": [1, 2]}, hot_key="cell:45.1,-77.9")
+    c.set("second", [3])
+    c.set("short", 4, ttl=10)
+    clock.now += 30
+    assert c.save_due()
+    c.save()
+    assert not c.save_due()
+
+    clock.now += 10  # "short" has expired by the time it is loaded
+    loaded = TTLCache(max_entries=10, ttl=60, persist_path=path)
+    assert list(loaded._entries) == ["first", "second"]
+    assert loaded.get("first") == {"hourly": [1, 2]}
+    assert loaded._hot_keys == {"first": "cell:45.1,-77.9"}
+    # Expiry is kept, not restarted
+    clock.now += 20
+    assert loaded.get("second") is None
+
+
+def test_load_keeps_the_most_recently_used(clock, tmp_path):
+    path = tmp_path / "cache.json"
+    c = TTLCache(max_entries=10, ttl=60, persist_path=path)
+    for key in "abcd":
+        c.set(key, key)
+    c.get("a")
+    c.save()
+    assert list(TTLCache(max_entries=2, ttl=60, persist_path=path)._entries) == ["d", "a"]
+
+
+def test_corrupt_cache_file_is_ignored(tmp_path):
+    path = tmp_path / "cache.json"
+    path.write_text("{not json")
+    assert len(TTLCache(max_entries=10, ttl=60, persist_path=path)) == 0
+
+
+@pytest.fixture
+def fetcher(tmp_path, monkeypatch):
+    """A fresh Open-Meteo fetcher over the fake upstream, in a fixed update slot"""
+    monkeypatch.setattr(settings, "CACHE_DIR", str(tmp_path))
+    fetcher = OpenMeteoFetcher()
+    fetcher.upstream = FakeUpstream()
+    fetcher._fetch = fetcher.upstream.fetch
+    fetcher.slot = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    fetcher.get_update_slot = lambda update_hours: fetcher.slot
+    return fetcher
+
+
+def test_points_in_one_cell_share_a_request(fetcher):
+    async def scenario():
+        first = await fetcher.fetch_forecast(45.06, -77.86)
+        second = await fetcher.fetch_forecast(45.09, -77.91)
+        elsewhere = await fetcher.fetch_forecast(45.58, -78.36)
+        return first, second, elsewhere
+
+    first, second, elsewhere = asyncio.run(scenario())
+    assert first is second and first["available"]
+    assert len(fetcher.upstream.requests) == 2
+    # The upstream request is for the cell center
+    _, params = fetcher.upstream.requests[0]
+    assert (params["latitude"], params["longitude"]) == (45.1, -77.9)
+
+
+def test_new_slot_refetches(fetcher):
+    asyncio.run(fetcher.fetch_forecast(45.06, -77.86))
+    fetcher.slot += timedelta(hours=settings.OPEN_METEO_UPDATE_HOURS)
+    asyncio.run(fetcher.fetch_forecast(45.06, -77.86))
+    assert len(fetcher.upstream.requests) == 2
+
+
+def test_failures_are_cached_briefly(fetcher, clock):
+    fetcher.upstream.available = False
+    assert not asyncio.run(fetcher.fetch_forecast(45.06, -77.86))["available"]
+    assert not asyncio.run(fetcher.fetch_forecast(45.06, -77.86))["available"]
+    assert len(fetcher.upstream.requests) == 1
+
+    fetcher.upstream.available = True
+    clock.now += settings.OPEN_METEO_NEGATIVE_TTL
+    assert asyncio.run(fetcher.fetch_forecast(45.06, -77.86))["available"]
+    assert len(fetcher.upstream.requests) == 2
+
+
+def test_concurrent_requests_for_a_cell_are_coalesced(fetcher):
+    fetch = fetcher._fetch
+
+    async def slow_fetch(url, params, parse):
+        await asyncio.sleep(0.01)
+        return await fetch(url, params, parse)
+    fetcher._fetch = slow_fetch
+
+    async def scenario():
+        return await asyncio.gather(*(fetcher.fetch_forecast(45.06, -77.86) for _ in range(5)))
+
+    results = asyncio.run(scenario())
+    assert len(fetcher.upstream.requests) == 1
+    assert all(result is results[0] for result in results)
+    assert fetcher._inflight == {}
+
+
+def test_fetch_many_batches_uncached_cells(fetcher, monkeypatch):
+    monkeypatch.setattr(settings, "OPEN_METEO_BATCH_SIZE", 2)
+    asyncio.run(fetcher.fetch_forecast(45.06, -77.86))
+    requests = len(fetcher.upstream.requests)
+
+    points = [(45.06, -77.86), (45.58, -78.36), (45.09, -77.91), (31.96, -111.6), (35.2, -111.65), (45.58, -78.36)]
+    results = asyncio.run(fetcher.fetch_forecast_many(points))
+    # Three uncached cells in two multi-location requests; duplicates fetched once
+    assert len(fetcher.upstream.requests) - requests == 2
+    assert [len(str(params["latitude"]).split(",")) for _, params in fetcher.upstream.requests[requests:]] == [2, 1]
+    assert len(results) == len(points)
+    assert results[0] is results[2] and results[1] is results[5]
+    assert all(result["available"] for result in results)
+
+    # All cached now, singly or in bulk
+    asyncio.run(fetcher.fetch_forecast_many(points))
+    asyncio.run(fetcher.fetch_forecast(31.96, -111.6))
+    assert len(fetcher.upstream.requests) - requests == 2
+
+
+def test_fetch_many_failure_is_cached_per_cell(fetcher):
+    fetcher.upstream.available = False
+    results = asyncio.run(fetcher.fetch_forecast_many([(45.06, -77.86), (31.96, -111.6)]))
+    assert [result["available"] for result in results] == [False, False]
+    asyncio.run(fetcher.fetch_forecast(31.96, -111.6))
+    assert len(fetcher.upstream.requests) == 1
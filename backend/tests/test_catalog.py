@@ -0,0 +1,103 @@
+"""
+In-memory location catalog: lookups, immutability and reloads after writes
+"""
+
+import pytest
+
+from app.database import LocationDB, SessionLocal
+from app.services.catalog import Catalog, location_catalog
+from conftest import INACTIVE_KEY, LOCATIONS, location_rows
+
+
+def test_lookups():
+    catalog = Catalog(location_rows(), revision=1)
+    assert len(catalog) == len(LOCATIONS)
+    assert catalog.get("KittPeakAZ").name == "Kitt Peak"
+    assert catalog.get("kittpeakaz") is None
+    assert catalog.get_by_id(1).key == "AlgonquinON"
+    assert catalog.get_by_id("1").key == "AlgonquinON"
+    assert catalog.get_by_id("nope") is None
+
+
+def test_records_are_read_only():
+    location = Catalog(location_rows(), revision=1).get("KittPeakAZ")
+    with pytest.raises(AttributeError):
+        location.name = "Renamed"
+
+
+def test_version_follows_served_fields():
+    rows = location_rows()
+    before = Catalog(rows, revision=1).version
+    assert Catalog(location_rows(), revision=2).version == before
+    rows[0].name = "Renamed"
+    assert Catalog(rows, revision=3).version != before
+
+
+def test_spatial_index_holds_the_catalog_locations():
+    catalog = Catalog(location_rows(), revision=1)
+    kitt_peak = catalog.get("KittPeakAZ")
+    found = catalog.spatial_index.within(kitt_peak.latitude, kitt_peak.longitude, 1)
+    assert found == [(kitt_peak, 0.0)]
+    assert len(catalog.spatial_index) == len(catalog)
+
+
+def test_load_retries_when_the_revision_moves(client, monkeypatch):
+    # Before and after each attempt: a write lands during the first one
+    revisions = [7, 8, 8, 8]
+
+    async def revision():
+        return revisions.pop(0)
+
+    monkeypatch.setattr(location_catalog, "_revision", revision)
+    try:
+        client.portal.call(location_catalog.refresh)
+        assert location_catalog.current.revision == 8
+        assert revisions == []
+    finally:
+        monkeypatch.undo()
+        client.portal.call(location_catalog.refresh)
+
+
+def test_get_location(client):
+    response = client.get("/api/locations/McDonaldTX")
+    assert response.status_code == 200
+    assert response.json()["name"] == "McDonald Observatory"
+    assert client.get("/api/locations/NoSuchPlace").status_code == 404
+    assert client.get(f"/api/locations/{INACTIVE_KEY}").status_code == 404
+
+
+def test_api_writes_publish_a_new_catalog(client):
+    site = {
+        "key": "TempSiteON", "name": "Temporary Site", "latitude": 46.0, "longitude": -80.0,
+        "country": "Canada", "region": "Ontario", "timezone": "America/Toronto",
+    }
+    version = location_catalog.current.version
+    assert client.post("/api/locations/", json=site).status_code == 200
+    assert client.get("/api/locations/TempSiteON").status_code == 200
+    assert client.post("/api/locations/", json=site).status_code == 400
+
+    assert client.delete("/api/locations/TempSiteON").status_code == 200
+    assert client.get("/api/locations/TempSiteON").status_code == 404
+    assert client.delete("/api/locations/NoSuchPlace").status_code == 404
+    # Back to the same served content
+    assert location_catalog.current.version == version
+
+
+def test_outside_writes_are_picked_up_by_check(client):
+    revision = location_catalog.current.revision
+    with SessionLocal() as db:
+        db.query(LocationDB).filter_by(key=INACTIVE_KEY).update({"is_active": 1})
+        db.commit()
+    try:
+        client.portal.call(location_catalog.check)
+        assert location_catalog.current.revision > revision
+        assert location_catalog.current.get(INACTIVE_KEY) is not None
+        # The /nearby index is rebuilt with the catalog
+        nearby = client.get("/api/locations/nearby?lat=44.0&lon=-79.0&radius_km=1").json()
+        assert [item["location"]["key"] for item in nearby] == [INACTIVE_KEY]
+    finally:
+        with SessionLocal() as db:
+            db.query(LocationDB).filter_by(key=INACTIVE_KEY).update({"is_active": 0})
+            db.commit()
+        client.portal.call(location_catalog.check)
+    assert location_catalog.current.get(INACTIVE_KEY) is None
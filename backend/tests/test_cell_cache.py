@@ -0,0 +1,96 @@
+"""
+Per-cell forecast cache: points in the same CMC and Open-Meteo cells share
+one build, and a new run version or upstream slot is a miss
+"""
+
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.cmc_fetcher import openmeteo_fetcher
+from app.services.forecast_builder import ForecastBuilder
+from conftest import SYNTHETIC_HOURS, clear_forecast_caches, synthetic_run
+
+# A and B share both cells; C shares the CMC cell only
+A = (45.01, -78.01)
+B = (45.04, -77.97)
+C = (45.21, -78.01)
+SLOT = datetime(2026, 10, 19, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def run():
+    return synthetic_run()
+
+
+@pytest.fixture
+def builder(client, upstream, monkeypatch):
+    """A ForecastBuilder with its own cell cache, counting cell builds"""
+    clear_forecast_caches()
+    builder = ForecastBuilder()
+    builder.merges = 0
+    merge_columns = builder._merge_columns
+
+    def counting(*args):
+        builder.merges += 1
+        return merge_columns(*args)
+
+    monkeypatch.setattr(builder, "_merge_columns", counting)
+    monkeypatch.setattr(openmeteo_fetcher, "get_update_slot", lambda update_hours: SLOT)
+    yield builder
+    clear_forecast_caches()
+
+
+def build(client, builder, point, data):
+    columns, _ = client.portal.call(builder.build_cell_columns, *point, data)
+    return columns
+
+
+def test_cells_of_the_test_points(run):
+    assert run.cell_key(*A) == run.cell_key(*B) == run.cell_key(*C) != "none"
+    assert openmeteo_fetcher.get_model_cell(*A) == openmeteo_fetcher.get_model_cell(*B)
+    assert openmeteo_fetcher.get_model_cell(*A) != openmeteo_fetcher.get_model_cell(*C)
+
+
+def test_points_in_the_same_cells_share_one_build(client, builder, upstream, run):
+    requests = len(upstream.requests)
+    columns = build(client, builder, A, run)
+    assert build(client, builder, B, run) is columns
+    assert builder.merges == 1
+    assert len(upstream.requests) == requests + 2  # Forecast and air quality, once
+
+    assert build(client, builder, C, run) is not columns
+    assert builder.merges == 2
+    assert len(builder.cell_cache) == 2
+
+
+def test_batch_builds_each_cell_once(client, builder, run):
+    locations = [SimpleNamespace(latitude=lat, longitude=lon, tz_offset=0) for lat, lon in (A, B, C, A)]
+    columns, _ = client.portal.call(builder.build_columns_many, locations, run)
+    assert builder.merges == 2
+    assert len(builder.cell_cache) == 2
+    # Per-point copies of the same cell entry
+    assert columns[0].cloud_cover_pct.tolist() == columns[1].cloud_cover_pct.tolist()
+
+    build(client, builder, B, run)
+    assert builder.merges == 2
+
+
+def test_new_run_version_misses(client, builder, run):
+    columns = build(client, builder, A, run)
+    newer = synthetic_run(n_files=3 * SYNTHETIC_HOURS - 1)  # A file fewer
+    assert newer.version != run.version
+
+    assert build(client, builder, A, newer) is not columns
+    assert builder.merges == 2
+    # Requests pinned to the old version still hit
+    assert build(client, builder, B, run) is columns
+    assert builder.merges == 2
+
+
+def test_new_upstream_slot_misses(client, builder, run, monkeypatch):
+    columns = build(client, builder, A, run)
+    monkeypatch.setattr(openmeteo_fetcher, "get_update_slot", lambda update_hours: SLOT + timedelta(hours=6))
+    assert build(client, builder, A, run) is not columns
+    assert builder.merges == 2
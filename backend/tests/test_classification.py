@@ -0,0 +1,226 @@
+"""
+Vectorized classification against the if/elif ladders it replaced
+
+Each scale is checked at, and just either side of, every threshold.
+"""
+
+import math
+
+import numpy as np
+import pytest
+
+from app.services import classification
+from app.services.astro_calculator import create_calculator
+from app.services.classification import (
+    CLOUD_CATEGORIES, DARKNESS_CATEGORIES, MISSING, SCALES, SEEING_CATEGORIES, TRANSPARENCY_CATEGORIES,
+)
+from app.services.cmc_fetcher import cmc_fetcher
+
+EPS = 1e-6
+
+
+# The ladders as they were, None for missing input
+
+def baseline_cloud(cloud_pct):
+    if cloud_pct is None:
+        return None
+    if cloud_pct < 10:
+        return "clear"
+    elif cloud_pct < 30:
+        return "mostly_clear"
+    elif cloud_pct < 50:
+        return "partly_cloudy"
+    elif cloud_pct < 70:
+        return "mostly_cloudy"
+    elif cloud_pct < 90:
+        return "cloudy"
+    else:
+        return "overcast"
+
+
+def baseline_seeing(raw_value):
+    if raw_value is None:
+        return "too_cloudy"
+    if raw_value <= 1.5:
+        return "excellent"
+    elif raw_value <= 2.0:
+        return "good"
+    elif raw_value <= 2.5:
+        return "average"
+    elif raw_value <= 3.5:
+        return "poor"
+    else:
+        return "bad"
+
+
+def baseline_transparency(raw_value, cloud_cover=None):
+    if raw_value is None or (cloud_cover is not None and cloud_cover > 80):
+        return "too_cloudy"
+    if raw_value >= 4.5:
+        return "transparent"
+    elif raw_value >= 3.5:
+        return "above_avg"
+    elif raw_value >= 2.5:
+        return "average"
+    elif raw_value >= 1.5:
+        return "below_avg"
+    else:
+        return "poor"
+
+
+def baseline_estimate_transparency(cloud, humidity):
+    if cloud is not None and cloud > 30:
+        return "too_cloudy"
+    if humidity is None:
+        return None
+    if humidity > 85:
+        return "poor"
+    elif humidity > 70:
+        return "below_avg"
+    elif humidity > 55:
+        return "average"
+    elif humidity > 40:
+        return "above_avg"
+    else:
+        return "transparent"
+
+
+def baseline_estimate_seeing(cloud, wind_mph):
+    if cloud is not None and cloud > 80:
+        return "too_cloudy"
+    if wind_mph is None:
+        return "poor"
+    if wind_mph > 20:
+        return "bad"
+    elif wind_mph > 12:
+        return "poor"
+    elif wind_mph > 6:
+        return "average"
+    else:
+        return "good"
+
+
+def baseline_darkness(limiting_mag):
+    if limiting_mag < -3:
+        return "daylight"
+    elif limiting_mag < -1:
+        return "dusk"
+    elif limiting_mag < 1:
+        return "twilight"
+    elif limiting_mag < 3:
+        return "bright_moon"
+    elif limiting_mag < 4.5:
+        return "partial_moon"
+    elif limiting_mag < 5.5:
+        return "dim_moon"
+    else:
+        return "dark"
+
+
+def around(*edges):
+    """Each edge and the values just either side of it, plus far outliers"""
+    values = [-1e9, 1e9]
+    for edge in edges:
+        values += [edge - EPS, edge, edge + EPS]
+    return sorted(values)
+
+
+def as_labels(codes, categories):
+    return classification.labels(np.asarray(codes), categories)
+
+
+CLOUD_VALUES = around(10, 30, 50, 70, 90)
+SEEING_VALUES = around(1.5, 2.0, 2.5, 3.5)
+TRANSPARENCY_VALUES = around(1.5, 2.5, 3.5, 4.5)
+HUMIDITY_VALUES = around(40, 55, 70, 85)
+WIND_VALUES = around(6, 12, 20)
+DARKNESS_VALUES = around(-3, -1, 1, 3, 4.5, 5.5)
+
+
+def test_cloud_categories():
+    values = CLOUD_VALUES + [None]
+    assert as_labels(classification.categorize_cloud(values), CLOUD_CATEGORIES) == [
+        baseline_cloud(v) for v in values
+    ]
+
+
+def test_cmc_seeing():
+    values = SEEING_VALUES + [None]
+    assert as_labels(classification.convert_seeing(values), SEEING_CATEGORIES) == [
+        baseline_seeing(v) for v in values
+    ]
+    assert [cmc_fetcher.convert_seeing_value(v) for v in values] == [baseline_seeing(v) for v in values]
+
+
+@pytest.mark.parametrize("cloud", [None, 0, 80, 80 + EPS, 100])
+def test_cmc_transparency(cloud):
+    values = TRANSPARENCY_VALUES + [None]
+    clouds = [math.nan if cloud is None else cloud] * len(values)
+    expected = [baseline_transparency(v, cloud) for v in values]
+    assert as_labels(classification.convert_transparency(values, clouds), TRANSPARENCY_CATEGORIES) == expected
+    assert [cmc_fetcher.convert_transparency_value(v, cloud) for v in values] == expected
+
+
+@pytest.mark.parametrize("cloud", [None, 30, 30 + EPS])
+def test_estimated_transparency(cloud):
+    values = HUMIDITY_VALUES + [None]
+    clouds = [cloud] * len(values)
+    assert as_labels(classification.estimate_transparency(clouds, values), TRANSPARENCY_CATEGORIES) == [
+        baseline_estimate_transparency(cloud, v) for v in values
+    ]
+
+
+@pytest.mark.parametrize("cloud", [None, 80, 80 + EPS])
+def test_estimated_seeing(cloud):
+    values = WIND_VALUES + [None]
+    clouds = [cloud] * len(values)
+    assert as_labels(classification.estimate_seeing(clouds, values), SEEING_CATEGORIES) == [
+        baseline_estimate_seeing(cloud, v) for v in values
+    ]
+
+
+def test_darkness_categories():
+    assert as_labels(classification.darkness_category(DARKNESS_VALUES), DARKNESS_CATEGORIES) == [
+        baseline_darkness(v) for v in DARKNESS_VALUES
+    ]
+    calculator = create_calculator(45.0, -78.0)
+    assert [calculator.get_darkness_color_code(v) for v in DARKNESS_VALUES] == [
+        baseline_darkness(v) for v in DARKNESS_VALUES
+    ]
+
+
+@pytest.mark.parametrize("values", [[None], [math.nan], np.array([np.nan])])
+def test_missing_values(values):
+    for classify in (classification.categorize_cloud, classification.darkness_category):
+        assert classify(values).tolist() == [MISSING]
+    assert classification.labels(classification.categorize_cloud(values), CLOUD_CATEGORIES) == [None]
+    # Missing CMC data reads as too cloudy
+    assert classification.convert_seeing(values).tolist() == [0]
+    assert classification.convert_transparency(values).tolist() == [0]
+
+
+@pytest.mark.parametrize("name", [name for name, scale in SCALES.items() if scale.maxes is not None])
+def test_range_colors(name):
+    # The first color whose max is >= the value; the last one above every max
+    maxes = SCALES[name].maxes.tolist()
+    values = around(*maxes)
+
+    def baseline_color(value):
+        for i, top in enumerate(maxes):
+            if value <= top:
+                return i
+        return len(maxes) - 1
+
+    assert SCALES[name].color_index(values).tolist() == [baseline_color(v) for v in values]
+    assert SCALES[name].color_index([math.nan]).tolist() == [MISSING]
+
+
+@pytest.mark.parametrize("name, categories", [
+    ("seeing", SEEING_CATEGORIES), ("transparency", TRANSPARENCY_CATEGORIES),
+])
+def test_category_colors(name, categories):
+    scale = SCALES[name]
+    colors = classification.COLOR_SCALES[name]["colors"]
+    indices = scale.color_index(list(range(len(categories))) + [MISSING]).tolist()
+    assert [colors[i]["value"] for i in indices[:-1]] == list(categories)
+    assert indices[-1] == MISSING
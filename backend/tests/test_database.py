@@ -0,0 +1,103 @@
+"""
+SQLite engine profile: WAL readers alongside the single writer, and the
+per-connection pragmas
+"""
+
+import asyncio
+import time
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from app.config import settings
+from app.database import create_async_engines, engine
+
+
+async def pragma(conn, name: str):
+    return (await conn.exec_driver_sql(f"PRAGMA {name}")).scalar()
+
+
+def writer_commit_seconds(url: str) -> float:
+    """How long the writer takes to commit while a reader's transaction is open"""
+    async def run():
+        read_engine, write_engine = create_async_engines(url)
+        try:
+            async with read_engine.connect() as reader, write_engine.connect() as writer:
+                await reader.execute(text("BEGIN"))
+                await reader.execute(text("SELECT COUNT(*) FROM locations"))
+                await writer.execute(text("UPDATE locations SET name = name WHERE id = 1"))
+                started = time.monotonic()
+                await writer.commit()
+                return time.monotonic() - started
+        finally:
+            await read_engine.dispose()
+            await write_engine.dispose()
+
+    return asyncio.run(run())
+
+
+def test_writer_commits_while_readers_are_open(client, tmp_path, monkeypatch):
+    assert writer_commit_seconds(settings.DATABASE_URL) < 0.5
+
+    # Without WAL the commit waits out busy_timeout for the reader, then fails
+    monkeypatch.setattr(settings, "SQLITE_BUSY_TIMEOUT_MS", 200)
+    url = f"sqlite:///{tmp_path}/rollback.db"
+    with create_engine(url).begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE locations (id INTEGER PRIMARY KEY, name TEXT)")
+        conn.exec_driver_sql("INSERT INTO locations VALUES (1, 'Algonquin Park')")
+    with pytest.raises(OperationalError, match="locked"):
+        writer_commit_seconds(url)
+
+
+def test_fresh_read_and_write_connections(client):
+    async def run():
+        read_engine, write_engine = create_async_engines(settings.DATABASE_URL)
+        values = {}
+        try:
+            for role, async_engine in (("read", read_engine), ("write", write_engine)):
+                async with async_engine.connect() as conn:
+                    values[role] = [await pragma(conn, name)
+                                    for name in ("journal_mode", "synchronous", "query_only")]
+            pools = read_engine.pool.size(), write_engine.pool.size()
+        finally:
+            await read_engine.dispose()
+            await write_engine.dispose()
+        return values, pools
+
+    values, pools = asyncio.run(run())
+    # synchronous 1 is NORMAL; only the readers are query_only
+    assert values == {"read": ["wal", 1, 1], "write": ["wal", 1, 0]}
+    assert pools == (settings.SQLITE_READ_POOL_SIZE, 1)
+
+
+def test_connection_profile(client):
+    async def run():
+        read_engine, write_engine = create_async_engines(settings.DATABASE_URL)
+        try:
+            async with read_engine.connect() as conn:
+                values = {name: await pragma(conn, name)
+                          for name in ("mmap_size", "cache_size", "busy_timeout", "temp_store")}
+        finally:
+            await read_engine.dispose()
+            await write_engine.dispose()
+        return values
+
+    assert asyncio.run(run()) == {
+        "mmap_size": settings.SQLITE_MMAP_SIZE,
+        "cache_size": -settings.SQLITE_CACHE_SIZE_KB,
+        "busy_timeout": settings.SQLITE_BUSY_TIMEOUT_MS,
+        "temp_store": 2,  # MEMORY
+    }
+    # Scripts and table creation share the profile
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA mmap_size").scalar() == settings.SQLITE_MMAP_SIZE
+
+
+def test_untuned_and_invalid_profiles(monkeypatch):
+    read_engine, write_engine = create_async_engines(settings.DATABASE_URL, tuned=False)
+    assert read_engine is write_engine
+
+    monkeypatch.setattr(settings, "SQLITE_SYNCHRONOUS", "sometimes")
+    with pytest.raises(ValueError):
+        create_async_engines(settings.DATABASE_URL)
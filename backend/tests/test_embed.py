@@ -0,0 +1,67 @@
+"""
+Embed widgets: served from the location catalog and the location response cache
+"""
+
+import pytest
+
+from app.database import LocationDB, SessionLocal
+from app.services.catalog import location_catalog
+from app.services.response_cache import location_response_cache
+from conftest import INACTIVE_KEY
+
+
+@pytest.fixture
+def kitt_peak(client):
+    return location_catalog.current.get("KittPeakAZ")
+
+
+def test_embed_code(client, kitt_peak):
+    response = client.get(f"/api/embed/code/{kitt_peak.id}?width=400&theme=dark")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["image_url"].endswith(f"/api/embed/image/{kitt_peak.id}.png")
+    assert body["page_url"].endswith(f"/chart/{kitt_peak.id}")
+    assert 'width="400"' in body["html"] and "Kitt Peak" in body["html"]
+
+    # Encoded once, then served from the location response cache
+    key = f"embed-code:{kitt_peak.id}:400:300:dark"
+    assert location_response_cache.get(key) is not None
+    assert client.get(f"/api/embed/code/{kitt_peak.id}?width=400&theme=dark").content == response.content
+
+
+def test_embed_iframe(client, kitt_peak):
+    response = client.get(f"/api/embed/iframe/{kitt_peak.id}?theme=dark")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/html")
+    assert "Clear Sky Chart for Kitt Peak" in response.text
+    assert "#1a1a2e" in response.text
+    assert "#1a1a2e" not in client.get(f"/api/embed/iframe/{kitt_peak.id}").text
+
+    compressed = client.get(f"/api/embed/iframe/{kitt_peak.id}?theme=dark", headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.text == response.text
+
+
+def test_embed_image(client, kitt_peak):
+    response = client.get(f"/api/embed/image/{kitt_peak.id}.png")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/png"
+    assert response.content.startswith(b"\x89PNG\r\n\x1a\n")
+
+
+@pytest.mark.parametrize("path", ["code/999999", "iframe/999999", "image/999999.png", "code/KittPeakAZ"])
+def test_unknown_locations(client, path):
+    assert client.get(f"/api/embed/{path}").status_code == 404
+
+
+@pytest.mark.parametrize("path", ["code/{id}", "iframe/{id}", "image/{id}.png"])
+def test_inactive_locations_are_still_embeddable(client, path):
+    with SessionLocal() as db:
+        location_id = db.query(LocationDB).filter_by(key=INACTIVE_KEY).one().id
+    assert location_catalog.current.get_by_id(location_id) is None
+    assert client.get(f"/api/embed/{path.format(id=location_id)}").status_code == 200
+
+
+def test_invalid_options(client, kitt_peak):
+    assert client.get(f"/api/embed/code/{kitt_peak.id}?theme=neon").status_code == 422
+    assert client.get(f"/api/embed/code/{kitt_peak.id}?width=100").status_code == 422
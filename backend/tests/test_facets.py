@@ -0,0 +1,61 @@
+"""
+Facet counts: one GROUP BY each at catalog load, served pre-encoded with ETags
+"""
+
+import json
+
+from app.services.catalog import location_catalog
+from app.services.facets import FacetSnapshot
+
+COUNTRIES = [("Bahamas", 1), ("Canada", 4), ("USA", 4)]
+REGIONS = [("Canada", "Ontario", 3), ("Canada", "Quebec", 1), ("USA", "Arizona", 2), ("USA", "Texas", 2)]
+CATEGORIES = [("dark-sky", 1), ("observatory", 4), ("park", 2)]
+
+
+def decoded(facet):
+    _, encoded = facet
+    return json.loads(encoded.body)
+
+
+def test_counts():
+    # Query results come in no particular order
+    facets = FacetSnapshot(COUNTRIES[::-1], REGIONS[::-1], CATEGORIES[::-1])
+    assert decoded(facets.countries) == [
+        {"country": "Bahamas", "count": 1}, {"country": "Canada", "count": 4}, {"country": "USA", "count": 4},
+    ]
+    assert decoded(facets.regions("Canada")) == [{"region": "Ontario", "count": 3}, {"region": "Quebec", "count": 1}]
+    assert decoded(facets.regions("Bahamas")) == []
+    assert decoded(facets.regions("Atlantis")) == []
+    assert decoded(facets.categories) == [
+        {"category": "dark-sky", "count": 1}, {"category": "observatory", "count": 4}, {"category": "park", "count": 2},
+    ]
+
+
+def test_catalog_counts_active_locations(client):
+    # The inactive seeded location is left out; so are missing regions and categories
+    facets = location_catalog.current.facets
+    assert decoded(facets.countries) == decoded(FacetSnapshot(COUNTRIES, [], []).countries)
+    assert decoded(facets.regions("USA")) == decoded(FacetSnapshot([], REGIONS, []).regions("USA"))
+    assert decoded(facets.categories) == decoded(FacetSnapshot([], [], CATEGORIES).categories)
+
+
+def test_etags_follow_content():
+    facets = FacetSnapshot(COUNTRIES, REGIONS, CATEGORIES)
+    again = FacetSnapshot(COUNTRIES[::-1], REGIONS, CATEGORIES)
+    fewer = FacetSnapshot(COUNTRIES[1:], REGIONS, CATEGORIES)
+    assert facets.countries[0] == again.countries[0]
+    assert facets.countries[0] != fewer.countries[0]
+    assert facets.regions("Canada")[0] != facets.regions("USA")[0]
+
+
+def test_facet_endpoints(client):
+    for path in ("/api/locations/countries", "/api/locations/regions/USA", "/api/locations/categories"):
+        response = client.get(path)
+        assert response.status_code == 200
+        assert response.headers["etag"]
+        assert client.get(path, headers={"If-None-Match": response.headers["etag"]}).status_code == 304
+
+    assert client.get("/api/locations/regions/USA").json() == [
+        {"region": "Arizona", "count": 2}, {"region": "Texas", "count": 2},
+    ]
+    assert client.get("/api/locations/regions/Atlantis").json() == []
@@ -0,0 +1,70 @@
+"""
+Single-location forecasts: JSON and columnar formats, color scales, errors
+"""
+
+import pytest
+
+from app.services.classification import COLOR_SCALES_VERSION
+
+
+def test_json_forecast(client):
+    response = client.get("/api/forecast/BancroftON")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["location"]["key"] == "BancroftON"
+    assert body["forecast_hours"] == sum(len(day["hours"]) for day in body["days"])
+    assert "max-age=" in response.headers["cache-control"]
+
+
+def test_columnar_forecast_has_one_array_per_field(client):
+    body = client.get("/api/forecast/BancroftON?format=columnar").json()
+    assert body["format"] == "columnar"
+    assert body["location"]["key"] == "BancroftON"
+    assert body["color_scales_version"] == COLOR_SCALES_VERSION
+    hours = body["forecast_hours"]
+    assert {len(column) for column in body["columns"].values()} == {hours}
+    assert {len(column) for column in body["colors"].values()} == {hours}
+    assert sum(day["count"] for day in body["days"]) == hours
+
+
+def test_columnar_forecast_as_msgpack(client):
+    msgpack = pytest.importorskip("msgpack")
+    response = client.get("/api/forecast/BancroftON?format=columnar", headers={"Accept": "application/msgpack"})
+    assert response.headers["content-type"] == "application/msgpack"
+    assert msgpack.unpackb(response.content)["location"]["key"] == "BancroftON"
+    # A separate variant, so a separate validator
+    json_etag = client.get("/api/forecast/BancroftON?format=columnar").headers["etag"]
+    assert response.headers["etag"] != json_etag
+
+
+def test_coordinate_forecast(client):
+    response = client.get("/api/forecast/coords/?lat=45.5&lon=-75.6&name=Cabin&format=columnar")
+    assert response.status_code == 200
+    assert response.json()["location"]["name"] == "Cabin"
+    assert response.json()["location"]["country"] == "Custom"
+
+
+def test_forecast_errors(client):
+    assert client.get("/api/forecast/NoSuchPlace").status_code == 404
+    # Inactive locations are not in the catalog
+    assert client.get("/api/forecast/ClosedON").status_code == 404
+    assert client.get("/api/forecast/BancroftON?format=xml").status_code == 422
+    assert client.get("/api/forecast/coords/?lat=95&lon=0").status_code == 422
+    assert client.get("/api/forecast/coords/?lat=45").status_code == 422
+
+
+def test_color_scales_are_cached_by_version(client):
+    response = client.get("/api/forecast/color-scales")
+    assert response.status_code == 200
+    assert response.json()["version"] == COLOR_SCALES_VERSION
+    assert set(response.json()["scales"]) >= {"cloud_cover", "seeing", "transparency", "darkness"}
+
+    etag = response.headers["etag"]
+    revalidated = client.get("/api/forecast/color-scales", headers={"If-None-Match": etag})
+    assert revalidated.status_code == 304
+
+
+def test_openapi_documents_the_forecast_model(client):
+    operation = client.get("/openapi.json").json()["paths"]["/api/forecast/{key}"]["get"]
+    schema = operation["responses"]["200"]["content"]["application/json"]["schema"]
+    assert schema == {"$ref": "#/components/schemas/ForecastResponse"}
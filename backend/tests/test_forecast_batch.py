@@ -0,0 +1,105 @@
+"""
+Batch forecasts: request order, deduplication, per-location errors, fallback
+"""
+
+import pytest
+
+from app.config import settings
+from app.services.response_cache import forecast_cache
+from conftest import clear_forecast_caches
+
+BATCH = {"locations": [
+    {"key": "KittPeakAZ"},
+    {"key": "FlagstaffAZ"},
+    {"key": "KittPeakAZ"},
+    {"key": "NoSuchPlace"},
+    {"lat": 45.5, "lon": -75.6, "name": "Cabin"},
+    {"lat": 45.5001, "lon": -75.6001},
+]}
+
+
+def test_batch_answers_in_request_order(client):
+    response = client.post("/api/forecast/batch", json=BATCH)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["format"] == "columnar-batch"
+    assert body["count"] == len(BATCH["locations"])
+
+    locations = body["locations"]
+    assert [loc and loc["key"] for loc in locations[:4]] == ["KittPeakAZ", "FlagstaffAZ", "KittPeakAZ", None]
+    assert locations[4]["name"] == "Cabin"
+    assert locations[5]["country"] == "Custom"
+    assert body["errors"] == [None, None, None, "Location 'NoSuchPlace' not found", None, None]
+
+    # Unknown keys get null columns; everything else has full series
+    for name, values in body["columns"].items():
+        assert values[3] is None
+        assert [len(values[i]) for i in (0, 1, 2, 4, 5)] == [body["forecast_hours"][i] for i in (0, 1, 2, 4, 5)]
+
+
+def test_duplicates_share_one_build(client, upstream):
+    clear_forecast_caches()
+    requests = len(upstream.requests)
+    body = client.post("/api/forecast/batch", json=BATCH).json()
+    # One multi-location request each for weather and air quality
+    assert len(upstream.requests) - requests == 2
+    assert body["columns"]["cloud_cover_pct"][0] == body["columns"]["cloud_cover_pct"][2]
+    assert body["colors"]["seeing"][0] == body["colors"]["seeing"][2]
+
+
+def test_batch_matches_single_forecasts(client):
+    body = client.post("/api/forecast/batch", json=BATCH).json()
+    single = client.get("/api/forecast/FlagstaffAZ?format=columnar").json()
+    for name, values in single["columns"].items():
+        assert body["columns"][name][1] == values
+    assert body["days"][1] == single["days"]
+
+
+def test_batch_is_cached_and_revalidated(client):
+    first = client.post("/api/forecast/batch", json=BATCH)
+    etag = first.headers["etag"]
+    assert forecast_cache.get(etag) is not None
+    assert client.post("/api/forecast/batch", json=BATCH, headers={"If-None-Match": etag}).status_code == 304
+
+    # A different set or order of locations is a different response
+    reordered = {"locations": BATCH["locations"][::-1]}
+    assert client.post("/api/forecast/batch", json=reordered).headers["etag"] != etag
+
+
+def test_batch_as_msgpack(client):
+    msgpack = pytest.importorskip("msgpack")
+    response = client.post("/api/forecast/batch", json=BATCH, headers={"Accept": "application/msgpack"})
+    assert response.headers["content-type"] == "application/msgpack"
+    assert msgpack.unpackb(response.content)["count"] == len(BATCH["locations"])
+
+
+@pytest.mark.parametrize("body", [
+    {"locations": []},
+    {"locations": [{"lat": 45.0}]},
+    {"locations": [{"name": "Nowhere"}]},
+    {"locations": [{"lat": 95.0, "lon": 0.0}]},
+    {"locations": [{"key": "KittPeakAZ"}] * (settings.FORECAST_BATCH_MAX_LOCATIONS + 1)},
+    {},
+])
+def test_invalid_batches(client, body):
+    assert client.post("/api/forecast/batch", json=body).status_code == 422
+
+
+def test_upstream_down_falls_back_to_darkness_only(client, upstream_down):
+    body = {"locations": [{"key": "BigBendTX"}, {"key": "NoSuchPlace"}, {"lat": 40.0, "lon": -100.0}]}
+    response = client.post("/api/forecast/batch", json=body)
+    assert response.status_code == 200
+    result = response.json()
+    assert result["errors"] == [
+        "Weather data unavailable; darkness only",
+        "Location 'NoSuchPlace' not found",
+        "Weather data unavailable; darkness only",
+    ]
+    # Darkness is computed locally, so it is still there
+    assert all(hour is not None for hour in result["columns"]["darkness"][0])
+    assert result["columns"]["darkness"][1] is None
+
+    # A partial batch is neither cached here nor by clients
+    assert response.headers["cache-control"] == "no-store"
+    assert "etag" not in response.headers
+    assert len(forecast_cache) == 0
@@ -0,0 +1,112 @@
+"""
+Merging CMC series and Open-Meteo responses into columns aligned by
+forecast hour, and materializing them at the API boundary
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from app.services import classification
+from app.services.forecast_builder import FORECAST_HOURS, MAX_INPUT_HOURS, ForecastBuilder
+
+START = datetime(2026, 10, 19, 12, tzinfo=timezone.utc)
+LEAD = 3  # Open-Meteo series start this many hours before START
+
+
+def openmeteo(n: int = MAX_INPUT_HOURS) -> dict:
+    first = START - timedelta(hours=LEAD)
+    return {"available": True, "hourly": {
+        "time": [(first + timedelta(hours=i)).strftime("%Y-%m-%dT%H:%M") for i in range(n)],
+        "cloud_cover": [float(i % 90) for i in range(n)],
+        "temperature_2m": [float(i % 40 - 20) for i in range(n)],
+        "relative_humidity_2m": [50.0] * n,
+        "wind_speed_10m": [10.0] * n,
+        "wind_direction_10m": [float(i % 360) for i in range(n)],
+    }}
+
+
+def cmc(values=None) -> np.ndarray:
+    """A CMC series indexed like Open-Meteo's hourly lists, NaN except {index: value}"""
+    series = np.full(MAX_INPUT_HOURS, np.nan)
+    for index, value in (values or {}).items():
+        series[index] = value
+    return series
+
+
+@pytest.fixture
+def builder():
+    return ForecastBuilder()
+
+
+def merge(builder, seeing=None, transparency=None, cloud=None, weather=None, air_quality=None):
+    empty = cmc()
+    return builder._merge_columns(
+        START, empty if seeing is None else seeing, empty if transparency is None else transparency,
+        empty if cloud is None else cloud, weather or openmeteo(),
+        air_quality or {"available": True, "hourly": {"pm2_5": [float(i) for i in range(MAX_INPUT_HOURS)]}}
+    )
+
+
+def test_columns_start_at_the_forecast_start(builder):
+    columns = merge(builder)
+    assert columns.complete
+    assert columns.hours.tolist() == list(range(FORECAST_HOURS))
+    hourly = openmeteo()["hourly"]
+    # Hour h is Open-Meteo index h + LEAD in every column
+    assert columns.ecmwf_cloud_pct.tolist() == hourly["cloud_cover"][LEAD:LEAD + FORECAST_HOURS]
+    assert columns.wind_direction.tolist() == hourly["wind_direction_10m"][LEAD:LEAD + FORECAST_HOURS]
+    assert columns.smoke_ugm3[:3].tolist() == [LEAD, LEAD + 1, LEAD + 2]
+    assert columns.temperature_f[0] == pytest.approx(hourly["temperature_2m"][LEAD] * 9 / 5 + 32)
+    assert columns.wind_speed_mph[0] == pytest.approx(10 * 0.621371)
+
+
+def test_cmc_values_replace_estimates_at_their_hour(builder):
+    columns = merge(builder, seeing=cmc({4: 1.2}), transparency=cmc({4: 4.5}),
+                    cloud=cmc({4: 20.0, 5: 95.0}))
+    assert columns.cloud_cover_pct[1] == 20.0  # Open-Meteo index 4
+    assert columns.cloud_cover_pct[0] == columns.ecmwf_cloud_pct[0]
+    assert columns.cloud_cover_category[1] == classification.categorize_cloud(np.array([20.0]))[0]
+    assert columns.seeing[1] == classification.convert_seeing(np.array([1.2]))[0]
+    assert columns.transparency[1] == classification.convert_transparency(np.array([4.5]), np.array([20.0]))[0]
+    # Elsewhere seeing is estimated from wind
+    assert columns.seeing[0] == classification.estimate_seeing(columns.cloud_cover_pct[:1], columns.wind_speed_mph[:1])[0]
+    # Overcast hours have no seeing or transparency
+    assert columns.seeing[2] == columns.transparency[2] == 0
+
+
+def test_columns_are_read_only(builder):
+    columns = merge(builder)
+    with pytest.raises(ValueError):
+        columns.cloud_cover_pct[0] = 1.0
+    point = columns.for_point(-5)
+    point.darkness[0] = 21.0  # Per-point columns are fresh
+    assert point.cloud_cover_pct is columns.cloud_cover_pct
+
+
+def test_short_and_missing_series(builder):
+    weather = openmeteo(n=LEAD + 10)
+    del weather["hourly"]["temperature_2m"]
+    columns = merge(builder, weather=weather, air_quality={"available": False})
+    assert len(columns) == 10
+    assert np.isnan(columns.temperature_f).all()
+    assert np.isnan(columns.smoke_ugm3).all()
+
+    columns = merge(builder, weather={"available": False})
+    assert not columns.complete
+    assert len(columns) == FORECAST_HOURS
+    assert (columns.seeing == -1).all() and np.isnan(columns.cloud_cover_pct).all()
+
+
+def test_response_materializes_the_columns(builder):
+    columns = merge(builder, cloud=cmc({4: 20.0})).for_point(-4)
+    response = builder.to_response(columns, START)
+    hours = [hour for day in response.days for hour in day.hours]
+    assert len(hours) == response.forecast_hours == FORECAST_HOURS
+    assert hours[1].time == START + timedelta(hours=1)
+    assert hours[1].hour_local == (START.hour + 1 - 4) % 24
+    assert hours[1].cloud_cover_pct == 20.0
+    assert hours[0].darkness is None  # NaN becomes null
+    # Local days: the first one ends at local midnight
+    assert [hour.hour_local for hour in response.days[0].hours][-1] == 23
@@ -0,0 +1,203 @@
+"""
+HotSet (count-min estimates, decay, top-K membership, persistence) and
+snapshot hits counted from the web server's access log
+"""
+
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import hotset
+from app.services.hotset import AccessLogTail, HotSet, cell_key, hot_set, location_key
+from app.services.scheduler import count_snapshot_hits
+from conftest import LOCATIONS
+
+HALF_LIFE_HOURS = 10
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(hotset, "time", SimpleNamespace(time=clock.time))
+    return clock
+
+
+def make(clock, width=4096, top_k=100, persist_path=None) -> HotSet:
+    return HotSet(width=width, depth=4, top_k=top_k, half_life_hours=HALF_LIFE_HOURS,
+                  persist_path=persist_path)
+
+
+def test_estimates_never_undercount(clock):
+    hs = make(clock, width=16)
+    counts = {f"loc:key{i}": i % 7 + 1 for i in range(200)}
+    for key, n in counts.items():
+        for _ in range(n):
+            hs.record(key)
+    for key, n in counts.items():
+        assert hs.score(key) >= n - 1e-9
+
+
+def test_lone_key_is_exact(clock):
+    hs = make(clock)
+    hs.record("loc:a", 3)
+    hs.record("loc:a")
+    assert hs.score("loc:a") == pytest.approx(4)
+    assert hs.score("loc:unseen") == 0
+    assert hs.score(None) == 0
+
+
+def test_counts_halve_every_half_life(clock):
+    hs = make(clock)
+    hs.record("loc:a", 8)
+    clock.now += HALF_LIFE_HOURS * 3600
+    assert hs.score("loc:a") == pytest.approx(4)
+    hs.record("loc:a", 4)
+    clock.now += 2 * HALF_LIFE_HOURS * 3600
+    assert hs.score("loc:a") == pytest.approx(2)
+    assert hs.top() == [("loc:a", pytest.approx(2))]
+
+
+def test_rescale_keeps_estimates(clock, monkeypatch):
+    monkeypatch.setattr(hotset, "MAX_WEIGHT", 4.0)
+    hs = make(clock)
+    hs.record("loc:a", 8)
+    clock.now += 3 * HALF_LIFE_HOURS * 3600
+    hs.record("loc:b", 1)  # weight 8 > MAX_WEIGHT: moves the epoch
+    assert hs.score("loc:a") == pytest.approx(1)
+    assert hs.score("loc:b") == pytest.approx(1)
+
+
+def test_scores_match_score(clock):
+    hs = make(clock, width=64)
+    keys = [f"cell:{i}_0" for i in range(50)]
+    for i, key in enumerate(keys):
+        hs.record(key, i)
+    assert list(hs.scores(keys)) == pytest.approx([hs.score(key) for key in keys])
+    assert len(hs.scores([])) == 0
+
+
+def test_top_k_keeps_the_hottest(clock):
+    hs = make(clock, top_k=3)
+    for key, n in [("loc:a", 5), ("loc:b", 1), ("loc:c", 3)]:
+        hs.record(key, n)
+    hs.record("loc:d", 0.5)  # colder than everything tracked
+    assert [key for key, _ in hs.top()] == ["loc:a", "loc:c", "loc:b"]
+
+    hs.record("loc:d", 4)
+    assert [key for key, _ in hs.top()] == ["loc:a", "loc:d", "loc:c"]
+    assert [key for key, _ in hs.top(1)] == ["loc:a"]
+    assert hs.top(prefix="cell:") == []
+
+
+def test_recent_hits_overtake_old_ones(clock):
+    hs = make(clock, top_k=1)
+    hs.record("loc:old", 10)
+    clock.now += 4 * HALF_LIFE_HOURS * 3600
+    hs.record("loc:new", 1)
+    assert [key for key, _ in hs.top()] == ["loc:new"]
+
+
+def test_save_and_load(clock, tmp_path):
+    path = tmp_path / "hotset.json"
+    hs = make(clock, persist_path=path)
+    hs.record("loc:a", 8)
+    hs.record("cell:45.0_-78.0", 2)
+    assert hs.save_due() is False
+    hs.save()
+    assert path.exists() and not path.with_suffix(".tmp").exists()
+
+    clock.now += HALF_LIFE_HOURS * 3600
+    loaded = make(clock, persist_path=path)
+    assert loaded.score("loc:a") == pytest.approx(4)
+    assert loaded.top() == [("loc:a", pytest.approx(4)), ("cell:45.0_-78.0", pytest.approx(1))]
+
+
+def test_load_ignores_other_dimensions_and_bad_files(clock, tmp_path):
+    path = tmp_path / "hotset.json"
+    hs = make(clock, persist_path=path)
+    hs.record("loc:a", 8)
+    hs.save()
+    assert make(clock, width=1024, persist_path=path).score("loc:a") == 0
+
+    path.write_text("{not json")
+    assert make(clock, persist_path=path).top() == []
+
+
+def log_line(path: str, status: int = 200) -> str:
+    return (f'203.0.113.7 - - [19/Oct/2026:02:00:00 +0000] "GET {path} HTTP/1.1" '
+            f'{status} 512 "-" "Mozilla/5.0"\n')
+
+
+def append(path, text: str):
+    with open(path, "a") as f:
+        f.write(text)
+
+
+def test_access_log_counts_new_snapshot_requests(tmp_path):
+    log = tmp_path / "snapshots.log"
+    append(log, log_line("/api/forecast/AlgonquinON"))
+    tail = AccessLogTail(log)
+    assert tail.read() == {}  # lines from before the first read are skipped
+
+    append(log, log_line("/api/forecast/AlgonquinON") * 2 + log_line("/api/forecast/TorontoON")
+           + log_line("/index.html"))
+    assert tail.read() == {"AlgonquinON": 2, "TorontoON": 1}
+    assert tail.read() == {}
+
+
+def test_access_log_waits_for_complete_lines(tmp_path):
+    log = tmp_path / "snapshots.log"
+    log.touch()
+    tail = AccessLogTail(log)
+    tail.read()
+
+    line = log_line("/api/forecast/KittPeakAZ")
+    append(log, line[:20])
+    assert tail.read() == {}
+    append(log, line[20:])
+    assert tail.read() == {"KittPeakAZ": 1}
+
+
+def test_access_log_follows_rotation(tmp_path):
+    log = tmp_path / "snapshots.log"
+    log.touch()
+    tail = AccessLogTail(log)
+    tail.read()
+    append(log, log_line("/api/forecast/TorontoON") * 3)
+    assert tail.read() == {"TorontoON": 3}
+
+    os.rename(log, tmp_path / "snapshots.log.1")
+    append(log, log_line("/api/forecast/BancroftON"))
+    assert tail.read() == {"BancroftON": 1}
+
+    log.write_text(log_line("/api/forecast/MontMegQC"))  # copytruncate
+    assert tail.read() == {"MontMegQC": 1}
+
+    log.unlink()
+    assert tail.read() == {}
+
+
+def test_snapshot_hits_count_toward_locations_and_cells(client, tmp_path):
+    key, _, lat, lon = LOCATIONS[0][:4]
+    log = tmp_path / "snapshots.log"
+    log.touch()
+    tail = AccessLogTail(log)
+    tail.read()
+    before = hot_set.score(location_key(key)), hot_set.score(cell_key(lat, lon))
+    unknown = hot_set.score(location_key("NoSuchPlace"))
+
+    append(log, log_line(f"/api/forecast/{key}") * 5 + log_line("/api/forecast/NoSuchPlace"))
+    client.portal.call(count_snapshot_hits, tail)
+
+    assert hot_set.score(location_key(key)) == pytest.approx(before[0] + 5, rel=1e-3)
+    assert hot_set.score(cell_key(lat, lon)) == pytest.approx(before[1] + 5, rel=1e-3)
+    assert hot_set.score(location_key("NoSuchPlace")) == unknown
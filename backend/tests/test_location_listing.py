@@ -0,0 +1,140 @@
+"""
+Location listing: keyset pages of the catalog, cursors, and the export
+"""
+
+import json
+
+import pytest
+
+from app.routers.locations import EXPORT_FIELDS, decode_cursor, encode_cursor
+from app.services.catalog import Catalog
+from conftest import location_rows
+
+LISTING = [
+    "NassauBS",
+    "AlgonquinON", "BancroftON", "TorontoON", "MontMegQC",
+    "FlagstaffAZ", "KittPeakAZ", "BigBendTX", "McDonaldTX",
+]
+
+
+@pytest.fixture(scope="module")
+def catalog():
+    return Catalog(location_rows(), revision=1)
+
+
+def keys(locations):
+    return [loc.key for loc in locations]
+
+
+def walk(catalog, limit, **filters):
+    """Every page of a listing, following keyset cursors"""
+    pages, after = [], None
+    while True:
+        page, more = catalog.page(after=after, limit=limit, **filters)
+        pages.append(keys(page))
+        if not more:
+            return pages
+        after = page[-1].listing_key
+
+
+def test_listing_order(catalog):
+    assert keys(catalog.listing) == LISTING
+    assert catalog.page() == (list(catalog.listing), False)
+
+
+@pytest.mark.parametrize("limit", [1, 2, 4, 9])
+def test_cursor_pages_cover_the_listing_once(catalog, limit):
+    pages = walk(catalog, limit)
+    assert [key for page in pages for key in page] == LISTING
+    assert all(len(page) == limit for page in pages[:-1])
+    assert pages[-1]
+
+
+@pytest.mark.parametrize("filters, expected", [
+    ({"country": "Canada"}, ["AlgonquinON", "BancroftON", "TorontoON", "MontMegQC"]),
+    ({"country": "Canada", "region": "Ontario"}, ["AlgonquinON", "BancroftON", "TorontoON"]),
+    ({"country": "Canada", "region": "Ont"}, []),
+    ({"region": "Texas"}, ["BigBendTX", "McDonaldTX"]),
+    ({"category": "observatory"}, ["BancroftON", "MontMegQC", "KittPeakAZ", "McDonaldTX"]),
+    ({"country": "USA", "category": "park"}, ["BigBendTX"]),
+    ({"country": "Atlantis"}, []),
+])
+def test_filtered_cursor_pages(catalog, filters, expected):
+    assert [key for page in walk(catalog, 2, **filters) for key in page] == expected
+
+
+def test_cursor_past_a_removed_location(catalog):
+    # The cursor's location need not exist any more: paging resumes after its position
+    toronto = catalog.get("TorontoON").listing_key
+    shrunk = Catalog([row for row in location_rows() if row.key != "TorontoON"], revision=2)
+    page, _ = shrunk.page(after=toronto, limit=1)
+    assert keys(page) == ["MontMegQC"]
+
+
+def test_offset_pages(catalog):
+    assert keys(catalog.page(skip=7, limit=5)[0]) == LISTING[7:]
+    assert catalog.page(skip=2, limit=2) == (list(catalog.listing[2:4]), True)
+    assert catalog.page(skip=20) == ([], False)
+
+
+def test_cursor_round_trip(catalog):
+    key = catalog.get("NassauBS").listing_key
+    assert decode_cursor(encode_cursor(key)) == key
+
+
+def test_list_endpoint_follows_next_cursor(client):
+    seen, url = [], "/api/locations/?limit=4"
+    while True:
+        response = client.get(url)
+        assert response.status_code == 200
+        seen += [loc["key"] for loc in response.json()]
+        cursor = response.headers.get("x-next-cursor")
+        if cursor is None:
+            assert "link" not in response.headers
+            break
+        assert response.headers["link"].endswith('>; rel="next"')
+        assert f"cursor={cursor}" in response.headers["link"]
+        url = f"/api/locations/?limit=4&cursor={cursor}"
+    assert seen == LISTING
+
+
+def test_list_endpoint_filters(client):
+    response = client.get("/api/locations/?country=USA&region=Arizona")
+    assert [loc["key"] for loc in response.json()] == ["FlagstaffAZ", "KittPeakAZ"]
+    assert set(response.json()[0]) == set(EXPORT_FIELDS)
+
+
+@pytest.mark.parametrize("cursor", ["garbage!", "bm90IGpzb24", encode_cursor(("USA", "Texas", "Big Bend", "7"))])
+def test_invalid_cursor(client, cursor):
+    response = client.get(f"/api/locations/?cursor={cursor}")
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+def test_invalid_limits(client):
+    assert client.get("/api/locations/?limit=0").status_code == 422
+    assert client.get("/api/locations/?skip=-1").status_code == 422
+
+
+def test_export_ndjson(client):
+    response = client.get("/api/locations/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["key"] for row in rows] == LISTING
+    assert all(tuple(row) == EXPORT_FIELDS for row in rows)
+
+    etag = response.headers["etag"]
+    assert client.get("/api/locations/export", headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_export_columnar(client):
+    response = client.get("/api/locations/export?format=columnar")
+    body = response.json()
+    assert body["count"] == len(LISTING)
+    assert body["fields"] == list(EXPORT_FIELDS)
+    assert body["columns"]["key"] == LISTING
+    assert {len(column) for column in body["columns"].values()} == {len(LISTING)}
+    # Each format has its own validator
+    assert response.headers["etag"] != client.get("/api/locations/export").headers["etag"]
+    assert client.get("/api/locations/export?format=csv").status_code == 422
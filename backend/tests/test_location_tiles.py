@@ -0,0 +1,100 @@
+"""
+GeoJSON location tiles: projection, clustering and the tile endpoint
+"""
+
+import math
+
+import numpy as np
+import pytest
+
+from app.config import settings
+from app.services.catalog import Catalog
+from app.services.classification import MISSING
+from app.services.location_tiles import TileLayer, mercator
+from app.services.tonight import TonightScores
+from conftest import LOCATIONS, location_rows
+
+
+@pytest.fixture(scope="module")
+def layer():
+    tonight = TonightScores("run-1", {
+        "McDonaldTX": (6, 4, 3),
+        "KittPeakAZ": (6, 2, 4),
+        "BancroftON": (2, 1, 1),
+    })
+    return TileLayer(Catalog(location_rows(), revision=1), tonight)
+
+
+def tile_of(lat: float, lon: float, z: int):
+    x, y = mercator(np.array([lat]), np.array([lon]))
+    return z, int(x[0] * (1 << z)), int(y[0] * (1 << z))
+
+
+def test_mercator():
+    x, y = mercator(np.array([0.0, 90.0, -90.0, 45.0]), np.array([0.0, -180.0, 180.0, 90.0]))
+    assert x.tolist() == pytest.approx([0.5, 0.0, 0.0, 0.75])
+    assert y[0] == pytest.approx(0.5)
+    # Poles are clipped to the edge of the map, which stays within [0, 1)
+    assert y[1] == pytest.approx(0.0, abs=1e-9)
+    assert 0.999 < y[2] < 1.0
+    assert y[3] == pytest.approx(0.5 - math.log(math.tan(math.pi / 8 + math.pi / 4)) / (2 * math.pi))
+
+
+def test_low_zoom_tiles_are_clustered(layer):
+    features = layer.tile(0, 0, 0)["features"]
+    clusters = [f["properties"] for f in features if f["properties"].get("cluster")]
+    points = [f["properties"] for f in features if not f["properties"].get("cluster")]
+
+    assert sum(c["point_count"] for c in clusters) + len(points) == len(LOCATIONS)
+    assert sorted(c["point_count"] for c in clusters) == [4, 4]
+    assert [p["key"] for p in points] == ["NassauBS"]
+
+    # A cluster shows its best member: most clear dark hours, then best seeing
+    usa = next(c for c in clusters if c["best_key"] in ("McDonaldTX", "KittPeakAZ"))
+    assert usa["best_key"] == "McDonaldTX"
+    assert usa["clear_dark_hours"] == 6
+    assert usa["best_seeing"] is not None
+
+
+def test_cluster_sits_at_its_members_mean(layer):
+    canada = next(f for f in layer.tile(0, 0, 0)["features"] if f["properties"].get("best_key") == "BancroftON")
+    members = [loc for loc in LOCATIONS if loc[4] == "Canada"]
+    lon, lat = canada["geometry"]["coordinates"]
+    assert lat == pytest.approx(sum(loc[2] for loc in members) / len(members), abs=1e-4)
+    assert lon == pytest.approx(sum(loc[3] for loc in members) / len(members), abs=1e-4)
+
+
+def test_high_zoom_tiles_hold_points(layer):
+    z = settings.LOCATION_TILE_CLUSTER_MAX_ZOOM + 1
+    features = layer.tile(*tile_of(31.96, -111.60, z))["features"]
+    assert [f["properties"]["key"] for f in features] == ["KittPeakAZ"]
+    assert features[0]["geometry"]["coordinates"] == [-111.6, 31.96]
+    assert features[0]["properties"]["clear_dark_hours"] == 6
+
+    # Locations without a score are labelled as unknown
+    nassau = layer.tile(*tile_of(25.05, -77.35, z))["features"][0]["properties"]
+    assert (nassau["clear_dark_hours"], nassau["best_seeing"], nassau["best_transparency"]) == (0, None, None)
+    assert TonightScores.labels((0, MISSING, MISSING))["best_seeing"] is None
+
+
+def test_empty_tile(layer):
+    assert layer.tile(*tile_of(-45.0, 100.0, 3)) == {"type": "FeatureCollection", "features": []}
+
+
+def test_tile_endpoint(client):
+    response = client.get("/api/locations/tiles/0/0/0")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/geo+json"
+    assert response.json()["type"] == "FeatureCollection"
+    assert "max-age=" in response.headers["cache-control"]
+    etag = response.headers["etag"]
+    assert client.get("/api/locations/tiles/0/0/0", headers={"If-None-Match": etag}).status_code == 304
+
+    z, x, y = tile_of(45.06, -77.86, 12)
+    keys = [f["properties"]["key"] for f in client.get(f"/api/locations/tiles/{z}/{x}/{y}").json()["features"]]
+    assert keys == ["BancroftON"]
+
+
+@pytest.mark.parametrize("path", ["19/0/0", "1/2/0", "1/0/2", "2/-1/0", "-1/0/0"])
+def test_tiles_outside_the_map(client, path):
+    assert client.get(f"/api/locations/tiles/{path}").status_code == 404
@@ -0,0 +1,145 @@
+"""
+Forecast snapshots: served only while their start hour and upstream slot
+hold, and a new run taking over location by location as it is written
+"""
+
+import os
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.config import settings
+from app.services import precompute
+from app.services.catalog import location_catalog
+from app.services.forecast_builder import forecast_builder
+from app.services.precompute import snapshot_store
+from app.services.response_cache import forecast_cache
+from app.services.run_data import run_data
+from conftest import SYNTHETIC_HOURS, synthetic_run
+
+
+@pytest.fixture
+def snapshot(client, monkeypatch):
+    """A snapshot of the seeded catalog, unpublished again afterwards; records load() calls"""
+    manifest = client.portal.call(snapshot_store.build, True)
+    assert manifest is not None
+    loads = []
+    load = snapshot_store.load
+    monkeypatch.setattr(snapshot_store, "load", lambda key, data: loads.append(key) or load(key, data))
+    forecast_cache.clear()
+    yield loads
+    snapshot_store.current_link.unlink()
+    forecast_cache.clear()
+
+
+def test_current_snapshot_is_served_with_its_recorded_version(client, snapshot):
+    data = run_data.current()
+    assert snapshot_store.snapshot_version("KittPeakAZ", data) == forecast_builder.data_version(data)
+
+    response = client.get("/api/forecast/KittPeakAZ")
+    assert response.status_code == 200
+    assert snapshot == ["KittPeakAZ"]
+    assert response.json()["location"]["key"] == "KittPeakAZ"
+    # Nothing to rebuild while it is current
+    assert client.portal.call(snapshot_store.build) is None
+
+
+def test_snapshot_from_an_earlier_hour_is_not_served(client, snapshot, monkeypatch):
+    manifest = snapshot_store.current_manifest()
+    earlier = datetime.fromisoformat(manifest["start_time"]) - timedelta(hours=1)
+    monkeypatch.setitem(manifest, "start_time", earlier.isoformat())
+    data = run_data.current()
+    assert snapshot_store.snapshot_version("KittPeakAZ", data) != forecast_builder.data_version(data)
+
+    response = client.get("/api/forecast/KittPeakAZ")
+    assert response.status_code == 200
+    assert snapshot == []
+    # The hourly refresh rebuilds it
+    assert client.portal.call(snapshot_store.build) is not None
+
+
+def test_snapshot_from_another_upstream_slot_is_not_served(client, snapshot, monkeypatch):
+    manifest = snapshot_store.current_manifest()
+    earlier = datetime.fromisoformat(manifest["upstream_slot"]) - timedelta(hours=6)
+    monkeypatch.setitem(manifest, "upstream_slot", earlier.isoformat())
+
+    client.get("/api/forecast/KittPeakAZ")
+    assert snapshot == []
+
+
+def test_build_without_upstream_keeps_the_published_snapshot(client, snapshot, upstream_down):
+    published = os.readlink(snapshot_store.current_link)
+    runs = sorted(snapshot_store.runs_dir.iterdir())
+
+    assert client.portal.call(snapshot_store.build, True) is None
+    assert os.readlink(snapshot_store.current_link) == published
+    # Nothing pruned, no partial directory left behind
+    assert sorted(snapshot_store.runs_dir.iterdir()) == runs
+    assert snapshot_store.load_stale("KittPeakAZ") is not None
+
+
+def test_build_file_work_runs_on_the_io_workers(client, snapshot, monkeypatch):
+    threads = {}
+
+    def recorded(name):
+        step = getattr(snapshot_store, name)
+
+        def run(*args):
+            threads[name] = threading.current_thread().name
+            return step(*args)
+        return run
+
+    for name in ("_prepare", "_finish", "_publish", "_prune"):
+        monkeypatch.setattr(snapshot_store, name, recorded(name))
+
+    assert client.portal.call(snapshot_store.build, True) is not None
+    assert sorted(threads) == ["_finish", "_prepare", "_prune", "_publish"]
+    assert all(thread.startswith("io") for thread in threads.values())
+
+
+def test_hourly_rebuild_reuses_the_upstream_slot(client, snapshot, upstream):
+    # A new start hour misses the cell cache, but not the Open-Meteo cache
+    requests = len(upstream.requests)
+    forecast_builder.cell_cache.clear()
+    assert client.portal.call(snapshot_store.build, True) is not None
+    assert len(upstream.requests) == requests
+
+
+def test_rollover_switches_locations_once_written(client, snapshot, monkeypatch):
+    monkeypatch.setattr(run_data, "_current", run_data._current)
+    monkeypatch.setattr(run_data, "_versions", run_data._versions)
+    monkeypatch.setattr(settings, "SNAPSHOT_ENABLED", True)
+    monkeypatch.setattr(settings, "SNAPSHOT_CHUNK_SIZE", 3)
+    old, new = synthetic_run(), synthetic_run(n_files=3 * SYNTHETIC_HOURS - 1)
+    run_data.publish(old)
+    assert client.portal.call(snapshot_store.build, True) is not None
+    run_data.publish(new)
+    keys = [loc.key for loc in location_catalog.current.locations]
+    assert {snapshot_store.run_for(key) for key in keys} == {old}
+
+    # Before each chunk is written: the locations ready so far and what they are served
+    observed = []
+    cpu_executor = precompute.cpu_executor
+
+    class Observing:
+        async def run(self, fn, *args):
+            rollover = snapshot_store._rollover
+            if rollover is not None:
+                ready = set(rollover["ready"])
+                served = {key: snapshot_store.run_for(key) for key in keys}
+                loaded = {key for key in ready if snapshot_store.load(key, new) is not None}
+                observed.append((ready, served, loaded))
+            return await cpu_executor.run(fn, *args)
+
+    monkeypatch.setattr(precompute, "cpu_executor", Observing())
+    assert client.portal.call(snapshot_store.build, True) is not None
+
+    assert [len(ready) for ready, _, _ in observed] == list(range(0, len(keys), 3))
+    for ready, served, loaded in observed:
+        assert {key for key, data in served.items() if data is new} == ready
+        assert all(served[key] is old for key in keys if key not in ready)
+        assert loaded == ready
+    # Published: everything is on the new run
+    assert snapshot_store._rollover is None
+    assert {snapshot_store.run_for(key) for key in keys} == {new}
@@ -0,0 +1,44 @@
+"""
+Every query in app/queries.py must use an index on locations, apart from
+the scans PLAN_CHECKS explicitly allows
+"""
+
+import pytest
+from sqlalchemy import select
+
+from app import migrations, queries
+from app.database import LocationDB, engine
+
+
+def test_no_unexpected_full_scans():
+    migrations.upgrade(engine)
+    unexpected = [(name, plan) for name, plan, allowed in migrations.check_query_plans(engine) if not allowed]
+    assert unexpected == []
+
+
+def test_allowed_scans():
+    allowed = [name for name, _, reason in queries.PLAN_CHECKS if reason]
+    assert allowed == ["all active", "country counts", "region counts"]
+
+
+@pytest.mark.parametrize("statement, index", [
+    (queries.country_counts(), "ix_locations_active_country_region"),
+    (queries.region_counts(), "ix_locations_active_country_region"),
+    (queries.category_counts(), "ix_locations_active_category"),
+])
+def test_facet_counts_use_the_partial_indexes(statement, index):
+    # Migration 2's indexes hold only active rows, in GROUP BY order
+    migrations.upgrade(engine)
+    with engine.connect() as conn:
+        plan = migrations.query_plan(conn, statement)
+    assert len(plan) == 1  # No temporary B-tree for the GROUP BY
+    assert index in plan[0]
+
+
+def test_scan_of_locations_is_reported(monkeypatch):
+    # Substring matches can't use an index, so the check must flag this
+    unindexed = select(LocationDB).where(LocationDB.name.contains("Park"))
+    monkeypatch.setattr(queries, "PLAN_CHECKS", [("name contains", unindexed, None)])
+    scans = migrations.check_query_plans(engine)
+    assert [(name, allowed) for name, _, allowed in scans] == [("name contains", None)]
+    assert "SCAN locations" in scans[0][1]
@@ -0,0 +1,177 @@
+"""
+Raster map tiles: PNG encoding, resampling and the tile endpoints
+
+Tiles are rendered from a small synthetic polar stereographic run (the
+shape of the CMC grid, at a coarser spacing) published for these tests.
+"""
+
+import struct
+import zlib
+
+import numpy as np
+import pytest
+
+from app.config import settings
+from app.services.classification import SCALES, convert_seeing
+from app.services.raster_tiles import (
+    PNG_SIGNATURE, TILE_SIZE, RasterTileStore, encode_png, pixel_axes, render_tile, resampling_index
+)
+from app.services.run_data import run_data
+from conftest import SYNTHETIC_HOURS as HOURS, synthetic_run
+
+def decode_png(body: bytes):
+    """((width, height), palette, alpha, pixels) of an 8-bit indexed PNG, checking every CRC"""
+    assert body.startswith(PNG_SIGNATURE)
+    chunks, pos = {}, len(PNG_SIGNATURE)
+    while pos < len(body):
+        length, kind = struct.unpack(">I4s", body[pos:pos + 8])
+        data = body[pos + 8:pos + 8 + length]
+        assert struct.unpack(">I", body[pos + 8 + length:pos + 12 + length])[0] == zlib.crc32(kind + data)
+        chunks[kind] = chunks.get(kind, b"") + data
+        pos += 12 + length
+    assert b"IEND" in chunks
+
+    width, height, depth, color_type, compression, filtering, interlace = struct.unpack(">IIBBBBB", chunks[b"IHDR"])
+    assert (depth, color_type, compression, filtering, interlace) == (8, 3, 0, 0, 0)
+    raw = np.frombuffer(zlib.decompress(chunks[b"IDAT"]), dtype=np.uint8).reshape(height, width + 1)
+    assert (raw[:, 0] == 0).all()  # Filter type "none" on every scanline
+    palette = np.frombuffer(chunks[b"PLTE"], dtype=np.uint8).reshape(-1, 3)
+    alpha = np.frombuffer(chunks[b"tRNS"], dtype=np.uint8)
+    return (width, height), palette, alpha, raw[:, 1:]
+
+
+@pytest.fixture(scope="module")
+def run():
+    return synthetic_run()
+
+
+@pytest.fixture
+def published(run, monkeypatch):
+    """The synthetic run as the current one, for one test"""
+    monkeypatch.setattr(run_data, "_current", run_data._current)
+    monkeypatch.setattr(run_data, "_versions", run_data._versions)
+    run_data.publish(run)
+    return run
+
+
+# Tile over southern Canada at zoom 3, well inside the grid
+INSIDE = (3, 2, 2)
+# Tile over Australia, outside the grid
+OUTSIDE = (2, 3, 2)
+
+
+def test_encode_png_round_trip():
+    pixels = np.array([[0, 1, 2], [2, 1, 0]], dtype=np.uint8)
+    palette = np.array([[255, 0, 0], [0, 255, 0], [0, 0, 0]], dtype=np.uint8)
+    alpha = np.array([255, 255, 0], dtype=np.uint8)
+    size, decoded_palette, decoded_alpha, decoded = decode_png(encode_png(pixels, palette, alpha))
+    assert size == (3, 2)
+    assert (decoded_palette == palette).all()
+    assert (decoded_alpha == alpha).all()
+    assert (decoded == pixels).all()
+
+
+def test_pixel_axes():
+    lats, lons = pixel_axes(1)
+    assert len(lats) == len(lons) == 2 * TILE_SIZE
+    assert lons[0] == pytest.approx(-180 + 360 / (4 * TILE_SIZE))
+    assert lats[0] == pytest.approx(-lats[-1])
+    assert (np.diff(lats) < 0).all()  # Rows run north to south
+
+
+def test_rendered_tile_size_and_palette(run):
+    size, palette, alpha, pixels = decode_png(render_tile(run, "seeing", 1, *INSIDE))
+    scale = SCALES["seeing"]
+    assert size == (TILE_SIZE, TILE_SIZE)
+    # The scale's colors, then one fully transparent entry
+    assert len(palette) == len(scale.rgb) + 1
+    assert (palette[:-1] == scale.rgb).all()
+    assert alpha[:-1].tolist() == [255] * len(scale.rgb)
+    assert alpha[-1] == 0
+    assert pixels.max() <= len(scale.rgb)
+
+
+def test_pixels_take_the_color_of_their_model_cell(run):
+    _, _, _, pixels = decode_png(render_tile(run, "seeing", 2, *INSIDE))
+    transparent = len(SCALES["seeing"].rgb)
+    z, x, y = INSIDE
+    index = resampling_index(run.fields["seeing"].geometry).tile(z, x, y).reshape(TILE_SIZE, TILE_SIZE)
+    assert (index >= 0).any() and ((pixels == transparent) == (index < 0)).all()
+
+    lats, lons = pixel_axes(z)
+    cube = run.fields["seeing"].cube
+    for row, col in [(10, 20), (128, 128), (250, 3)]:
+        if index[row, col] < 0:
+            continue
+        lat, lon = lats[y * TILE_SIZE + row], lons[x * TILE_SIZE + col]
+        cell_row, cell_col = run.fields["seeing"].geometry.locate(lat, lon)
+        expected = SCALES["seeing"].color_index(convert_seeing(cube[1, cell_row, cell_col]))
+        assert pixels[row, col] == expected
+
+
+@pytest.mark.parametrize("variable, hour, tile", [
+    ("cloud_cover", HOURS, INSIDE),  # No data for that hour
+    ("seeing", 1, OUTSIDE),
+])
+def test_tiles_without_data_are_transparent(run, variable, hour, tile):
+    _, palette, _, pixels = decode_png(render_tile(run, variable, hour, *tile))
+    assert (pixels == len(palette) - 1).all()
+
+
+def test_hours_with_data(run):
+    hours = RasterTileStore().hours(run)
+    assert hours["cloud_cover"] == list(range(1, HOURS))
+    assert hours["seeing"] == list(range(1, HOURS + 1))
+
+
+def test_tile_index(client, published):
+    response = client.get("/api/forecast/tiles")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["version"] == published.version
+    assert body["max_zoom"] == settings.MAP_TILE_MAX_ZOOM
+    assert body["variables"]["cloud_cover"] == {"scale": "cloud_cover", "hours": list(range(1, HOURS))}
+    assert body["url"] == f"/api/forecast/tiles/{published.version}/{{variable}}/{{hour}}/{{z}}/{{x}}/{{y}}.png"
+    assert client.get("/api/forecast/tiles", headers={"If-None-Match": response.headers["etag"]}).status_code == 304
+
+
+def test_tile_endpoint(client, published):
+    url = f"/api/forecast/tiles/{published.version}/transparency/3/{INSIDE[0]}/{INSIDE[1]}/{INSIDE[2]}.png"
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/png"
+    assert "immutable" in response.headers["cache-control"]
+    size, palette, _, _ = decode_png(response.content)
+    assert size == (TILE_SIZE, TILE_SIZE)
+    assert len(palette) == len(SCALES["transparency"].rgb) + 1
+
+    # Served again from disk, byte for byte
+    assert client.get(url).content == response.content
+    assert client.get(url, headers={"If-None-Match": response.headers["etag"]}).status_code == 304
+
+
+@pytest.mark.parametrize("path", [
+    "1999010100.1/seeing/1/0/0/0",
+    "{version}/wind/1/0/0/0",
+    "{version}/seeing/0/0/0/0",
+    f"{{version}}/seeing/{HOURS + 1}/0/0/0",
+    f"{{version}}/seeing/1/{settings.MAP_TILE_MAX_ZOOM + 1}/0/0",
+    "{version}/seeing/1/1/2/0",
+    "{version}/seeing/1/1/0/-1",
+])
+def test_missing_tiles(client, published, path):
+    assert client.get(f"/api/forecast/tiles/{path.format(version=published.version)}.png").status_code == 404
+
+
+def test_tiles_on_disk_are_bounded(client, published, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "MAP_TILE_DIR", str(tmp_path))
+    store = RasterTileStore()
+    body_size = len(render_tile(published, "seeing", 1, 5, 8, 11))
+    monkeypatch.setattr(settings, "MAP_TILE_CACHE_MAX_BYTES", 3 * body_size)
+
+    paths = [client.portal.call(store.get, published, "seeing", 1, 5, x, 11) for x in range(8, 14)]
+    on_disk = sorted(tmp_path.rglob("*.png"))
+    assert store.stats()["bytes"] <= settings.MAP_TILE_CACHE_MAX_BYTES
+    assert len(on_disk) == store.stats()["tiles"] < len(paths)
+    # Least recently used go first
+    assert paths[-1] in on_disk and paths[0] not in on_disk
@@ -0,0 +1,130 @@
+"""
+Pre-encoded responses: content negotiation, ETags and conditional requests
+"""
+
+import gzip
+from datetime import datetime, timezone
+
+import pytest
+from starlette.requests import Request
+
+from app.models import ForecastResponse
+from app.routers import forecast
+from app.services.response_cache import (
+    EncodedResponse, brotli, cache_headers, forecast_cache, is_not_modified, make_etag
+)
+
+BODY = b'{"hourly":[' + b",".join(b'{"hour":%d,"seeing":3}' % i for i in range(200)) + b"]}"
+ETAG = make_etag("json", "AlgonquinON", "2026101900.48")
+
+
+def request(**headers) -> Request:
+    return Request({
+        "type": "http",
+        "headers": [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()],
+    })
+
+
+def test_make_etag_is_quoted_and_depends_on_every_part():
+    assert ETAG.startswith('"') and ETAG.endswith('"')
+    assert ETAG == make_etag("json", "AlgonquinON", "2026101900.48")
+    assert ETAG != make_etag("columnar", "AlgonquinON", "2026101900.48")
+
+
+@pytest.mark.parametrize("accept_encoding, coding", [
+    ("", None),
+    ("gzip", "gzip"),
+    ("gzip, br", "br" if brotli else "gzip"),
+    ("br;q=0.5, gzip", "gzip"),
+    ("gzip;q=0", None),
+])
+def test_every_encoding_shares_one_etag(accept_encoding, coding):
+    encoded = EncodedResponse(BODY, compress=True)
+    response = encoded.to_response(request(accept_encoding=accept_encoding), cache_headers(ETAG))
+
+    assert response.headers["etag"] == ETAG
+    assert response.headers["vary"] == "Accept, Accept-Encoding"
+    assert response.headers.get("content-encoding") == coding
+    if coding == "gzip":
+        assert gzip.decompress(response.body) == BODY
+    elif coding == "br":
+        assert brotli.decompress(response.body) == BODY
+    else:
+        assert response.body == BODY
+
+
+def test_small_bodies_are_not_compressed():
+    encoded = EncodedResponse(b"{}", compress=True)
+    assert encoded.variants == {}
+    assert "content-encoding" not in encoded.to_response(request(accept_encoding="gzip")).headers
+
+
+@pytest.mark.parametrize("if_none_match, expected", [
+    (ETAG, True),
+    (f'"other", {ETAG}', True),
+    (f"W/{ETAG}", True),
+    ("*", True),
+    # Tags handed out while encodings had their own suffixed ETags
+    (ETAG[:-1] + '-gzip"', True),
+    (ETAG[:-1] + '-br"', True),
+    ('"other"', False),
+])
+def test_if_none_match(if_none_match, expected):
+    assert is_not_modified(request(if_none_match=if_none_match), ETAG) is expected
+
+
+def test_if_modified_since_only_without_if_none_match():
+    modified = datetime(2026, 10, 19, 6, tzinfo=timezone.utc)
+    since = cache_headers(ETAG, last_modified=modified)["Last-Modified"]
+
+    assert is_not_modified(request(if_modified_since=since), ETAG, modified)
+    assert not is_not_modified(request(if_modified_since=since), ETAG, modified.replace(hour=7))
+    assert not is_not_modified(request(if_modified_since="garbage"), ETAG, modified)
+    assert not is_not_modified(request(if_modified_since=since, if_none_match='"other"'), ETAG, modified)
+
+
+def test_forecast_revalidates_with_the_etag_of_any_encoding(client):
+    first = client.get("/api/forecast/AlgonquinON", headers={"Accept-Encoding": "gzip"})
+    assert first.status_code == 200
+    assert first.headers["content-encoding"] == "gzip"
+    etag = first.headers["etag"]
+
+    for accept_encoding in ("gzip", "br", "identity"):
+        response = client.get("/api/forecast/AlgonquinON", headers={
+            "Accept-Encoding": accept_encoding, "If-None-Match": etag,
+        })
+        assert response.status_code == 304
+        assert response.headers["etag"] == etag
+
+    plain = client.get("/api/forecast/AlgonquinON", headers={"Accept-Encoding": "identity"})
+    assert plain.headers["etag"] == etag
+    assert "content-encoding" not in plain.headers
+    assert plain.json() == first.json()
+
+
+def test_forecast_hits_serve_the_bytes_encoded_at_build_time(client, monkeypatch):
+    encodes = []
+    encode_forecast = forecast.encode_forecast
+
+    def counting(variant, *args):
+        encodes.append(variant)
+        return encode_forecast(variant, *args)
+
+    monkeypatch.setattr(forecast, "encode_forecast", counting)
+    forecast_cache.clear()
+    headers = {"Accept-Encoding": "identity"}
+    first = client.get("/api/forecast/KittPeakAZ", headers=headers)
+    assert encodes == ["json"]
+    # Validated against the response model once, when it was built
+    assert ForecastResponse.model_validate(first.json()).location.key == "KittPeakAZ"
+
+    encoded = forecast_cache.get(first.headers["etag"])
+    assert encoded.body == first.content
+    assert set(encoded.variants) >= {"gzip"}
+
+    again = client.get("/api/forecast/KittPeakAZ", headers=headers)
+    compressed = client.get("/api/forecast/KittPeakAZ", headers={"Accept-Encoding": "gzip"})
+    assert encodes == ["json"]
+    assert again.content == first.content
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.content == first.content  # httpx decodes the stored gzip variant
@@ -0,0 +1,150 @@
+"""
+Run data ingestion: complete runs only, fallback to older runs, kept versions
+
+GRIB decoding is replaced by constant planes; only file names matter here.
+"""
+
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from app.config import settings
+from app.services.cmc_fetcher import cmc_fetcher
+from app.services.grid_geometry import GridGeometry
+from app.services.run_data import RunData, RunDataStore
+
+LATEST = datetime(2026, 10, 19, 12, tzinfo=timezone.utc)
+HOURS = 3
+GEOMETRY = GridGeometry(*np.meshgrid(np.linspace(20, 50, 4), np.linspace(-120, -70, 5), indexing="ij"))
+
+
+def grib_name(run: datetime, variable: str, hour: int) -> str:
+    return f"{run:%Y%m%d}T{run:%H}Z_MSC_RDPS_{variable}_Sfc_PT{hour:03d}H.grib2"
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(cmc_fetcher, "data_dir", tmp_path)
+    monkeypatch.setattr(cmc_fetcher, "get_latest_model_run", lambda: (f"{LATEST:%H}", LATEST))
+
+    def read_field(path):
+        hour = int(path.name.split("_PT")[1][:3])
+        return np.full(GEOMETRY.shape, hour, dtype=np.float32), hour, GEOMETRY
+    monkeypatch.setattr(cmc_fetcher, "read_field", read_field)
+    return tmp_path
+
+
+def download(run: datetime, hours=range(1, HOURS + 1), listed: bool = True):
+    """Astronomy files of a run on disk, with the server's listing of all of them"""
+    names = [grib_name(run, variable, hour) for variable in ("SEEI", "TRSP") for hour in range(1, HOURS + 1)]
+    if listed:
+        cmc_fetcher.write_expected("astronomy", run, names)
+    directory = cmc_fetcher.data_dir / "astronomy" / f"{run:%H}"
+    directory.mkdir(parents=True, exist_ok=True)
+    for variable in ("SEEI", "TRSP"):
+        for hour in hours:
+            (directory / grib_name(run, variable, hour)).write_bytes(b"GRIB")
+
+
+def refresh(store: RunDataStore):
+    return asyncio.run(store.refresh())
+
+
+def test_complete_run_is_published(client, data_dir):
+    store = RunDataStore()
+    download(LATEST)
+    data = refresh(store)
+    assert data is store.current() and store.get(data.version) is data
+    assert data.version == f"{LATEST:%Y%m%d%H}.{2 * HOURS}"
+    assert sorted(data.fields) == ["seeing", "transparency"]
+    assert data.fields["seeing"].cube.shape == (HOURS,) + GEOMETRY.shape
+    assert data.fields["seeing"].cube[:, 0, 0].tolist() == [1, 2, 3]
+    assert "KittPeakAZ" in data.cell_index
+    # Nothing new on disk
+    assert refresh(store) is None
+
+
+def test_partial_run_waits_for_its_files(client, data_dir):
+    store = RunDataStore()
+    earlier = LATEST - timedelta(hours=6)
+    download(earlier)
+    download(LATEST, hours=range(1, HOURS))
+    assert refresh(store).run_datetime == earlier
+    assert refresh(store) is None
+
+    download(LATEST)
+    assert refresh(store).version == f"{LATEST:%Y%m%d%H}.{2 * HOURS}"
+
+
+def test_partial_run_is_published_when_there_is_nothing_else(client, data_dir):
+    store = RunDataStore()
+    download(LATEST, hours=[1])
+    partial = refresh(store)
+    assert partial.version == f"{LATEST:%Y%m%d%H}.2"
+
+    # More files of the same run don't change the published version...
+    download(LATEST, hours=[1, 2])
+    assert refresh(store) is None
+    assert store.current() is partial
+    # ...until the run is complete
+    download(LATEST)
+    assert refresh(store).version == f"{LATEST:%Y%m%d%H}.{2 * HOURS}"
+
+
+def test_files_without_a_listing_count_as_complete(client, data_dir):
+    store = RunDataStore()
+    download(LATEST, hours=[1], listed=False)
+    assert refresh(store).version == f"{LATEST:%Y%m%d%H}.2"
+
+
+def test_fallback_to_an_older_run(client, data_dir):
+    store = RunDataStore()
+    too_old = LATEST - timedelta(hours=settings.RUN_DATA_MAX_AGE_HOURS + 6)
+    download(too_old)
+    assert refresh(store) is None
+    assert not store.current().has_data
+
+    earlier = LATEST - timedelta(hours=6)
+    download(earlier)
+    assert refresh(store).run_datetime == earlier
+    # The latest run takes over once it is complete; never the other way round
+    download(LATEST)
+    assert refresh(store).run_datetime == LATEST
+    assert refresh(store) is None
+
+
+def test_versions_kept(monkeypatch):
+    monkeypatch.setattr(settings, "RUN_DATA_KEEP", 2)
+    store = RunDataStore()
+    runs = [RunData("00", LATEST - timedelta(hours=h), {}, 1) for h in (12, 6, 0)]
+    for data in runs:
+        store.publish(data)
+    assert store.current() is runs[-1]
+    assert store.get(runs[0].version) is None
+    assert [store.get(data.version) for data in runs[1:]] == runs[1:]
+
+    # Publishing an older run keeps the newest versions
+    store.publish(runs[0])
+    assert store.get(runs[0].version) is None
+    assert store.get(runs[2].version) is runs[2]
+
+
+def test_astronomy_download_records_the_listing(data_dir, monkeypatch):
+    names = [grib_name(LATEST, variable, hour) for variable in ("SEEI", "TRSP") for hour in (1, 2)]
+    other_run = grib_name(LATEST - timedelta(days=1), "SEEI", 1)
+
+    async def list_available_files(base_url):
+        return names + [other_run]
+
+    async def fetch_file(url, dest, session=None):
+        return False  # Nothing downloads
+    monkeypatch.setattr(cmc_fetcher, "list_available_files", list_available_files)
+    monkeypatch.setattr(cmc_fetcher, "fetch_file", fetch_file)
+
+    asyncio.run(cmc_fetcher.fetch_astronomy_data())
+    listing = data_dir / "astronomy" / f"{LATEST:%H}" / f"{LATEST:%Y%m%d%H}.expected.json"
+    assert json.loads(listing.read_text()) == sorted(names)
+    assert not cmc_fetcher.run_complete(LATEST, cmc_fetcher.run_files(LATEST))
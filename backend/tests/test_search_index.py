@@ -0,0 +1,78 @@
+"""
+Autocomplete ranking: name prefix, word prefix by field, fuzzy, popularity
+"""
+
+import numpy as np
+import pytest
+
+from app.services import search_index
+from app.services.hotset import HotSet
+from app.services.search_index import SearchIndex, normalize
+from conftest import location_rows
+
+
+@pytest.fixture
+def index(monkeypatch):
+    # No popularity from requests other tests made
+    monkeypatch.setattr(search_index, "hot_set", HotSet(width=64, depth=4, top_k=10, half_life_hours=72))
+    return SearchIndex(location_rows(), fuzzy_threshold=0.3)
+
+
+def keys(locations):
+    return [loc.key for loc in locations]
+
+
+def test_normalize():
+    assert normalize("  Mont-Mégantic (QC) ") == "mont megantic qc"
+    assert normalize(None) == ""
+
+
+@pytest.mark.parametrize("q, expected", [
+    ("kitt", ["KittPeakAZ"]),
+    ("KITT pe", ["KittPeakAZ"]),
+    ("peak kitt", ["KittPeakAZ"]),
+    ("mc obs", ["McDonaldTX"]),
+    ("Mont Mégantic", ["MontMegQC"]),
+    ("mcdonaldtx", ["McDonaldTX"]),
+])
+def test_prefix_matches(index, q, expected):
+    assert keys(index.search(q, 10)) == expected
+
+
+def test_ranking_tiers(index):
+    # Name matches rank above region matches, then alphabetical by name
+    assert keys(index.search("o", 10)) == ["BancroftON", "McDonaldTX", "MontMegQC", "AlgonquinON", "TorontoON"]
+    # Names starting with the query come first
+    assert keys(index.search("m", 10)) == ["McDonaldTX", "MontMegQC"]
+
+
+@pytest.mark.parametrize("q, expected", [
+    ("algonqiun", ["AlgonquinON"]),
+    ("torotno", ["TorontoON"]),
+])
+def test_typos_match_fuzzily(index, q, expected):
+    assert keys(index.search(q, 10)) == expected
+
+
+def test_popularity_breaks_ties(index):
+    assert keys(index.search("ontario", 10)) == ["AlgonquinON", "BancroftON", "TorontoON"]
+    index.popularity = np.zeros(len(index))
+    index.popularity[keys(index.locations).index("TorontoON")] = 5.0
+    assert keys(index.search("ontario", 10)) == ["TorontoON", "AlgonquinON", "BancroftON"]
+    assert keys(index.search("ontario", 2)) == ["TorontoON", "AlgonquinON"]
+
+
+def test_nothing_to_search(index):
+    assert index.search("", 10) == []
+    assert index.search("!!", 10) == []
+    assert index.search("zzzzzz", 10) == []
+    assert SearchIndex([], fuzzy_threshold=0.3).search("kitt", 10) == []
+
+
+def test_search_endpoint(client):
+    response = client.get("/api/locations/search?q=obs&limit=2")
+    assert response.status_code == 200
+    assert [loc["key"] for loc in response.json()] == ["BancroftON", "McDonaldTX"]
+    assert client.get("/api/locations/search?q=o").status_code == 422
+    assert client.get("/api/locations/search").status_code == 422
+    assert client.get("/api/locations/search?q=obs&limit=101").status_code == 422
@@ -0,0 +1,74 @@
+"""
+Spatial grid: radius and nearest queries against a brute-force answer
+"""
+
+import math
+
+import numpy as np
+import pytest
+
+from app.services.spatial_index import SpatialGrid, haversine_km
+
+
+@pytest.fixture(scope="module")
+def points():
+    rng = np.random.default_rng(3)
+    lats = rng.uniform(-80, 80, 2000)
+    lons = rng.uniform(-180, 180, 2000)
+    # A cluster straddling the antimeridian
+    lats[:50] = rng.uniform(-5, 5, 50)
+    lons[:50] = rng.choice([-179.9, 179.9], 50) + rng.uniform(-0.05, 0.05, 50)
+    return [(float(lat), float(lon), i) for i, (lat, lon) in enumerate(zip(lats, lons))]
+
+
+def brute_force(points, lat, lon):
+    distances = haversine_km(
+        math.radians(lat), math.radians(lon),
+        np.radians([p[0] for p in points]), np.radians([p[1] for p in points])
+    )
+    order = np.argsort(distances, kind="stable")
+    return [(points[i][2], float(distances[i])) for i in order]
+
+
+@pytest.mark.parametrize("lat, lon, radius_km", [
+    (45.0, -75.0, 500.0),
+    (0.0, 180.0, 300.0),
+    (79.5, 10.0, 800.0),
+    (10.0, 20.0, 1.0),
+])
+def test_within_matches_brute_force(points, lat, lon, radius_km):
+    grid = SpatialGrid(points, cell_deg=1.0)
+    expected = [(item, distance) for item, distance in brute_force(points, lat, lon) if distance <= radius_km]
+    found = grid.within(lat, lon, radius_km)
+    assert [item for item, _ in found] == [item for item, _ in expected]
+    assert [distance for _, distance in found] == pytest.approx([distance for _, distance in expected])
+
+    limited = grid.within(lat, lon, radius_km, limit=3)
+    assert [item for item, _ in limited] == [item for item, _ in expected[:3]]
+
+
+def test_nearest_grows_the_radius_until_k_points(points):
+    grid = SpatialGrid(points, cell_deg=1.0)
+    expected = brute_force(points, -60.0, 100.0)[:5]
+    assert [item for item, _ in grid.nearest(-60.0, 100.0, 5)] == [item for item, _ in expected]
+    assert grid.nearest(-60.0, 100.0, 5, max_radius_km=1.0) == []
+
+
+def test_empty_grid():
+    grid = SpatialGrid([], cell_deg=1.0)
+    assert len(grid) == 0
+    assert grid.within(0.0, 0.0, 100.0) == []
+    assert grid.nearest(0.0, 0.0, 3) == []
+
+
+def test_nearby_endpoint(client):
+    response = client.get("/api/locations/nearby?lat=45.5&lon=-78.3&radius_km=100")
+    assert response.status_code == 200
+    results = response.json()
+    assert [r["location"]["key"] for r in results] == ["AlgonquinON", "BancroftON"]
+    assert results[0]["distance_km"] <= results[1]["distance_km"] <= 100
+
+    assert client.get("/api/locations/nearby?lat=0&lon=0").json() == []
+    assert client.get("/api/locations/nearby?lat=91&lon=0").status_code == 422
+    assert client.get("/api/locations/nearby?lat=45&lon=-78&radius_km=0").status_code == 422
+    assert client.get("/api/locations/nearby?lat=45&lon=-78&limit=51").status_code == 422